@@ -4,7 +4,7 @@ Add on-ice players to a file by specifying filename and columns from which to in
 
 import pandas as pd
 
-from scrapenhl2.scrape import schedules, parse_toi, autoupdate, team_info, teams, players
+from scrapenhl2.scrape import schedules, parse_toi, autoupdate, team_info, teams, players, clock
 from scrapenhl2.scrape import general_helpers as helpers
 
 def add_players_to_file(filename, focus_team, season=None, gamecol='Game', periodcol='Period', timecol='Time',
@@ -69,9 +69,11 @@ def add_onice_players_to_df(df, focus_team, season, gamecol, player_output='ids'
     :return: dataframe with team and opponent players
     """
 
-    toi = teams.get_team_toi(season, focus_team).rename(columns={'Time': '_Secs'}).drop_duplicates()
-    toi = toi[['Game', '_Secs', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5', 'Team6',
-               'Opp1', 'Opp2', 'Opp3', 'Opp4', 'Opp5', 'Opp6']].rename(columns={'Game': gamecol})
+    toi = teams.get_team_toi(season, focus_team, filters={'Game': df[gamecol].dropna().unique()},
+                             columns=['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5', 'Team6',
+                                      'Opp1', 'Opp2', 'Opp3', 'Opp4', 'Opp5', 'Opp6']) \
+        .rename(columns={'Time': '_Secs', 'Game': gamecol}) \
+        .drop_duplicates()
 
     # Rename columns
     toi = toi.rename(columns={col: '{0:s}{1:s}'.format(focus_team, col[-1])
@@ -91,7 +93,7 @@ def add_onice_players_to_df(df, focus_team, season, gamecol, player_output='ids'
             try:
                 gametoi = parse_toi.get_parsed_toi(season, int(round(game))) \
                     .rename(columns={'Time': '_Secs'}).drop_duplicates() \
-                    .drop({'HomeStrength', 'RoadStrength', 'HG', 'RG'}, axis=1)
+                    .drop({'HomeStrength', 'RoadStrength', 'HomeStrengthCode', 'RoadStrengthCode', 'HG', 'RG'}, axis=1)
 
                 # Now that I do, need to switch column names, get players in right format, and join
                 hname = team_info.team_as_str(schedules.get_home_team(season, int(round(game))))
@@ -156,50 +158,8 @@ def add_times_to_file(df, periodcol, timecol, time_format):
     df = df.dropna(subset={timecol})
     df.loc[:, periodcol] = df[periodcol].fillna(method='ffill')
 
-    # Common to see semicolon in place of colon; fix here as well
-    # Also fix, e.g. ! instead of 1, @ instead of 2, etc
-    df.loc[:, '_MMSS'] = df[timecol].str.replace(';', ':') \
-        .str.replace('!', '1') \
-        .str.replace('@', '2') \
-        .str.replace('#', '3') \
-        .str.replace('$', '4') \
-        .str.replace('%', '5') \
-        .str.replace('^', '6') \
-        .str.replace('&', '7') \
-        .str.replace('*', '8') \
-        .str.replace('(', '9') \
-        .str.replace(')', '0') \
-        .apply(helpers.mmss_to_secs)
-
-    if time_format == 'elapsed':
-        def period_cont(x):
-            y = str(x)[0]  # take just first since this may be a float
-            if y.isdigit():
-                return (float(x) - 1) * 1200
-            elif x == 'OT':  # OT
-                return period_cont(4)
-            else:
-                print('Cannot find period contribution for', x)
-                return ''
-
-        df.loc[:, '_Period_Contribution'] = df[periodcol].apply(period_cont)
-        df.loc[:, '_Secs'] = df['_Period_Contribution'] + df['_MMSS']
-    elif time_format == 'remaining':
-        def period_cont(x):
-            y = str(x)[0]  # take just first since this may be a float
-            if y.isdigit():
-                return float(x) * 1200
-            elif x == 'OT':
-                return 3900
-            else:
-                print('Cannot find period contribution for', x)
-                return ''
-
-        df.loc[:, '_Period_Contribution'] = df[periodcol].apply(period_cont)
-        df.loc[:, '_Secs'] = df['_Period_Contribution'] - df['_MMSS']
-
-    df.loc[:, '_Secs'] = df['_Secs'] + 1
-    df = df.drop({'_MMSS','_Period_Contribution'}, axis=1, errors='ignore')
+    # Common to see semicolon in place of colon, or ! instead of 1, @ instead of 2, etc; fixed here as well
+    df.loc[:, '_Secs'] = clock.to_game_secs(df[periodcol], df[timecol], time_format, correct_typos=True) + 1
     return df
 
 
@@ -174,10 +174,8 @@ def get_team_combo_toi(season, team, games, n_players=2):
     if helpers.check_number(games):
         games = [games]
 
-    toi = teams.get_team_toi(season, team) \
-        .merge(pd.DataFrame({'Game': games}), how='inner', on='Game') \
-        .pipe(manip.filter_for_five_on_five) \
-        [['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5']] \
+    toi = teams.get_team_toi(season, team, columns=['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5'],
+                             filters=dict(teams.FIVE_ON_FIVE, Game=games)) \
         .pipe(helpers.melt_helper, id_vars=['Game', 'Time'], var_name='P', value_name='PlayerID') \
         .drop('P', axis=1)
     toi2 = None
@@ -216,9 +214,8 @@ def get_team_combo_corsi(season, team, games, n_players=2):
         games = [games]
 
     teamid = team_info.team_as_id(team)
-    corsi = teams.get_team_pbp(season, team)
+    corsi = teams.get_team_pbp(season, team, filters={'Game': games})
     corsi = corsi.assign(_Secs=corsi.Time) \
-        .merge(pd.DataFrame({'Game': games}), how='inner', on='Game') \
         .pipe(manip.filter_for_five_on_five) \
         .pipe(manip.filter_for_corsi) \
         [['Game', 'Time', 'Team', '_Secs']] \
@@ -6,7 +6,8 @@ import feather
 import pandas as pd
 
 from scrapenhl2.scrape import general_helpers as helpers
-from scrapenhl2.scrape import organization, schedules, teams, parse_pbp, parse_toi, players, events, team_info, scrape_pbp
+from scrapenhl2.scrape import organization, schedules, teams, parse_pbp, parse_toi, players, events, team_info, scrape_pbp, \
+    strengths
 
 
 def get_player_toion_toioff_filename(season):
@@ -176,14 +177,15 @@ def _filter_for_strengths(data, **kwargs):
     """
 
     if 'strength_to' in kwargs:
-        data = data[(data.TeamStrength == kwargs['strength_to'][0]) & (data.OppStrength == kwargs['strength_to'][1])]
+        data = data[strengths.is_strength(data, 'TeamStrength', kwargs['strength_to'][0]) &
+                    strengths.is_strength(data, 'OppStrength', kwargs['strength_to'][1])]
 
     if 'strength_hr' in kwargs:
         # Find whether team was home or road
         pass
 
     if 'strength_to' not in kwargs and 'strength_hr' not in kwargs:
-        data = data[(data.TeamStrength == 5) & (data.OppStrength == 5)]
+        data = data[strengths.is_five_on_five(data)]
 
     return data
 
@@ -378,9 +380,8 @@ def get_5v5_player_game_toi(season, team):
     :param team: int, team id
     :return: df with game, player, TOION, and TOIOFF
     """
-    fives = teams.get_team_toi(season, team) \
-        .query('TeamStrength == "5" & OppStrength == "5"') \
-        .filter(items=['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5'])
+    fives = teams.get_team_toi(season, team, columns=['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5'],
+                               filters=teams.FIVE_ON_FIVE)
 
     # Get TOI by game. This is to get TOIOFF
     time_by_game = fives[['Game', 'Time']].groupby('Game').count().reset_index().rename(columns={'Time': 'TeamTOI'})
@@ -632,14 +633,12 @@ def get_5v5_player_game_toicomp(season, team):
     :return: df with game, player,
     """
 
-    toidf = teams.get_team_toi(season, team).drop_duplicates()
-    toidf.loc[:, 'TeamStrength'] = toidf.TeamStrength.astype(str)
-    toidf.loc[:, 'OppStrength'] = toidf.OppStrength.astype(str)
-    # Filter to 5v5
-    toidf = toidf[(toidf.TeamStrength == '5') & (toidf.OppStrength == '5')] \
-        .drop({'FocusTeam', 'TeamG', 'OppG', 'Team6', 'Opp6', 'TeamScore', 'OppScore',
-               'Team', 'Opp', 'Time', 'TeamStrength', 'OppStrength', 'Home', 'Road'},
-              axis=1, errors='ignore')
+    # 5v5 only
+    toidf = teams.get_team_toi(season, team, filters=teams.FIVE_ON_FIVE,
+                               columns=['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5',
+                                        'Opp1', 'Opp2', 'Opp3', 'Opp4', 'Opp5']) \
+        .drop_duplicates() \
+        .drop('Time', axis=1)
 
     if len(toidf) > 0:
         df_for_qoc = toidf
@@ -734,7 +733,8 @@ def _retrieve_start_end_times(toidf):
     :return: dataframe
     """
     df = toidf.drop({'FocusTeam', 'Home', 'Opp1', 'Opp2', 'Opp3', 'Opp4', 'Opp5', 'Opp6', 'OppG',
-                     'OppScore', 'OppStrength', 'TeamScore', 'TeamStrength', 'Road'}, axis=1, errors='ignore')
+                     'OppScore', 'OppStrength', 'TeamScore', 'TeamStrength', 'OppStrengthCode', 'TeamStrengthCode',
+                     'Road'}, axis=1, errors='ignore')
     df = helpers.melt_helper(df, id_vars=['Time', 'Game'], var_name='P', value_name='PlayerID') \
         .drop('P', axis=1) \
         .drop_duplicates() \
@@ -1087,8 +1087,8 @@ def _get_5v5_player_game_fa(season, team, gc):
         .pivot_table(index='Game', columns='TeamEvent', values='Count').reset_index() \
         .rename(columns={metrics['F']: metrics['TeamF'], metrics['A']: metrics['TeamA']})
 
-    toi = teams.get_team_toi(season, team)
-    toi = toi[['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5']].drop_duplicates()
+    toi = teams.get_team_toi(season, team, columns=['Game', 'Time', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5']) \
+        .drop_duplicates()
     indivtotals = pbp.merge(toi, how='left', on=['Game', 'Time'])
     indivtotals = helpers.melt_helper(indivtotals[['Game', 'TeamEvent', 'Team1', 'Team2', 'Team3', 'Team4', 'Team5']],
                                       id_vars=['Game', 'TeamEvent'],
@@ -1219,16 +1219,12 @@ def get_player_toi(season, game, pos=None, homeroad='H'):
 
     # TODO this isn't working properly for in-progress games. Or maybe it's my scraping earlier.
 
-    toi = parse_toi.get_parsed_toi(season, game)
+    toi = parse_toi.get_parsed_toi_summary(season, game)
     posdf = get_player_positions()
 
-    fives = toi[(toi.HomeStrength == "5") & (toi.RoadStrength == "5")]
-    cols_to_keep = ['Time'] + ['{0:s}{1:d}'.format(homeroad, i + 1) for i in range(5)]
-    playersonice = helpers.melt_helper(fives[cols_to_keep],
-                                       id_vars='Time', var_name='P', value_name='PlayerID') \
-        .drop('P', axis=1) \
-        .groupby('PlayerID').count().reset_index() \
-        .rename(columns={'Time': 'Secs'}) \
+    fives = toi[(toi.Team == homeroad) & ~toi.Goalie & (toi.HomeStrengthCode == 5) & (toi.RoadStrengthCode == 5)]
+    playersonice = fives[['PlayerID', 'Secs']] \
+        .groupby('PlayerID').sum().reset_index() \
         .merge(posdf, how='left', left_on='PlayerID', right_on='ID') \
         .drop('ID', axis=1) \
         .sort_values('Secs', ascending=False)
@@ -1255,7 +1251,7 @@ def get_line_combos(season, game, homeroad='H'):
     toi = parse_toi.get_parsed_toi(season, game)
     pos = get_player_positions()
 
-    fives = toi[(toi.HomeStrength == "5") & (toi.RoadStrength == "5")]
+    fives = toi[strengths.is_five_on_five(toi)]
     cols_to_keep = ['Time'] + ['{0:s}{1:d}'.format(homeroad, i + 1) for i in range(5)]
     playersonice = helpers.melt_helper(fives[cols_to_keep],
                                        id_vars='Time', var_name='P', value_name='PlayerID') \
@@ -1286,7 +1282,7 @@ def get_pairings(season, game, homeroad='H'):
     toi = parse_toi.get_parsed_toi(season, game)
     pos = get_player_positions()
 
-    fives = toi[(toi.HomeStrength == "5") & (toi.RoadStrength == "5")]
+    fives = toi[strengths.is_five_on_five(toi)]
     cols_to_keep = ['Time'] + ['{0:s}{1:d}'.format(homeroad, i + 1) for i in range(5)]
     playersonice = helpers.melt_helper(fives[cols_to_keep],
                                        id_vars='Time', var_name='P', value_name='PlayerID') \
@@ -1397,10 +1393,8 @@ def filter_for_five_on_five(df):
     :return: dataframe
     """
     colnames = set(df.columns)
-    if 'HomeStrength' in colnames and 'RoadStrength' in colnames:
-        fives = df[(df.HomeStrength == "5") & (df.RoadStrength == "5")]
-    elif 'TeamStrength' in colnames and 'OppStrength' in colnames:
-        fives = df[(df.TeamStrength == "5") & (df.OppStrength == "5")]
+    if colnames & {'HomeStrength', 'HomeStrengthCode', 'TeamStrength', 'TeamStrengthCode'}:
+        fives = df[strengths.is_five_on_five(df)]
     else:
         fives = df
     return fives
@@ -1441,8 +1435,10 @@ def get_game_h2h_corsi(season, games, cfca=None):
         # pbp.loc[:, 'Event'] = pbp.Event.apply(lambda x: ss.convert_event(x))
         pbp = pbp[['Time', 'Event', 'Team']] \
             .merge(toi[['Time', 'R1', 'R2', 'R3', 'R4', 'R5', 'H1', 'H2', 'H3', 'H4', 'H5',
-                        'HomeStrength', 'RoadStrength']], how='inner', on='Time')
-        corsi = filter_for_five_on_five(filter_for_corsi(pbp)).drop(['HomeStrength', 'RoadStrength'], axis=1)
+                        'HomeStrength', 'RoadStrength', 'HomeStrengthCode', 'RoadStrengthCode']],
+                   how='inner', on='Time')
+        corsi = filter_for_five_on_five(filter_for_corsi(pbp)) \
+            .drop(['HomeStrength', 'RoadStrength', 'HomeStrengthCode', 'RoadStrengthCode'], axis=1)
 
         hometeam = schedules.get_home_team(season, game)
         # Add HomeCorsi which will be 1 or -1. Need to separate out blocks because they're credited to defending team
@@ -1539,10 +1535,11 @@ def team_5v5_score_state_summary_by_game(season):
     dflst = []
     for team in schedules.get_teams_in_season(season):
         try:
-            toi = teams.get_team_toi(season, team)
+            toi = teams.get_team_toi(season, team, columns=['Game', 'Time', 'TeamScore', 'OppScore'],
+                                     filters=teams.FIVE_ON_FIVE)
         except Exception:
             continue
-        toi = filter_for_five_on_five(toi).assign(Team=team)
+        toi = toi.assign(Team=team)
         toi = toi[['Game', 'Team', 'Time', 'TeamScore', 'OppScore']] \
             .assign(ScoreState=toi.TeamScore - toi.OppScore) \
             .drop_duplicates() \
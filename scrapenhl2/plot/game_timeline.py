@@ -7,7 +7,7 @@ import pandas as pd  # standard scientific python stack
 
 from scrapenhl2.manipulate import manipulate as manip
 from scrapenhl2.plot import visualization_helper
-from scrapenhl2.scrape import parse_pbp, parse_toi, schedules, team_info
+from scrapenhl2.scrape import parse_pbp, parse_toi, schedules, strengths, team_info
 
 
 def live_timeline(team1, team2, update=True, save_file=None):
@@ -131,10 +131,11 @@ def _get_home_adv_for_timeline(season, game):
     # TODO add functionality for extra attacker
 
     toi = parse_toi.get_parsed_toi(season, game)
+    home = strengths.get_strength_codes(toi, 'HomeStrength')
+    road = strengths.get_strength_codes(toi, 'RoadStrength')
 
-    pp1 = toi[((toi.HomeStrength == "5") & (toi.RoadStrength == "4")) |
-              ((toi.HomeStrength == "4") & (toi.RoadStrength == "3"))].Time
-    pp2 = toi[(toi.HomeStrength == "5") & (toi.RoadStrength == "3")].Time
+    pp1 = toi[((home == 5) & (road == 4)) | ((home == 4) & (road == 3))].Time
+    pp2 = toi[(home == 5) & (road == 3)].Time
 
     df = {'PP+1': _get_contiguous_times(sorted(list(pp1))),
           'PP+2': _get_contiguous_times(sorted(list(pp2)))}
@@ -153,10 +154,11 @@ def _get_road_adv_for_timeline(season, game):
     # TODO add functionality for extra attacker
 
     toi = parse_toi.get_parsed_toi(season, game)
+    home = strengths.get_strength_codes(toi, 'HomeStrength')
+    road = strengths.get_strength_codes(toi, 'RoadStrength')
 
-    pp1 = toi[((toi.HomeStrength == "4") & (toi.RoadStrength == "5")) |
-              ((toi.HomeStrength == "3") & (toi.RoadStrength == "4"))].Time
-    pp2 = toi[(toi.HomeStrength == "3") & (toi.RoadStrength == "5")].Time
+    pp1 = toi[((home == 4) & (road == 5)) | ((home == 3) & (road == 4))].Time
+    pp2 = toi[(home == 3) & (road == 5)].Time
 
     df = {'PP+1': _get_contiguous_times(sorted(list(pp1))),
           'PP+2': _get_contiguous_times(sorted(list(pp2)))}
@@ -3,16 +3,27 @@ Indicates to import all .py files
 """
 __all__ = ['autoupdate',
            'check_game_data',
+           'clock',
            'events',
            'games',
            'general_helpers',
+           'http_cache',
            'manipulate_schedules',
            'organization',
            'parse_pbp',
            'parse_toi',
+           'parsed_store',
+           'pbp_log',
            'players',
+           'raw_archive',
+           'raw_codecs',
+           'replay_server',
            'schedules',
+           'schemas',
            'scrape_pbp',
            'scrape_toi',
+           'shift_log',
+           'strengths',
            'team_info',
-           'teams']
+           'teams',
+           'toi_kernels']
@@ -4,22 +4,31 @@ This module contains methods for automatically scraping and parsing games.
 
 import os
 import os.path
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 from tqdm import tqdm
-from numba import jit
 
+import scrapenhl2.scrape.general_helpers as helpers
+import scrapenhl2.scrape.http_cache as http_cache
 import scrapenhl2.scrape.manipulate_schedules as manipulate_schedules
 import scrapenhl2.scrape.parse_pbp as parse_pbp
 import scrapenhl2.scrape.parse_toi as parse_toi
+import scrapenhl2.scrape.parsed_store as parsed_store
 import scrapenhl2.scrape.schedules as schedules
 import scrapenhl2.scrape.scrape_pbp as scrape_pbp
 import scrapenhl2.scrape.scrape_toi as scrape_toi
 import scrapenhl2.scrape.teams as teams
 
+# Number of threads downloading games at once. Requests to each host share one token bucket in try_url_n_times.
+DEFAULT_FETCH_WORKERS = 4
+
 
 def delete_game_html(season, game):
     """
     Deletes html files. HTML files are used for live game charts, but deleted in favor of JSONs when games go final.
+    Also drops the HTTP validators and incremental parsing state kept for polling this game while it was in progress.
 
     :param season: int, the season
 
@@ -35,14 +44,26 @@ def delete_game_html(season, game):
         if os.path.exists(filename):
             os.remove(filename)
 
+    for fun in (scrape_pbp.get_game_url,
+                scrape_pbp.get_game_pbplog_url,
+                scrape_toi.get_home_shiftlog_url,
+                scrape_toi.get_road_shiftlog_url):
+        http_cache.remove_validators(fun(season, game))
+
+    parse_pbp.delete_pbp_state(season, game)
+    parse_toi.delete_toi_state(season, game)
+
 
-def autoupdate(season=None, update_team_logs=True):
+def autoupdate(season=None, update_team_logs=True, workers=DEFAULT_FETCH_WORKERS, full_schedule_refresh=False):
     """
     Run this method to update local data. It reads the schedule file for given season and scrapes and parses
     previously unscraped games that have gone final or are in progress. Use this for 2010 or later.
 
     :param season: int, the season. If None (default), will do current season
     :param update_team_logs: bool, update team logs too? Faster if False.
+    :param workers: int, number of threads downloading final games at once
+    :param full_schedule_refresh: bool. If True, re-reads the whole season schedule. If False (default), re-reads only
+        recent days (see schedules.refresh_season_schedule). Past seasons always get a full refresh.
 
     :return: nothing
     """
@@ -55,18 +76,23 @@ def autoupdate(season=None, update_team_logs=True):
 
     sch = schedules.get_season_schedule(season)
 
-    # First, for all games that were in progress during last scrape, delete html charts
-    inprogress = sch.query('Status == "In Progress"')
-    inprogressgames = inprogress.Game.values
-    inprogressgames.sort()
-    for game in inprogressgames:
-        delete_game_html(season, game)
+    # Keep tabs on games that were in progress during last scrape
+    old_inprogress_games = set(sch.query('Status == "In Progress"').Game.values)
 
     # Now keep tabs on old final games
     old_final_games = set(sch.query('Status == "Final" & Result != "N/A"').Game.values)
 
     # Update schedule to get current status
-    schedules.generate_season_schedule_file(season)
+    if full_schedule_refresh or season != schedules.get_current_season():
+        schedules.generate_season_schedule_file(season)
+    else:
+        schedules.refresh_season_schedule(season)
+
+    # For games that were in progress but no longer are, delete html charts.
+    # Games still in progress keep theirs, so the next poll can send conditional requests.
+    still_inprogress_games = set(schedules.get_season_schedule(season).query('Status == "In Progress"').Game.values)
+    for game in sorted(old_inprogress_games - still_inprogress_games):
+        delete_game_html(season, game)
 
     # For games done previously, set pbp and toi status to scraped
     manipulate_schedules.update_schedule_with_pbp_scrape(season, old_final_games)
@@ -88,7 +114,7 @@ def autoupdate(season=None, update_team_logs=True):
     games = games.Game.values
     games.sort()
     print('Updating final games')
-    read_final_games(games, season)
+    read_final_games(games, season, workers)
 
     if update_team_logs:
         try:
@@ -97,59 +123,161 @@ def autoupdate(season=None, update_team_logs=True):
             pass  # ed.print_and_log("Error with team logs in {0:d}: {1:s}".format(season, str(e)), 'warn')
 
 
-def read_final_games(games, season):
+def _fetch_final_game(season, game):
     """
+    Downloads raw pbp and toi for this game and decodes them, without parsing. Raw files are saved on the background
+    writer (see general_helpers.write_in_background). Runs in worker threads, so it must not touch the schedule or
+    player files; exceptions are returned to the caller instead of raised.
 
-    :param games:
-    :param season:
+    :param season: int, the season
+    :param game: int, the game
 
-    :return:
+    :return: (pages, errors). Both dicts with keys 'pbp' and 'toi'. pages holds the decoded json, or None if
+        downloaded to file only (html toi) or if download failed; errors holds the exception raised, or None.
     """
-    for game in tqdm(games, desc="Parsing Games"):
-        try:
-            scrape_pbp.scrape_game_pbp(season, game, True)
-            manipulate_schedules.update_schedule_with_pbp_scrape(season, game)
-            parse_pbp.parse_game_pbp(season, game, True)
-        except requests.exceptions.HTTPError as he:
-            print('Could not access pbp url for {0:d} {1:d}'.format(season, game))
-            print(str(he))
-        except requests.exceptions.ConnectionError as ue:
-            print('Could not access pbp url for {0:d} {1:d}'.format(season, game))
-            print(str(ue))
-        except Exception as e:
-            print(str(e))
-        try:
-            # TODO update only a couple of days later from json and delete html and don't update with toi scrape until then
-            if season < 2010:
+    pages = {'pbp': None, 'toi': None}
+    errors = {'pbp': None, 'toi': None}
+    try:
+        pages['pbp'] = scrape_pbp.scrape_game_pbp_to_memory(season, game)
+    except Exception as e:
+        errors['pbp'] = e
+    try:
+        if season < 2010:
+            scrape_toi.scrape_game_toi_from_html(season, game, True)
+        else:
+            pages['toi'] = scrape_toi.scrape_game_toi_to_memory(season, game)
+    except Exception as e:
+        errors['toi'] = e
+    return pages, errors
+
+
+def fetch_final_games(games, season, workers=DEFAULT_FETCH_WORKERS):
+    """
+    Downloads raw pbp and toi for these games using a pool of threads, yielding each game as its download finishes.
+    All threads share the per-host token buckets in general_helpers.try_url_n_times.
+
+    :param games: list of int
+    :param season: int, the season
+    :param workers: int, number of threads
+
+    :return: generator of (game, pages, errors) tuples, with pages and errors as returned by _fetch_final_game
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(_fetch_final_game, season, game): game for game in games}
+        for future in as_completed(futures):
+            pages, errors = future.result()
+            yield futures[future], pages, errors
+
+
+def _parse_final_game(season, game, pages, errors):
+    """
+    Parses pbp and toi downloaded by _fetch_final_game straight from memory, and updates the schedule accordingly.
+
+    :param season: int, the season
+    :param game: int, the game
+    :param pages: dict, as returned by _fetch_final_game
+    :param errors: dict, as returned by _fetch_final_game
+
+    :return: nothing
+    """
+    try:
+        if errors['pbp'] is not None:
+            raise errors['pbp']
+        manipulate_schedules.update_schedule_with_pbp_scrape(season, game)
+        parse_pbp.parse_game_pbp_from_page(pages['pbp'], season, game)
+    except requests.exceptions.HTTPError as he:
+        print('Could not access pbp url for {0:d} {1:d}'.format(season, game))
+        print(str(he))
+    except requests.exceptions.ConnectionError as ue:
+        print('Could not access pbp url for {0:d} {1:d}'.format(season, game))
+        print(str(ue))
+    except Exception as e:
+        print(str(e))
+    try:
+        if errors['toi'] is not None:
+            raise errors['toi']
+        # TODO update only a couple of days later from json and delete html and don't update with toi scrape until then
+        if season < 2010:
+            manipulate_schedules.update_schedule_with_toi_scrape(season, game)
+            parse_toi.parse_game_toi_from_html(season, game, True)
+        else:
+            manipulate_schedules.update_schedule_with_toi_scrape(season, game)
+            parse_toi.parse_game_toi_from_page(pages['toi'], season, game)
+
+            # If you scrape soon after a game the json only has like the first period for example.
+            # If I don't have the full game, use html
+            if len(parse_toi.get_parsed_toi(season, game)) < 3600:
+                print('Not enough rows in json for {0:d} {1:d}; reading from html'.format(int(season), int(game)))
                 scrape_toi.scrape_game_toi_from_html(season, game, True)
-                manipulate_schedules.update_schedule_with_toi_scrape(season, game)
                 parse_toi.parse_game_toi_from_html(season, game, True)
-            else:
-                scrape_toi.scrape_game_toi(season, game, True)
-                manipulate_schedules.update_schedule_with_toi_scrape(season, game)
-                parse_toi.parse_game_toi(season, game, True)
-
-                # If you scrape soon after a game the json only has like the first period for example.
-                # If I don't have the full game, use html
-                if len(parse_toi.get_parsed_toi(season, game)) < 3600:
-                    print('Not enough rows in json for {0:d} {1:d}; reading from html'.format(int(season), int(game)))
-                    scrape_toi.scrape_game_toi_from_html(season, game, True)
-                    parse_toi.parse_game_toi_from_html(season, game, True)
-        except (
-            requests.exceptions.HTTPError,
-            requests.exceptions.ReadTimeout,
-        ) as he:
-            print('Could not access toi url for {0:d} {1:d}'.format(season, game))
-            print(str(he))
-        except Exception as e:
-            print(str(e))
+    except (
+        requests.exceptions.HTTPError,
+        requests.exceptions.ReadTimeout,
+        requests.exceptions.ConnectionError,
+    ) as he:
+        print('Could not access toi url for {0:d} {1:d}'.format(season, game))
+        print(str(he))
+    except Exception as e:
+        print(str(e))
 
-        print('Done with {0:d} {1:d} (final)'.format(season, game))
+    print('Done with {0:d} {1:d} (final)'.format(season, game))
+
+
+def read_final_games(games, season, workers=DEFAULT_FETCH_WORKERS):
+    """
+    Scrapes and parses these games. Downloads run in a pool of threads; parsing happens in this thread as each
+    download finishes, since parsing writes to the schedule and player files. Pages are parsed from memory, and raw
+    files are written in the background; this waits for those writes before returning, then compacts the season's
+    parsed games (see parsed_store). Prints a throughput report at the end.
+
+    :param games: list of int
+    :param season: int, the season
+    :param workers: int, number of threads downloading games at once
+
+    :return: nothing
+    """
+    helpers.reset_url_stats()
+    starttime = time.perf_counter()
+    for game, pages, errors in tqdm(fetch_final_games(games, season, workers), total=len(games),
+                                    desc="Parsing Games"):
+        _parse_final_game(season, game, pages, errors)
+    helpers.flush_background_writes()
+    if len(games) > 0:
+        parsed_store.compact_season('pbp', season)
+        parsed_store.compact_season('shifts', season)
+    _report_throughput(len(games), time.perf_counter() - starttime)
+
+
+def _report_throughput(numgames, elapsed):
+    """
+    Prints and logs games/sec, bytes/sec, retries, rate limiter waits, backoff, and requests saved by circuit breakers,
+    using counters from general_helpers.try_url_n_times.
+
+    :param numgames: int, number of games scraped
+    :param elapsed: float, seconds elapsed
+
+    :return: nothing
+    """
+    if numgames == 0:
+        return
+    stats = helpers.get_url_stats()
+    elapsed = max(elapsed, 1e-9)
+    helpers.print_and_log('Scraped {0:d} games in {1:.1f} s: {2:.2f} games/s, {3:.1f} KB/s, '
+                          '{4:d} requests, {5:d} retries, {6:d} failures, {7:.1f} s waiting on rate limits'.format(
+                              numgames, elapsed, numgames / elapsed, stats['bytes'] / 1024 / elapsed,
+                              stats['requests'], stats['retries'], stats['failures'],
+                              stats['limiter_wait_secs']))
+    if stats['retries'] > 0 or stats['short_circuited'] > 0:
+        helpers.print_and_log('{0:.1f} s backing off before retries; {1:d} calls refused by open circuit breakers, '
+                              'saving {2:d} requests'.format(stats['backoff_secs'], stats['short_circuited'],
+                                                              stats['requests_saved']))
 
 
 def read_inprogress_games(inprogressgames, season):
     """
-    Saves these games to file via html (for toi) and json (for pbp)
+    Saves these games to file via html (for toi) and json (for pbp). Pages are requested conditionally, and a page
+    that has not changed since the last poll is neither downloaded nor re-parsed. Pages that have changed are parsed
+    incrementally: only events and shifts added since the last poll are parsed and appended.
 
     :param inprogressgames: list of int
 
@@ -160,8 +288,18 @@ def read_inprogress_games(inprogressgames, season):
         # scrape_game_pbp_from_html(season, game, False)
         # parse_game_pbp_from_html(season, game, False)
         # PBP JSON updates live, so I can just use that, as before
-        scrape_pbp.scrape_game_pbp(season, game, True)
-        scrape_toi.scrape_game_toi_from_html(season, game, True)
-        parse_pbp.parse_game_pbp(season, game, True)
-        parse_toi.parse_game_toi_from_html(season, game, True)
+        # Each page is parsed as soon as it is scraped. Its validators are already stored, so if it were skipped
+        # because the other page failed, the next poll would get a 304 and it would not be parsed until it changed.
+        try:
+            if scrape_pbp.scrape_game_pbp(season, game, True, conditional=True):
+                parse_pbp.parse_game_pbp(season, game, True, incremental=True)
+        except (requests.exceptions.HTTPError, requests.exceptions.ConnectionError) as he:
+            print('Could not access pbp url for {0:d} {1:d}'.format(season, game))
+            print(str(he))
+        try:
+            if scrape_toi.scrape_game_toi_from_html(season, game, True, conditional=True):
+                parse_toi.parse_game_toi_from_html(season, game, True, incremental=True)
+        except (requests.exceptions.HTTPError, requests.exceptions.ConnectionError) as he:
+            print('Could not access toi urls for {0:d} {1:d}'.format(season, game))
+            print(str(he))
         print('Done with {0:d} {1:d} (in progress)'.format(season, game))
@@ -0,0 +1,111 @@
+"""
+This module contains methods for converting game clock readings--a period and an m:ss time--to seconds elapsed in
+game. All of them work on whole columns (lists, arrays or series) at once.
+
+Periods can be numbers (1, 2, 3, 4, ...; also as strings or floats) or 'OT' and 'SO'. Regular season OT starts at
+3600 seconds and is five minutes long, so the shootout is at 3900.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Common to see semicolon in place of colon, and shifted digits (! instead of 1, @ instead of 2, etc) in hand-typed
+# times
+_TYPO_TABLE = str.maketrans({';': ':', '!': '1', '@': '2', '#': '3', '$': '4', '%': '5', '^': '6', '&': '7',
+                             '*': '8', '(': '9', ')': '0'})
+
+# Elapsed seconds at the start and end of named periods
+_PERIOD_STARTS = {'OT': 3600, 'SO': 3900}
+_PERIOD_ENDS = {'OT': 3900, 'SO': 3900}
+
+
+def fix_typos(times):
+    """
+    Fixes common typos in m:ss times: ; for :, and shifted digits.
+
+    :param times: list, array or series of str
+
+    :return: series of str
+    """
+    return pd.Series(times, dtype=object).str.translate(_TYPO_TABLE)
+
+
+def mmss_to_secs(times):
+    """
+    Converts times from m:ss to seconds.
+
+    :param times: list, array or series of str, m:ss
+
+    :return: array of int (or float, if any times are missing)
+    """
+    if len(times) == 0:
+        return np.zeros(0, dtype=np.int64)
+    parts = pd.Series(times, dtype=object).str.partition(':')
+    return 60 * pd.to_numeric(parts[0]).values + pd.to_numeric(parts[2]).values
+
+
+def _period_secs(periods, named, offset):
+    """
+    Returns 1200 * (period + offset) for numbered periods, and named[period] for the rest.
+
+    :param periods: list, array or series
+    :param named: dict, seconds for named periods. Anything else not numbered gets the shootout's.
+    :param offset: int
+
+    :return: array of int (or float, if periods are floats)
+    """
+    if len(periods) == 0:
+        return np.zeros(0, dtype=np.int64)
+    periods = pd.Series(periods)
+    numbers = pd.to_numeric(periods, errors='coerce')
+    secs = 1200 * (numbers.values + offset)
+    unnumbered = numbers.isnull().values
+    if unnumbered.any():
+        secs = secs.astype(float)
+        secs[unnumbered] = [named.get(x, named['SO']) for x in periods.values[unnumbered]]
+        if (secs == np.round(secs)).all():
+            secs = secs.astype(np.int64)
+    return secs
+
+
+def period_start_secs(periods):
+    """
+    Returns seconds elapsed in game at the start of each period.
+
+    :param periods: list, array or series, e.g. [1, 2, 3, 'OT']
+
+    :return: array of int
+    """
+    return _period_secs(periods, _PERIOD_STARTS, -1)
+
+
+def period_end_secs(periods):
+    """
+    Returns seconds elapsed in game at the end of each period.
+
+    :param periods: list, array or series, e.g. [1, 2, 3, 'OT']
+
+    :return: array of int
+    """
+    return _period_secs(periods, _PERIOD_ENDS, 0)
+
+
+def to_game_secs(periods, times, time_format='elapsed', correct_typos=False):
+    """
+    Converts periods and m:ss times to seconds elapsed in game.
+
+    :param periods: list, array or series, e.g. [1, 2, 3, 'OT']
+    :param times: list, array or series of str, m:ss
+    :param time_format: str, 'elapsed' or 'remaining'. E.g. 120 secs elapsed in the 2nd period might be listed as 2:00
+        (elapsed), or as 18:00 (remaining).
+    :param correct_typos: bool. If True, fixes typos in times first (see fix_typos).
+
+    :return: array of int (or float, if any times are missing)
+    """
+    if correct_typos:
+        times = fix_typos(times)
+    if time_format == 'elapsed':
+        return period_start_secs(periods) + mmss_to_secs(times)
+    if time_format == 'remaining':
+        return period_end_secs(periods) - mmss_to_secs(times)
+    raise ValueError('Unknown time format {0:s}; use elapsed or remaining'.format(str(time_format)))
@@ -2,13 +2,20 @@
 This module contains general helper methods. None of these methods have dependencies on other scrapenhl2 modules.
 """
 
+import asyncio
 import functools
+import json
 import logging
 import os
 import os.path
 import pickle
+import queue
+import random
 import re
+import threading
 import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import requests
 
 import numpy as np
@@ -16,6 +23,41 @@ import pandas as pd
 from fuzzywuzzy import fuzz
 
 __SESSION__ = None
+_SESSION_LOCK = threading.Lock()
+
+# Default budget for each host: sustained requests per second, and how many may go out back-to-back.
+DEFAULT_HOST_RATE = 1
+DEFAULT_HOST_BURST = 3
+_HOST_LIMITS = {}
+_HOST_BUCKETS = {}
+_HOST_BUCKETS_LOCK = threading.Lock()
+
+# Retries back off exponentially from DEFAULT_BACKOFF_BASE secs, capped at DEFAULT_BACKOFF_CAP, with full jitter.
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 30
+# Statuses worth retrying. Anything else 4xx or 5xx fails straight away.
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# A host's circuit opens after this many consecutive failed requests, and lets a trial request through after this
+# many secs.
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_SECS = 60
+_HOST_BREAKERS = {}
+_HOST_BREAKERS_LOCK = threading.Lock()
+
+_URL_STATS = {}
+_URL_STATS_LOCK = threading.Lock()
+
+# Where pages are scraped from. Override (e.g. to point at scrapenhl2.scrape.replay_server) with set_base_url or the
+# SCRAPENHL2_STATSAPI_URL and SCRAPENHL2_NHL_URL environment variables.
+DEFAULT_BASE_URLS = {'statsapi': 'https://statsapi.web.nhl.com',
+                     'nhl': 'http://www.nhl.com'}
+_BASE_URLS = {'statsapi': os.environ.get('SCRAPENHL2_STATSAPI_URL', DEFAULT_BASE_URLS['statsapi']),
+              'nhl': os.environ.get('SCRAPENHL2_NHL_URL', DEFAULT_BASE_URLS['nhl'])}
+
+_BACKGROUND_QUEUE = queue.Queue()
+_BACKGROUND_THREAD = None
+_BACKGROUND_LOCK = threading.Lock()
 
 
 def print_and_log(message, level='info', print_and_log=True):
@@ -40,21 +82,257 @@ def print_and_log(message, level='info', print_and_log=True):
         logging.info(message)
 
 
+class TokenBucket(object):
+    """
+    A token bucket rate limiter that is safe to share across threads and coroutines.
+
+    Tokens refill continuously at rate per second, up to capacity (the allowed burst). Each acquire takes one token.
+    If none is available the caller reserves the next one and sleeps until it is due; the lock is only held for
+    that bookkeeping, never while sleeping, so waiting callers are served in order without blocking each other.
+    """
+
+    def __init__(self, rate=DEFAULT_HOST_RATE, capacity=DEFAULT_HOST_BURST):
+        """
+        :param rate: float, tokens added per second
+        :param capacity: float, max tokens stored, i.e. the max burst
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waits = 0
+        self.wait_secs = 0.0
+
+    def _reserve(self, tokens=1):
+        """
+        Takes tokens from the bucket, going into debt if need be, and returns how long the caller must wait.
+
+        :param tokens: float, number of tokens
+
+        :return: float, seconds to wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            wait = max(0.0, -self._tokens / self.rate)
+            self.acquired += 1
+            if wait > 0:
+                self.waits += 1
+                self.wait_secs += wait
+            return wait
+
+    def acquire(self, tokens=1):
+        """
+        Blocks this thread until tokens are available.
+
+        :param tokens: float, number of tokens
+
+        :return: float, seconds waited
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """
+        Like acquire, but yields to the event loop while waiting.
+
+        :param tokens: float, number of tokens
+
+        :return: float, seconds waited
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self):
+        """
+        Returns counters for this bucket.
+
+        :return: dict with acquired, waits (number of acquires that had to wait), and wait_secs
+        """
+        with self._lock:
+            return {'acquired': self.acquired, 'waits': self.waits, 'wait_secs': self.wait_secs}
+
+
+def set_host_rate_limit(host, rate=DEFAULT_HOST_RATE, burst=DEFAULT_HOST_BURST):
+    """
+    Sets the request budget for given host. Applies process-wide, to all threads.
+
+    :param host: str, e.g. statsapi.web.nhl.com
+    :param rate: float, sustained requests per second
+    :param burst: float, max requests that may go out back-to-back
+
+    :return: nothing
+    """
+    with _HOST_BUCKETS_LOCK:
+        _HOST_LIMITS[host] = (rate, burst)
+        _HOST_BUCKETS[host] = TokenBucket(rate, burst)
+
+
+def get_host_rate_limiter(url):
+    """
+    Returns the token bucket shared by all requests to the host of this url, creating it if need be.
+
+    :param url: str, a url or a bare host
+
+    :return: TokenBucket
+    """
+    host = _get_host(url) or url
+    with _HOST_BUCKETS_LOCK:
+        if host not in _HOST_BUCKETS:
+            rate, burst = _HOST_LIMITS.get(host, (DEFAULT_HOST_RATE, DEFAULT_HOST_BURST))
+            _HOST_BUCKETS[host] = TokenBucket(rate, burst)
+        return _HOST_BUCKETS[host]
+
+
+def get_rate_limiter_stats():
+    """
+    Returns counters for each host's rate limiter, including how long callers spent waiting on it.
+
+    :return: dict of host to dict (see TokenBucket.get_stats)
+    """
+    with _HOST_BUCKETS_LOCK:
+        buckets = dict(_HOST_BUCKETS)
+    return {host: bucket.get_stats() for host, bucket in buckets.items()}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of sending a request to a host whose circuit breaker is open.
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    A circuit breaker for one host, safe to share across threads.
+
+    Closed: requests go through. After failure_threshold consecutive failures it opens: requests fail fast without
+    being sent. After reset_secs it lets one trial request through (half-open); if that succeeds it closes again,
+    and if not it opens for another reset_secs.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_BREAKER_THRESHOLD, reset_secs=DEFAULT_BREAKER_RESET_SECS):
+        """
+        :param failure_threshold: int, consecutive failures before opening
+        :param reset_secs: float, secs to stay open before letting a trial request through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_secs = reset_secs
+        self._failures = 0
+        self._opened_at = None
+        self._trial_out = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Checks if a request may be sent now. When half-open, only the first caller is let through.
+
+        :return: bool
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial_out and time.monotonic() - self._opened_at >= self.reset_secs:
+                self._trial_out = True
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Closes the circuit.
+
+        :return: nothing
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_out = False
+
+    def record_failure(self):
+        """
+        Counts a failure, opening the circuit if there have been too many in a row (or if the trial request failed).
+
+        :return: nothing
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial_out or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial_out = False
+
+    def is_open(self):
+        """
+        :return: bool, True if requests are currently being refused (half-open counts as open)
+        """
+        with self._lock:
+            return self._opened_at is not None
+
+
+def get_host_circuit_breaker(url):
+    """
+    Returns the circuit breaker shared by all requests to the host of this url, creating it if need be.
+
+    :param url: str, a url or a bare host
+
+    :return: CircuitBreaker
+    """
+    host = _get_host(url) or url
+    with _HOST_BREAKERS_LOCK:
+        if host not in _HOST_BREAKERS:
+            _HOST_BREAKERS[host] = CircuitBreaker()
+        return _HOST_BREAKERS[host]
+
+
+def reset_circuit_breakers():
+    """
+    Closes all circuit breakers (by forgetting them).
+
+    :return: nothing
+    """
+    with _HOST_BREAKERS_LOCK:
+        _HOST_BREAKERS.clear()
+
+
+def get_backoff_secs(tries, base=DEFAULT_BACKOFF_BASE, cap=DEFAULT_BACKOFF_CAP):
+    """
+    Returns how long to wait before the next try: a random amount up to base * 2 ** tries, capped ("full jitter", so
+    many threads retrying at once spread out rather than hitting the host in waves).
+
+    :param tries: int, number of tries made so far, minus one
+    :param base: float, secs
+    :param cap: float, secs
+
+    :return: float, secs
+    """
+    return random.uniform(0, min(cap, base * 2 ** tries))
+
+
 def once_per_second(fn, calls_per_second=1):
     """
-    A decorator that sleeps for one second after executing the function. Used when scraping NHL site.
-    This also means all functions that access the internet sleep for a second.
+    A decorator that limits the function to calls_per_second calls per second, across all threads.
 
     :param fn: the function
+    :param calls_per_second: float
 
-    :return: nothing
+    :return: the wrapped function
     """
+    bucket = TokenBucket(calls_per_second, 1)
 
     @functools.wraps(fn)
     def wrapper(*args, **kwargs):
-        time.sleep(1 / calls_per_second)
+        bucket.acquire()
         return fn(*args, **kwargs)
 
+    return wrapper
+
 
 def log_exceptions(fn):
     """
@@ -334,40 +612,305 @@ def get_initials(pname):
     return ''.join([part[0] for part in pname.split(' ')])
 
 
+def _get_session():
+    """
+    Returns the requests session shared by all scraping threads, creating it if need be.
+
+    :return: requests.Session
+    """
+    global __SESSION__
+    with _SESSION_LOCK:
+        if __SESSION__ is None:
+            __SESSION__ = requests.Session()
+    return __SESSION__
+
+
+def set_base_url(site, url=None):
+    """
+    Sets the scheme and host that urls for this site are built from.
+
+    :param site: str, 'statsapi' (the NHL API, statsapi.web.nhl.com) or 'nhl' (html reports and shift charts,
+        www.nhl.com)
+    :param url: str, e.g. http://127.0.0.1:8000, or None to restore the default
+
+    :return: nothing
+    """
+    if site not in DEFAULT_BASE_URLS:
+        raise ValueError('Unknown site {0:s}; use one of {1:s}'.format(str(site), ', '.join(DEFAULT_BASE_URLS)))
+    _BASE_URLS[site] = (DEFAULT_BASE_URLS[site] if url is None else url).rstrip('/')
+
+
+def get_base_url(site):
+    """
+    Returns the scheme and host that urls for this site are built from. See set_base_url.
+
+    :param site: str, 'statsapi' or 'nhl'
+
+    :return: str, e.g. https://statsapi.web.nhl.com
+    """
+    return _BASE_URLS[site]
+
+
+def _get_host(url):
+    """
+    Returns the host (e.g. statsapi.web.nhl.com) of given url
+
+    :param url: str
+
+    :return: str
+    """
+    return urllib.parse.urlparse(url).netloc
+
+
+def reset_url_stats():
+    """
+    Resets the counters kept by try_url_n_times (requests, bytes, retries, failures, 304s, limiter waits, backoff,
+    circuit breaker refusals and the requests they saved) to zero.
+
+    :return: nothing
+    """
+    with _URL_STATS_LOCK:
+        _URL_STATS.clear()
+        _URL_STATS.update({'requests': 0, 'bytes': 0, 'retries': 0, 'failures': 0, 'not_modified': 0,
+                           'limiter_wait_secs': 0.0, 'backoff_secs': 0.0, 'short_circuited': 0,
+                           'requests_saved': 0})
+
+
+def _add_to_url_stats(**kwargs):
+    """
+    Thread-safe increment of url counters.
+
+    :param kwargs: counter name to amount, e.g. requests=1
+
+    :return: nothing
+    """
+    with _URL_STATS_LOCK:
+        for key, val in kwargs.items():
+            _URL_STATS[key] = _URL_STATS.get(key, 0) + val
+
+
+def get_url_stats():
+    """
+    Returns a copy of the counters kept by try_url_n_times since the last reset_url_stats().
+
+    :return: dict of str to number: requests, bytes, retries, failures, not_modified, limiter_wait_secs, backoff_secs,
+        short_circuited (calls refused by an open circuit breaker), and requests_saved (tries those calls would have
+        made)
+    """
+    with _URL_STATS_LOCK:
+        return dict(_URL_STATS)
+
+
+reset_url_stats()
+
+
 def try_url_n_times(url, timeout=5, n=5):
     """
     A helper method that tries to access given url up to five times, returning the page.
 
+    Every try goes through the token bucket for the url's host (see get_host_rate_limiter), so this is safe to call
+    from several threads at once. See try_url_response_n_times for retries and errors.
+
     :param url: str, the url to access
     :param timeout: int, number of secs to wait before timeout. Default 5.
     :param n: int, the max number of tries. Default 5.
 
-    :return: bytes
+    :return: bytes, or None if the host could not be reached
+
+    :raises requests.HTTPError: if the url answered with an error status
+    :raises CircuitOpenError: if the host has been failing and its circuit breaker is open
     """
+    resp = try_url_response_n_times(url, timeout, n)
+    if resp is None:
+        return None
+    return resp.text
 
-    global __SESSION__
-    if __SESSION__ is None:
-        __SESSION__ = requests.Session()
 
+def try_url_response_n_times(url, timeout=5, n=5, headers=None):
+    """
+    Like try_url_n_times, but returns the response itself, so callers can read status and headers. Use headers to
+    send a conditional request; a 304 (Not Modified) response is returned as-is and counted in get_url_stats().
+
+    Timeouts, connection errors, and statuses in RETRY_STATUSES are retried after a jittered exponential backoff (see
+    get_backoff_secs; a Retry-After header is honored if longer). Other error statuses, like 404, are not retried.
+
+    Failures count against the host's circuit breaker (see get_host_circuit_breaker). While it is open, this raises
+    CircuitOpenError without sending anything, and the tries not made are counted as requests_saved.
+
+    :param url: str, the url to access
+    :param timeout: int, number of secs to wait before timeout. Default 5.
+    :param n: int, the max number of tries. Default 5.
+    :param headers: dict or None, extra request headers
+
+    :return: requests.Response, or None if all tries failed to reach the host
 
-    page = None
+    :raises requests.HTTPError: if the last try got an error status
+    :raises CircuitOpenError: if the host's circuit breaker is open
+    """
+
+    session = _get_session()
+    breaker = get_host_circuit_breaker(url)
+
+    resp = None
     for tries in range(n):
+        if not breaker.allow():
+            _add_to_url_stats(short_circuited=1, requests_saved=n - tries, failures=1)
+            raise CircuitOpenError('Not trying {0:s}; too many recent failures on this host'.format(url))
+        if tries > 0:
+            _add_to_url_stats(retries=1)
+        waited = get_host_rate_limiter(url).acquire()
+        _add_to_url_stats(requests=1, limiter_wait_secs=waited)
+
+        resp = None
+        retry_after = 0
         try:
-            resp = __SESSION__.get(url, timeout=5)
-            page = resp.text
-            break
-        except requests.HTTPError as httpe:
-            if '404' in str(httpe):
+            resp = session.get(url, timeout=timeout, headers=headers)
+            _add_to_url_stats(bytes=len(resp.content))
+            if resp.status_code < 400:
+                if resp.status_code == 304:
+                    _add_to_url_stats(not_modified=1)
+                breaker.record_success()
+                return resp
+            if resp.status_code not in RETRY_STATUSES:
+                # The host is fine; the page just isn't there (or we can't have it). No point retrying.
+                breaker.record_success()
                 break
-            else:
-                print('HTTP error with', url, httpe, httpe.args)
-        except requests.exceptions.ReadTimeout as rt:
-            print(rt)
-            print('Failed on try {} on url {}'.format(tries, url))
-        except Exception as e:  # timeout
+            breaker.record_failure()
+            print('HTTP {0:d} from {1:s}; try {2:d} of {3:d}'.format(resp.status_code, url, tries + 1, n))
+            retry_after = _get_retry_after_secs(resp)
+        except requests.exceptions.RequestException as e:  # timeout, connection error
+            breaker.record_failure()
             print(e)
-            print('Could not access {0:s}; try {1:d} of {2:d}'.format(url, tries, n))
-    return page
+            print('Could not access {0:s}; try {1:d} of {2:d}'.format(url, tries + 1, n))
+
+        if tries < n - 1:
+            backoff = max(retry_after, get_backoff_secs(tries))
+            _add_to_url_stats(backoff_secs=backoff)
+            time.sleep(backoff)
+
+    _add_to_url_stats(failures=1)
+    if resp is not None:
+        resp.raise_for_status()
+    return None
+
+
+def _get_retry_after_secs(resp):
+    """
+    Reads the Retry-After header (in secs; the HTTP-date form is ignored).
+
+    :param resp: requests.Response
+
+    :return: float, secs, or 0 if absent
+    """
+    try:
+        return min(float(resp.headers.get('Retry-After', 0)), DEFAULT_BACKOFF_CAP)
+    except (TypeError, ValueError):
+        return 0
+
+
+def write_in_background(fn, *args, **kwargs):
+    """
+    Queues fn(*args, **kwargs) to run on a single background thread, for writes that nothing downstream waits on
+    (e.g. saving raw pages that have already been parsed from memory). Calls run in the order queued. Exceptions are
+    logged, not raised. Use flush_background_writes() before relying on the files being on disk.
+
+    :param fn: function
+    :param args: positional arguments for fn
+    :param kwargs: keyword arguments for fn
+
+    :return: nothing
+    """
+    global _BACKGROUND_THREAD
+    with _BACKGROUND_LOCK:
+        if _BACKGROUND_THREAD is None or not _BACKGROUND_THREAD.is_alive():
+            _BACKGROUND_THREAD = threading.Thread(target=_run_background_writes, name='scrapenhl2-writer', daemon=True)
+            _BACKGROUND_THREAD.start()
+    _BACKGROUND_QUEUE.put((fn, args, kwargs))
+
+
+def _run_background_writes():
+    """
+    Worker loop for write_in_background.
+
+    :return: nothing
+    """
+    while True:
+        fn, args, kwargs = _BACKGROUND_QUEUE.get()
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            print_and_log('Background write {0:s} failed: {1:s}'.format(getattr(fn, '__name__', str(fn)), str(e)),
+                          'warn')
+        finally:
+            _BACKGROUND_QUEUE.task_done()
+
+
+def flush_background_writes():
+    """
+    Blocks until everything queued with write_in_background has run.
+
+    :return: nothing
+    """
+    _BACKGROUND_QUEUE.join()
+
+
+def map_in_processes(fn, arglists, workers=1):
+    """
+    Calls fn(*args) for each args in arglists in a pool of worker processes, yielding results as they finish. With one
+    worker, calls them in this process instead, in order. fn must be defined at module level, and its args and results
+    picklable. If the caller stops early, calls not yet started are cancelled.
+
+    :param fn: function
+    :param arglists: list of tuples
+    :param workers: int, number of processes
+
+    :return: generator of results of fn
+    """
+    if workers <= 1:
+        for args in arglists:
+            yield fn(*args)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(fn, *args) for args in arglists]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def read_json_file(filename, default=None):
+    """
+    Reads a json file, returning default if it does not exist or cannot be decoded.
+
+    :param filename: str
+    :param default: obj
+
+    :return: obj, the decoded json
+    """
+    if not os.path.exists(filename):
+        return default
+    try:
+        with open(filename, 'r') as reader:
+            return json.load(reader)
+    except ValueError:
+        return default
+
+
+def write_json_file(obj, filename):
+    """
+    Writes obj to filename as json. Writes to a temporary file first, so readers never see a partial file.
+
+    :param obj: a json-serializable object
+    :param filename: str
+
+    :return: nothing
+    """
+    with open(filename + '.tmp', 'w') as writer:
+        json.dump(obj, writer)
+    os.replace(filename + '.tmp', filename)
+
 
 def melt_helper(df, **kwargs):
     """
@@ -0,0 +1,104 @@
+"""
+This module contains an on-disk cache of HTTP validators (ETag and Last-Modified) keyed by url.
+
+It is meant for pages polled repeatedly, like the live game feed and html shift reports of in-progress games. The
+page itself is not cached here--callers already keep it in the raw data folders--so only use a conditional request
+when you still have the page from the last successful scrape.
+"""
+
+import hashlib
+import os.path
+
+import requests
+
+import scrapenhl2.scrape.general_helpers as helpers
+import scrapenhl2.scrape.organization as organization
+
+
+def get_validators_filename(url):
+    """
+    Returns the filename holding validators for this url
+
+    :param url: str
+
+    :return: str, /scrape/data/cache/http/[sha1 of url].json
+    """
+    return os.path.join(organization.get_http_cache_folder(), hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+
+def get_validators(url):
+    """
+    Reads validators stored for this url from disk.
+
+    :param url: str
+
+    :return: dict with keys ETag and/or Last-Modified. Empty if nothing stored.
+    """
+    dct = helpers.read_json_file(get_validators_filename(url), {})
+    if dct.get('url') != url:
+        return {}
+    return {key: dct[key] for key in ('ETag', 'Last-Modified') if dct.get(key) is not None}
+
+
+def save_validators(url, response):
+    """
+    Writes the ETag and Last-Modified headers of this response to disk. If the response has neither, removes any
+    stored validators, since the next request can't be conditional anyway.
+
+    :param url: str
+    :param response: requests.Response
+
+    :return: nothing
+    """
+    dct = {'url': url,
+           'ETag': response.headers.get('ETag'),
+           'Last-Modified': response.headers.get('Last-Modified')}
+    if dct['ETag'] is None and dct['Last-Modified'] is None:
+        remove_validators(url)
+        return
+    helpers.write_json_file(dct, get_validators_filename(url))
+
+
+def remove_validators(url):
+    """
+    Deletes validators stored for this url, if any. Do this when you delete the page they describe.
+
+    :param url: str
+
+    :return: nothing
+    """
+    filename = get_validators_filename(url)
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+def get_url_if_modified(url, use_validators=True, timeout=5, n=5):
+    """
+    Accesses url, sending If-None-Match and If-Modified-Since with validators stored from the last call, and stores
+    validators from the response for next time.
+
+    :param url: str, the url to access
+    :param use_validators: bool. If False, sends a plain request (e.g. because the page from last time is gone) but
+        still stores validators from the response.
+    :param timeout: int, number of secs to wait before timeout
+    :param n: int, the max number of tries
+
+    :return: (page, modified). page is str, or None if not modified. modified is False only when the server answered
+        304 (Not Modified).
+
+    :raises requests.ConnectionError: if all tries failed to reach the host
+    """
+    validators = get_validators(url) if use_validators else {}
+    headers = {}
+    if 'ETag' in validators:
+        headers['If-None-Match'] = validators['ETag']
+    if 'Last-Modified' in validators:
+        headers['If-Modified-Since'] = validators['Last-Modified']
+
+    resp = helpers.try_url_response_n_times(url, timeout, n, headers=headers)
+    if resp is None:
+        raise requests.exceptions.ConnectionError('Could not access {0:s}'.format(url))
+    if resp.status_code == 304:
+        return None, False
+    save_validators(url, resp)
+    return resp.text, True
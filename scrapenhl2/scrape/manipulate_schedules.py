@@ -21,9 +21,26 @@ def update_schedule_with_result(season, game, result):
     if result is None:
         result = 'N/A'
 
+    update_schedule_with_games(season, {game: {'Result': result}})
+
+
+def update_schedule_with_games(season, updates):
+    """
+    Updates the season schedule file with new values for any number of games, in one write.
+
+    :param season: int, the season
+    :param updates: dict of game: dict of column: value, e.g. {20001: {'Result': 'W', 'HomeCoach': 'Barry Trotz'}}
+
+    :return: nothing
+    """
+    if len(updates) == 0:
+        return
+
     # Edit relevant schedule files
     df = schedules.get_season_schedule(season)
-    df.loc[df.Game == game, 'Result'] = result
+    for game, values in updates.items():
+        for col, value in values.items():
+            df.loc[df.Game == game, col] = value
 
     # Write to file and refresh schedule in memory
     schedules.write_season_schedule(df, season, True)
@@ -47,13 +64,7 @@ def _update_schedule_with_coaches(season, game, homecoach, roadcoach):
     if roadcoach is None:
         roadcoach = 'N/A'
 
-    # Edit relevant schedule files
-    df = schedules.get_season_schedule(season)
-    df.loc[df.Game == game, 'HomeCoach'] = homecoach
-    df.loc[df.Game == game, 'RoadCoach'] = roadcoach
-
-    # Write to file and refresh schedule in memory
-    schedules.write_season_schedule(df, season, True)
+    update_schedule_with_games(season, {game: {'HomeCoach': homecoach, 'RoadCoach': roadcoach}})
 
 
 def update_schedule_with_pbp_scrape(season, game):
@@ -102,6 +113,22 @@ def update_schedule_with_result_using_pbp(pbp, season, game):
 
     :return: nothing
     """
+    result = get_result_from_pbp(pbp, season, game)
+    if result is False:
+        return False
+    update_schedule_with_result(season, game, result)
+
+
+def get_result_from_pbp(pbp, season, game):
+    """
+    Uses the PbP to get the result for this game, from the home team's perspective.
+
+    :param pbp: json, the pbp for this game
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: str, e.g. W or OTL; None if it can't be told; or False if the game is not final yet
+    """
 
     gameinfo = schedules.get_game_data_from_schedule(season, game)
     result = None  # In case they have the same score. Like 2006 10009 has incomplete data, shows 0-0
@@ -138,7 +165,7 @@ def update_schedule_with_result_using_pbp(pbp, season, game):
             elif gameinfo['RoadScore'] > gameinfo['HomeScore']:
                 result = 'L'
 
-    update_schedule_with_result(season, game, result)
+    return result
 
 
 def update_schedule_with_coaches(pbp, season, game):
@@ -151,9 +178,41 @@ def update_schedule_with_coaches(pbp, season, game):
 
     :return: nothing
     """
+    _update_schedule_with_coaches(season, game, *get_coaches_from_pbp(pbp))
+
+
+def get_coaches_from_pbp(pbp):
+    """
+    Returns the home and road coaches listed in the PbP.
+
+    :param pbp: json, the pbp for this game
+
+    :return: (str, str), home and road coach names (None if missing)
+    """
 
     homecoach = helpers.try_to_access_dict(pbp, 'liveData', 'boxscore', 'teams', 'home', 'coaches', 0, 'person',
                                            'fullName')
     roadcoach = helpers.try_to_access_dict(pbp, 'liveData', 'boxscore', 'teams', 'away', 'coaches', 0, 'person',
                                            'fullName')
-    _update_schedule_with_coaches(season, game, homecoach, roadcoach)
+    return homecoach, roadcoach
+
+
+def get_schedule_updates_from_pbp(pbp, season, game):
+    """
+    Returns what update_schedule_with_coaches and update_schedule_with_result_using_pbp would write for this game,
+    without writing it. Use with update_schedule_with_games to update many games at once.
+
+    :param pbp: json, the pbp for this game
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dict of column: value
+    """
+    # Replace None with N/A b/c feather has trouble with mixed datatypes. Need str here.
+    homecoach, roadcoach = get_coaches_from_pbp(pbp)
+    updates = {'HomeCoach': 'N/A' if homecoach is None else homecoach,
+               'RoadCoach': 'N/A' if roadcoach is None else roadcoach}
+    result = get_result_from_pbp(pbp, season, game)
+    if result is not False:
+        updates['Result'] = 'N/A' if result is None else result
+    return updates
@@ -63,6 +63,25 @@ def get_other_data_folder():
     return os.path.join(get_base_dir(), 'data', 'other')
 
 
+def get_http_cache_folder():
+    """
+    Returns the folder containing cached HTTP validators (ETag, Last-Modified)
+
+    :return: str, /scrape/data/cache/http/
+    """
+    return os.path.join(get_base_dir(), 'data', 'cache', 'http')
+
+
+def get_replay_folder():
+    """
+    Returns the folder containing pages recorded by replay_server (other than raw pbp and toi, which it reads from the
+    raw data folders)
+
+    :return: str, /scrape/data/cache/replay/
+    """
+    return os.path.join(get_base_dir(), 'data', 'cache', 'replay')
+
+
 def get_season_raw_pbp_folder(season):
     """
     Returns the folder containing raw pbp for given season
@@ -131,11 +150,13 @@ def get_season_team_toi_folder(season):
 
 def organization_setup():
     """
-    Creates other folder if need be
+    Creates other and cache folders if need be
 
     :return: nothing
     """
     check_create_folder(get_other_data_folder())
+    check_create_folder(get_http_cache_folder())
+    check_create_folder(get_replay_folder())
 
 
 organization_setup()
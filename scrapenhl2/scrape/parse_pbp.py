@@ -3,20 +3,25 @@ This module contains methods for parsing PBP.
 """
 
 import os.path
+import re
+import time
 
 import numpy as np
 import pandas as pd
 
-from scrapenhl2.scrape import general_helpers as helpers, manipulate_schedules, organization, players, schedules, \
-    scrape_pbp, parse_toi
-from numba import jit
+from scrapenhl2.scrape import general_helpers as helpers, clock, manipulate_schedules, organization, pbp_log, \
+    parsed_store, players, schedules, schemas, scrape_pbp, parse_toi
 
-def parse_season_pbp(season, force_overwrite=False):
+def parse_season_pbp(season, force_overwrite=False, from_html=False, workers=1):
     """
-    Parses pbp from the given season.
+    Parses pbp from the given season. Logs how long each game took, and games that could not be parsed.
 
     :param season: int, the season
     :param force_overwrite: bool. If true, parses all games. If false, only previously unparsed ones
+    :param from_html: bool. If True, parses the html pbp instead of the json (e.g. for 2005-06 to 2009-10)
+    :param workers: int, number of processes parsing games at once. With more than one, updates to the player and
+        schedule files are sent back to this process and written in one batch at the end (see apply_pbp_updates),
+        rather than by each game as it is parsed.
 
     :return: nothing
     """
@@ -24,164 +29,275 @@ def parse_season_pbp(season, force_overwrite=False):
         season = schedules.get_current_season()
 
     sch = schedules.get_season_schedule(season)
-    games = sch[sch.Status == "Final"].Game.values
-    games.sort()
+    games = np.sort(sch[sch.Status == "Final"].Game.values)
     intervals = helpers.intervals(games)
     interval_j = 0
-    for i, game in enumerate(games):
-        try:
-            parse_game_pbp(season, game, force_overwrite)
-        except Exception as e:
-            pass  # ed.print_and_log('{0:d} {1:d} {2:s}'.format(season, game, str(e)), 'warn')
-        if interval_j < len(intervals):
-            if i == intervals[interval_j][0]:
-                print('Done parsing pbp through {0:d} {1:d} ({2:d}%)'.format(
-                    season, game, round(intervals[interval_j][0] / len(games) * 100)))
-                interval_j += 1
+    updates = {}
+    failures = 0
+    starttime = time.perf_counter()
+    arglists = [(season, game, force_overwrite, from_html, workers > 1) for game in games]
+    try:
+        for i, (game, parsed, gameupdates, error, secs) in enumerate(
+                helpers.map_in_processes(_parse_game_pbp_for_season, arglists, workers)):
+            if gameupdates is not None:
+                updates[game] = gameupdates
+            if error is not None:
+                failures += 1
+                helpers.print_and_log('Could not parse pbp for {0:d} {1:d} ({2:.2f} s): {3:s}'.format(
+                    season, game, secs, error), 'warn', print_and_log=False)
+            elif parsed:
+                helpers.print_and_log('Parsed pbp for {0:d} {1:d} in {2:.2f} s'.format(season, game, secs),
+                                      print_and_log=False)
+            if interval_j < len(intervals):
+                if i == intervals[interval_j][0]:
+                    print('Done parsing pbp through {0:d} {1:d} ({2:d}%)'.format(
+                        season, game, round(intervals[interval_j][0] / len(games) * 100)))
+                    interval_j += 1
+    finally:
+        # Even if interrupted: these games are parsed already, so would be skipped next time
+        apply_pbp_updates(season, updates)
+        parsed_store.compact_season('pbp', season)
+    helpers.print_and_log('Parsed pbp for {0:d} games in {1:.1f} s; {2:d} could not be parsed'.format(
+        len(games), time.perf_counter() - starttime, failures))
+
+
+def _parse_game_pbp_for_season(season, game, force_overwrite, from_html, collect_updates):
+    """
+    Parses one game for parse_season_pbp, timing it and catching errors, so it can run in a worker process.
+
+    :param season: int, the season
+    :param game: int, the game
+    :param force_overwrite: bool, as in parse_game_pbp
+    :param from_html: bool, as in parse_season_pbp
+    :param collect_updates: bool. If True, updates to the player and schedule files are returned, not written.
+
+    :return: (game, True if parsed and False if skipped, updates (see get_pbp_updates_from_page) or None,
+        error message or None, secs taken)
+    """
+    updates = {} if collect_updates else None
+    parsed = False
+    error = None
+    starttime = time.perf_counter()
+    try:
+        if from_html:
+            parsed = parse_game_pbp_from_html(season, game, force_overwrite)
+        else:
+            parsed = parse_game_pbp(season, game, force_overwrite, updates=updates)
+    except Exception as e:
+        error = '{0:s}: {1:s}'.format(type(e).__name__, str(e))
+    return game, parsed, None if updates is None else updates.get(game), error, time.perf_counter() - starttime
 
 
 def get_parsed_pbp(season, game):
     """
-    Loads the compressed json file containing this game's play by play from disk.
+    Loads this game's parsed play by play from the parsed dataset (see parsed_store).
 
     :param season: int, the season
     :param game: int, the game
 
-    :return: json, the json pbp
+    :return: dataframe, the parsed pbp
     """
-    return pd.read_hdf(get_game_parsed_pbp_filename(season, game))
+    return parsed_store.read_game('pbp', season, game)
 
 
-def save_parsed_pbp(pbp, season, game):
+def save_parsed_pbp(pbp, season, game, append=False):
     """
-    Saves the pandas dataframe containing pbp information to disk as an HDF5.
+    Saves the pandas dataframe containing pbp information to the parsed dataset (see parsed_store).
 
     :param pbp: df, a pandas dataframe with the pbp of the game
     :param season: int, the season
     :param game: int, the game
+    :param append: bool. If True, adds these events to those already saved for this game instead of overwriting.
 
     :return: nothing
     """
-    pbp.to_hdf(get_game_parsed_pbp_filename(season, game),
-               key='P{0:d}0{1:d}'.format(season, game),
-               mode='w', complib='zlib')
+    # Periods are ints in the json but include e.g. SO in the html; store them all as strings so files line up
+    pbp = pbp.assign(Period=pbp.Period.astype(str).values)
+    if append and parsed_store.has_game('pbp', season, game):
+        pbp = pd.concat([get_parsed_pbp(season, game), pbp], ignore_index=True)
+
+    gameinfo = schedules.get_game_data_from_schedule(season, game)
+    parsed_store.save_game('pbp', pbp, season, game, gameinfo['Home'], gameinfo['Road'])
+
+
+def get_game_pbp_state_filename(season, game):
+    """
+    Returns the filename of the state kept for incremental parsing of this game's pbp while in progress
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: str, /scrape/data/parsed/pbp/[season]/[game]_live.json
+    """
+    return os.path.join(organization.get_season_parsed_pbp_folder(season), str(game) + '_live.json')
+
+
+def delete_pbp_state(season, game):
+    """
+    Deletes the incremental parsing state for this game, if any. Do this once the game goes final.
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: nothing
+    """
+    filename = get_game_pbp_state_filename(season, game)
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+def _save_pbp_state(rawplays, parsedpbp, season, game):
+    """
+    Records how far into the play list this game has been parsed, and the score at that point.
+
+    :param rawplays: list, allPlays from the json pbp
+    :param parsedpbp: dataframe, the parsed pbp (or the most recent chunk of it)
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: nothing
+    """
+    if parsedpbp is None or len(parsedpbp) == 0:
+        return
+    last = len(rawplays) - 1
+    helpers.write_json_file({'LastPlayIndex': last,
+                             'LastEventIdx': helpers.try_to_access_dict(rawplays, last, 'about', 'eventIdx'),
+                             'HomeScore': int(parsedpbp.HomeScore.iloc[-1]),
+                             'RoadScore': int(parsedpbp.RoadScore.iloc[-1])},
+                            get_game_pbp_state_filename(season, game))
+
+
+# Integer ID buffers can't hold None; this stands in for it (e.g. goals without a goalie in net) and becomes NaN
+_NO_PLAYER = schemas.MISSING_ID
+_EMPTY = {}
 
 
 def _create_pbp_df_json(pbp, gameinfo):
     """
     Creates a pandas dataframe from the pbp, making use of gameinfo (from schedule file) as well
 
+    Makes a single pass over the plays, filling one buffer per column: int32 for team and player IDs, float32 for
+    coordinates, and integer codes for events (which become a categorical column).
+
     :param pbp: dict, from pbp json
     :param gameinfo: dict, single row from schedule file
 
     :return: dataframe
     """
+    numplays = len(pbp)
+    period = [''] * numplays
+    times = ['0:00'] * numplays
+    eventcodes = np.zeros(numplays, dtype=np.int16)
+    events = {}  # event name: code
+
+    team = np.full(numplays, -1, dtype=np.int32)
+    p1 = np.full(numplays, -1, dtype=np.int32)
+    p1role = [''] * numplays
+    p2 = np.full(numplays, -1, dtype=np.int32)
+    p2role = [''] * numplays
+    xs = np.full(numplays, np.nan, dtype=np.float32)
+    ys = np.full(numplays, np.nan, dtype=np.float32)
+    note = [''] * numplays
+
+    # Blocked shots are switched from being an event for player who blocked, to player who took shot that was blocked
+    # That means switching team attribution and actor/recipient.
+    # TODO: why does schedule have str, not int, home and road here?
+    switch_teams = {gameinfo['Home']: gameinfo['Road'], gameinfo['Road']: gameinfo['Home']}
 
-    index = [i for i in range(len(pbp))]
-    period = ['' for _ in range(len(pbp))]
-    times = ['0:00' for _ in range(len(pbp))]
-    event = ['NA' for _ in range(len(pbp))]
-
-    team = [-1 for _ in range(len(pbp))]
-    p1 = [-1 for _ in range(len(pbp))]
-    p1role = ['' for _ in range(len(pbp))]
-    p2 = [-1 for _ in range(len(pbp))]
-    p2role = ['' for _ in range(len(pbp))]
-    xs = [np.NaN for _ in range(len(pbp))]
-    ys = [np.NaN for _ in range(len(pbp))]
-    note = ['' for _ in range(len(pbp))]
-
-    for i in range(len(pbp)):
-        period[i] = helpers.try_to_access_dict(pbp, i, 'about', 'period', default_return='')
-        times[i] = helpers.try_to_access_dict(pbp, i, 'about', 'periodTime', default_return='0:00')
-        event[i] = helpers.try_to_access_dict(pbp, i, 'result', 'event', default_return='NA')
-
-        xs[i] = float(helpers.try_to_access_dict(pbp, i, 'coordinates', 'x', default_return=np.NaN))
-        ys[i] = float(helpers.try_to_access_dict(pbp, i, 'coordinates', 'y', default_return=np.NaN))
-        team[i] = helpers.try_to_access_dict(pbp, i, 'team', 'id', default_return=-1)
-
-        p1[i] = helpers.try_to_access_dict(pbp, i, 'players', 0, 'player', 'id', default_return=-1)
-        p1role[i] = helpers.try_to_access_dict(pbp, i, 'players', 0, 'playerType', default_return='')
-        p2[i] = helpers.try_to_access_dict(pbp, i, 'players', 1, 'player', 'id', default_return=-1)
-        p2role[i] = helpers.try_to_access_dict(pbp, i, 'players', 1, 'playerType', default_return='')
-
-        note[i] = helpers.try_to_access_dict(pbp, i, 'result', 'description', default_return='')
-        if event[i] == 'Goal':
+    for i, play in enumerate(pbp):
+        about = play.get('about', _EMPTY)
+        result = play.get('result', _EMPTY)
+        coordinates = play.get('coordinates', _EMPTY)
+        playerlist = play.get('players', ())
+
+        period[i] = about.get('period', '')
+        times[i] = about.get('periodTime', '0:00')
+        event = result.get('event', 'NA')
+        code = events.get(event)
+        if code is None:
+            code = events[event] = len(events)
+        eventcodes[i] = code
+
+        xs[i] = coordinates.get('x', np.nan)
+        ys[i] = coordinates.get('y', np.nan)
+        teamid = play.get('team', _EMPTY).get('id', -1)
+
+        actor, actorrole, recipient, recipientrole = -1, '', -1, ''
+        if len(playerlist) > 0:
+            actor = playerlist[0].get('player', _EMPTY).get('id', -1)
+            actorrole = playerlist[0].get('playerType', '')
+        if len(playerlist) > 1:
+            recipient = playerlist[1].get('player', _EMPTY).get('id', -1)
+            recipientrole = playerlist[1].get('playerType', '')
+
+        description = result.get('description', '')
+        if event == 'Goal':
             # Two changes to make
             # First, make the recipient of this goal the opposing goalie
             # Second, replace player names with player IDs in the description of this goal (scorer and assists)
-            p2[i] = None
-            p2role[i] = None
-            for j in range(len(pbp[i]['players'])):
-                pid = helpers.try_to_access_dict(pbp, i, 'players', j, 'player', 'id', default_return=None)
-                pname = helpers.try_to_access_dict(pbp, i, 'players', j, 'player', 'fullName', default_return=None)
-                prole = helpers.try_to_access_dict(pbp, i, 'players', j, 'playerType', default_return='')
+            recipient = _NO_PLAYER
+            recipientrole = None
+            for player in play['players']:
+                pid = player.get('player', _EMPTY).get('id')
+                prole = player.get('playerType', '')
                 if prole == 'Goalie':
-                    p2[i] = pid
-                    p2role[i] = prole
+                    recipient = _NO_PLAYER if pid is None else pid
+                    recipientrole = prole
                 elif pid is not None:
-                    note[i] = note[i].replace(pname, str(int(pid)))
-        elif event[i] == 'Penalty':
+                    description = description.replace(player.get('player', _EMPTY).get('fullName'), str(int(pid)))
+        elif event == 'Penalty':
             # Get the penalty severity in there
-            note[i] = '({0:s}-{1:d} min) {2:s}'.format(helpers.try_to_access_dict(pbp, i, 'result', 'penaltySeverity',
-                                                                              default_return='N/A'),
-                                                   helpers.try_to_access_dict(pbp, i, 'result', 'penaltyMinutes',
-                                                                              default_return='N/A'),
-                                                   note[i])
-
-    # Switch blocked shots from being an event for player who blocked, to player who took shot that was blocked
-    # That means switching team attribution and actor/recipient.
-    # TODO: why does schedule have str, not int, home and road here?
-    switch_teams = {gameinfo['Home']: gameinfo['Road'], gameinfo['Road']: gameinfo['Home']}
-    team_sw = [team[i] if event[i] != "Blocked Shot" else switch_teams[team[i]] for i in range(len(team))]
-    p1_sw = [p1[i] if event[i] != "Blocked Shot" else p2[i] for i in range(len(p1))]
-    p2_sw = [p2[i] if event[i] != "Blocked Shot" else p1[i] for i in range(len(p2))]
-    p1role_sw = [p1role[i] if event[i] != "Blocked Shot" else p2role[i] for i in range(len(p1role))]
-    p2role_sw = [p2role[i] if event[i] != "Blocked Shot" else p1role[i] for i in range(len(p2role))]
-
-    pbpdf = pd.DataFrame({'Index': index, 'Period': period, 'MinSec': times, 'Event': event,
-                          'Team': team_sw, 'Actor': p1_sw, 'ActorRole': p1role_sw, 'Recipient': p2_sw,
-                          'RecipientRole': p2role_sw, 'X': xs, 'Y': ys, 'Note': note})
+            description = '({0:s}-{1:d} min) {2:s}'.format(result.get('penaltySeverity', 'N/A'),
+                                                          result.get('penaltyMinutes', 'N/A'), description)
+        elif event == 'Blocked Shot':
+            teamid = switch_teams[teamid]
+            actor, actorrole, recipient, recipientrole = recipient, recipientrole, actor, actorrole
+
+        team[i] = teamid
+        p1[i] = actor
+        p1role[i] = actorrole
+        p2[i] = recipient
+        p2role[i] = recipientrole
+        note[i] = description
+
+    eventnames = sorted(events, key=events.get)
+    pbpdf = pd.DataFrame({'Index': np.arange(numplays), 'Period': period, 'MinSec': times,
+                          'Event': pd.Categorical.from_codes(eventcodes, categories=eventnames),
+                          'Team': team, 'Actor': _player_ids_to_float(p1), 'ActorRole': p1role,
+                          'Recipient': _player_ids_to_float(p2), 'RecipientRole': p2role, 'X': xs, 'Y': ys,
+                          'Note': note})
     return pbpdf
 
 
-def _add_scores_to_pbp(pbpdf, gameinfo):
+def _player_ids_to_float(pids):
+    """
+    Turns a buffer of player IDs into a float column, with NaN where there is no player.
+
+    :param pids: array of int32
+
+    :return: array of float
+    """
+    return np.where(pids == _NO_PLAYER, np.nan, pids)
+
+
+def _add_scores_to_pbp(pbpdf, gameinfo, initial_score=(0, 0)):
     """
     Adds columns for home and road goals to supplied dataframe
 
     :param pbp: dataframe of play by play events
     :param gameinfo: dict, one row of the schedule file
+    :param initial_score: (int, int), home and road score before the first event in pbpdf. Nonzero when parsing only
+        the latest events of a game.
 
     :return: dataframe with two extra columns
     """
-    # Add score
-    homegoals = pbpdf[['Event', 'Period', 'MinSec', 'Team']] \
-        .query('Team == {0:d} & Event == "Goal"'.format(gameinfo['Home']))
+    # Score after each event (so including a goal on that row) is a running count of goals, in event order
     # TODO check team log for value_counts() of Event.
-    roadgoals = pbpdf[['Event', 'Period', 'MinSec', 'Team']] \
-        .query('Team == {0:d} & Event == "Goal"'.format(gameinfo['Road']))
-
-    if len(homegoals) > 0:  # errors if len is 0
-        homegoals.loc[:, 'HomeScore'] = 1
-        homegoals.loc[:, 'HomeScore'] = homegoals.HomeScore.cumsum()
-        pbpdf = pbpdf.merge(homegoals, how='left', on=['Event', 'Period', 'MinSec', 'Team'])
-
-    if len(roadgoals) > 0:
-        roadgoals.loc[:, 'RoadScore'] = 1
-        roadgoals.loc[:, 'RoadScore'] = roadgoals.RoadScore.cumsum()
-        pbpdf = pbpdf.merge(roadgoals, how='left', on=['Event', 'Period', 'MinSec', 'Team'])
-        # TODO check: am I counting shootout goals?
-
-    # Make the first row show 0 for both teams
-    # TODO does this work for that one game that got stopped?
-    # Maybe I should fill forward first, then replace remaining NA with 0
-    pbpdf.loc[pbpdf.Index == 0, 'HomeScore'] = 0
-    pbpdf.loc[pbpdf.Index == 0, 'RoadScore'] = 0
-
-    # And now forward fill
-    pbpdf.loc[:, "HomeScore"] = pbpdf.HomeScore.fillna(method='ffill')
-    pbpdf.loc[:, "RoadScore"] = pbpdf.RoadScore.fillna(method='ffill')
-    return pbpdf
+    # TODO check: am I counting shootout goals?
+    isgoal = (pbpdf.Event == 'Goal').values
+    teams = pbpdf.Team.values
+    return pbpdf.assign(HomeScore=np.cumsum(isgoal & (teams == gameinfo['Home'])) + initial_score[0],
+                        RoadScore=np.cumsum(isgoal & (teams == gameinfo['Road'])) + initial_score[1])
 
 
 def _add_times_to_pbp(pbpdf):
@@ -192,22 +308,10 @@ def _add_times_to_pbp(pbpdf):
 
     :return: pandas dataframe
     """
+    return pbpdf.assign(Time=clock.to_game_secs(pbpdf.Period, pbpdf.MinSec))
 
-    # Convert MM:SS and period to time in game
-    minsec = pbpdf.MinSec.str.split(':', expand=True)
-    minsec.columns = ['Min', 'Sec']
-    minsec.Period = pbpdf.Period
-    minsec.loc[:, 'Min'] = pd.to_numeric(minsec.loc[:, 'Min'])
-    minsec.loc[:, 'Sec'] = pd.to_numeric(minsec.loc[:, 'Sec'])
-    minsec.loc[:, 'TimeInPeriod'] = 60 * minsec.Min + minsec.Sec
 
-    minsec.loc[:, 'PeriodContribution'] = minsec.Period.apply(helpers.period_contribution)
-    minsec.loc[:, 'Time'] = minsec.PeriodContribution + minsec.TimeInPeriod
-    pbpdf.loc[:, 'Time'] = minsec.Time
-    return pbpdf
-
-
-def read_events_from_page(rawpbp, season, game):
+def read_events_from_page(rawpbp, season, game, first_play=0, initial_score=(0, 0)):
     """
     This method takes the json pbp and returns a pandas dataframe with the following columns:
 
@@ -228,6 +332,8 @@ def read_events_from_page(rawpbp, season, game):
     :param rawpbp: json, the raw json pbp
     :param season: int, the season
     :param game: int, the game
+    :param first_play: int, index of the first play to read. Use to read only plays added since the last parse.
+    :param initial_score: (int, int), home and road score before first_play
 
     :return: pandas dataframe, the pbp in a nicer format
     """
@@ -236,7 +342,182 @@ def read_events_from_page(rawpbp, season, game):
         return
 
     gameinfo = schedules.get_game_data_from_schedule(season, game)
-    pbpdf = _create_pbp_df_json(pbp, gameinfo)
+    pbpdf = _create_pbp_df_json(pbp[first_play:], gameinfo)
+    if len(pbpdf) == 0:
+        return pbpdf
+    pbpdf.loc[:, 'Index'] = pbpdf.Index + first_play
+
+    pbpdf = _add_scores_to_pbp(pbpdf, gameinfo, initial_score)
+    pbpdf = _add_times_to_pbp(pbpdf)
+
+    return pbpdf
+
+
+# Html event types, as the json names them. Others keep their html names.
+_HTML_EVENTS = {'FAC': 'Faceoff', 'HIT': 'Hit', 'SHOT': 'Shot', 'MISS': 'Missed Shot', 'BLOCK': 'Blocked Shot',
+                'GIVE': 'Giveaway', 'TAKE': 'Takeaway', 'GOAL': 'Goal', 'PENL': 'Penalty', 'STOP': 'Stoppage',
+                'PSTR': 'Period Start', 'PEND': 'Period End', 'GEND': 'Game End', 'GOFF': 'Game Official',
+                'SOC': 'Shootout Complete', 'EISTR': 'Early Intermission Start', 'EIEND': 'Early Intermission End',
+                'CHL': 'Official Challenge'}
+
+# Roles for html events with a team, as the json names them: the first player named from that team, and the first
+# named from the other team. Shots and goals go to the other team's goalie on ice instead.
+_HTML_ROLES = {'FAC': ('Winner', 'Loser'), 'HIT': ('Hitter', 'Hittee'), 'SHOT': ('Shooter', 'Goalie'),
+               'MISS': ('Shooter', ''), 'BLOCK': ('Shooter', 'Blocker'), 'GIVE': ('PlayerID', ''),
+               'TAKE': ('PlayerID', ''), 'GOAL': ('Scorer', 'Goalie'), 'PENL': ('PenaltyOn', 'DrewBy')}
+
+# Skaters on ice kept per team, as in the parsed TOI
+_HTML_SKATER_SLOTS = 6
+
+# E.g. Served By: #26 BEAGLE on a bench minor, who did not take the penalty
+_SERVED_BY = re.compile(r'Served By:\s*#\d{1,2}[^,]*')
+# Scorer and assists in goal descriptions, e.g. #8 OVECHKIN(1)
+_GOAL_PLAYER = re.compile(r'#(\d{1,2}) [^(#]*(?=\()')
+
+
+def _get_html_player_ids(onice, team, season):
+    """
+    Matches jersey numbers to player IDs, using everyone listed on ice for one team.
+
+    Names are matched exactly, ignoring case, to the player ID file. Players missing from it (e.g. many who retired
+    before 2010) get -1 rather than a fuzzy match, which would give them someone else's ID. Where several players share
+    a name, those in the player log for this team and season are preferred, then the default in
+    players.check_default_player_id.
+
+    :param onice: list of lists of (number, position, name), from pbp_log
+    :param team: int, the team's ID
+    :param season: int, the season
+
+    :return: dict of str: int, jersey number to player ID
+    """
+    names = {number: name.upper() for players_on in onice for number, _, name in players_on}
+    if len(names) == 0:
+        return {}
+    idfile = players.get_player_ids_file()
+    idfile = idfile[idfile.Name.str.upper().isin(set(names.values()))]
+    candidates = idfile.assign(Name=idfile.Name.str.upper()).groupby('Name').ID.unique().to_dict()
+
+    pids = {}
+    for number, name in names.items():
+        matches = [int(pid) for pid in candidates.get(name, [])]
+        if len(matches) > 1:
+            log = players.get_player_log_file()
+            onteam = set(log.ID[(log.Team == team) & (log.Season == season)]) if log is not None else set()
+            matches = [pid for pid in matches if pid in onteam] or \
+                [pid for pid in matches if pid == players.check_default_player_id(name.title())]
+        pids[number] = matches[0] if len(matches) == 1 else -1
+    return pids
+
+
+def _create_pbp_df_html(teams, events, gameinfo):
+    """
+    Creates a pandas dataframe from the html pbp, making use of gameinfo (from schedule file) as well. Has the same
+    columns as _create_pbp_df_json (X and Y are always NaN), plus player IDs on ice: H1-H6 and HG for home skaters and
+    goalie, R1-R6 and RG for road.
+
+    Players in descriptions are matched by team and jersey number to players on ice for that game.
+
+    :param teams: list of str, road and home team as named in the report, from pbp_log
+    :param events: dict of column: list, from pbp_log
+    :param gameinfo: dict, single row from schedule file
+
+    :return: dataframe
+    """
+    numevents = len(events['EventNum'])
+    teamids = (gameinfo['Road'], gameinfo['Home'])
+    pids = (_get_html_player_ids(events['RoadOnIce'], gameinfo['Road'], gameinfo['Season']),
+            _get_html_player_ids(events['HomeOnIce'], gameinfo['Home'], gameinfo['Season']))
+    teampattern = '|'.join(re.escape(team) for team in teams) or '$^'
+    playerpattern = re.compile(r'(?<![\w.])({0:s})(?![\w.])|#(\d{{1,2}})'.format(teampattern))
+
+    team = np.full(numevents, -1, dtype=np.int32)
+    p1 = np.full(numevents, -1, dtype=np.int32)
+    p1role = [''] * numevents
+    p2 = np.full(numevents, -1, dtype=np.int32)
+    p2role = [''] * numevents
+    note = list(events['Description'])
+    # (road, home) by (skater slot, event), with the goalie last
+    onice = np.full((2, _HTML_SKATER_SLOTS + 1, numevents), _NO_PLAYER, dtype=np.int32)
+
+    for i in range(numevents):
+        goalies = [_NO_PLAYER, _NO_PLAYER]
+        for side, column in enumerate(('RoadOnIce', 'HomeOnIce')):
+            slot = 0
+            for number, position, _ in events[column][i]:
+                if position == 'Goalie':
+                    goalies[side] = onice[side, -1, i] = pids[side][number]
+                elif slot < _HTML_SKATER_SLOTS:
+                    onice[side, slot, i] = pids[side][number]
+                    slot += 1
+
+        code = events['Event'][i]
+        roles = _HTML_ROLES.get(code)
+        if roles is None:
+            continue
+
+        # Each #number belongs to the team named last before it, e.g. OTT ONGOAL - #9 RYAN is OTT's #9
+        side = None
+        named = ([], [])
+        for match in playerpattern.finditer(_SERVED_BY.sub('', note[i])):
+            if match.group(1) is not None:
+                current = teams.index(match.group(1))
+                if side is None:
+                    side = current
+            elif side is not None:
+                named[current].append(pids[current].get(match.group(2), -1))
+        if side is None:
+            continue
+
+        team[i] = teamids[side]
+        if len(named[side]) > 0:
+            p1[i] = named[side][0]
+            p1role[i] = roles[0]
+        if roles[1] == 'Goalie':
+            p2[i] = goalies[1 - side]
+            p2role[i] = roles[1]
+            if code == 'GOAL':
+                # As in the json: no recipient for an empty net goal, and scorer and assists as IDs in the note
+                if goalies[1 - side] == _NO_PLAYER:
+                    p2role[i] = None
+                note[i] = _GOAL_PLAYER.sub(lambda m: str(pids[side].get(m.group(1), m.group(0))), note[i])
+            elif goalies[1 - side] == _NO_PLAYER:
+                p2[i] = -1
+                p2role[i] = ''
+        elif roles[1] and len(named[1 - side]) > 0:
+            p2[i] = named[1 - side][0]
+            p2role[i] = roles[1]
+
+    eventcodes, eventnames = pd.factorize(pd.Series(events['Event'], dtype=object).map(
+        lambda x: _HTML_EVENTS.get(x, x)))
+    pbpdf = pd.DataFrame({'Index': np.arange(numevents),
+                          'Period': [int(x) if x.isdigit() else x for x in events['Period']],
+                          'MinSec': events['MinSec'],
+                          'Event': pd.Categorical.from_codes(eventcodes, categories=eventnames),
+                          'Team': team, 'Actor': _player_ids_to_float(p1), 'ActorRole': p1role,
+                          'Recipient': _player_ids_to_float(p2), 'RecipientRole': p2role,
+                          'X': np.full(numevents, np.nan, dtype=np.float32),
+                          'Y': np.full(numevents, np.nan, dtype=np.float32), 'Note': note})
+    for side, prefix in ((1, 'H'), (0, 'R')):
+        for slot in range(_HTML_SKATER_SLOTS):
+            pbpdf[prefix + str(slot + 1)] = _player_ids_to_float(onice[side, slot])
+        pbpdf[prefix + 'G'] = _player_ids_to_float(onice[side, -1])
+    return pbpdf
+
+
+def read_events_from_html(rawpbp, season, game):
+    """
+    Same as read_events_from_page, but from the html pbp (the PL report). Use for games without the json pbp (before
+    2010-11). Also adds players on ice as listed in the report; see _create_pbp_df_html.
+
+    :param rawpbp: str, the html pbp
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: pandas dataframe, the pbp in a nicer format
+    """
+    teams, events = pbp_log.read_pbp_log(rawpbp)
+    gameinfo = schedules.get_game_data_from_schedule(season, game)
+    pbpdf = _create_pbp_df_html(teams, events, gameinfo)
     if len(pbpdf) == 0:
         return pbpdf
 
@@ -248,17 +529,18 @@ def read_events_from_page(rawpbp, season, game):
 
 def get_game_parsed_pbp_filename(season, game):
     """
-    Returns the filename of the parsed pbp folder
+    Returns the filename parsed pbp was saved to, one HDF5 file per game, before parsed_store. Only used to migrate
+    those files (see scripts/migrate_parsed_to_dataset.py).
 
     :param season: int, current season
     :param game: int, game
 
-    :return: str, /scrape/data/parsed/pbp/[season]/[game].zlib
+    :return: str, /scrape/data/parsed/pbp/[season]/[game].h5
     """
     return os.path.join(organization.get_season_parsed_pbp_folder(season), str(game) + '.h5')
 
 
-def parse_game_pbp(season, game, force_overwrite=False):
+def parse_game_pbp(season, game, force_overwrite=False, incremental=False, updates=None):
     """
     Reads the raw pbp from file, updates player IDs, updates player logs, and parses the JSON to a pandas DF
     and writes to file. Also updates team logs accordingly.
@@ -266,31 +548,125 @@ def parse_game_pbp(season, game, force_overwrite=False):
     :param season: int, the season
     :param game: int, the game
     :param force_overwrite: bool. If True, will execute. If False, executes only if file does not exist yet.
+    :param incremental: bool. If True, parses only plays added since the last parse and appends them to file.
+        Use for in-progress games; falls back to a full parse if there is no usable state from a previous parse.
+        Note this does not pick up edits the NHL makes to earlier plays, so reparse in full once the game is final.
+    :param updates: dict, or None. If given, this game's updates to the player and schedule files are added to it
+        (keyed by game) instead of being written; see apply_pbp_updates.
 
     :return: True if parsed, False if not
     """
 
-    filename = get_game_parsed_pbp_filename(season, game)
-    if not force_overwrite and os.path.exists(filename):
+    if not force_overwrite and parsed_store.has_game('pbp', season, game):
         return False
 
     # Looks like 2010-11 is the first year where this feed supplies more than just boxscore data
     rawpbp = scrape_pbp.get_raw_pbp(season, game)
-    players.update_player_ids_from_page(rawpbp)
-    players.update_player_logs_from_page(rawpbp, season, game)
-    manipulate_schedules.update_schedule_with_coaches(rawpbp, season, game)
-    manipulate_schedules.update_schedule_with_result_using_pbp(rawpbp, season, game)
+    return parse_game_pbp_from_page(rawpbp, season, game, incremental, updates)
+
+
+def parse_game_pbp_from_page(rawpbp, season, game, incremental=False, updates=None):
+    """
+    Same as parse_game_pbp, but takes the json pbp already in memory (e.g. straight from the scrape) instead of
+    reading it back from the raw file.
+
+    :param rawpbp: json, the raw json pbp
+    :param season: int, the season
+    :param game: int, the game
+    :param incremental: bool, as in parse_game_pbp
+    :param updates: dict or None, as in parse_game_pbp
+
+    :return: True if parsed, False if not
+    """
+    if updates is None:
+        apply_pbp_updates(season, {game: get_pbp_updates_from_page(rawpbp, season, game)})
+    else:
+        updates[game] = get_pbp_updates_from_page(rawpbp, season, game)
+
+    if incremental:
+        parsed = _parse_game_pbp_incremental(rawpbp, season, game)
+        if parsed is not None:
+            return parsed
 
     parsedpbp = read_events_from_page(rawpbp, season, game)
     save_parsed_pbp(parsedpbp, season, game)
+    _save_pbp_state(helpers.try_to_access_dict(rawpbp, 'liveData', 'plays', 'allPlays', default_return=[]),
+                    parsedpbp, season, game)
     # ed.print_and_log('Parsed events for {0:d} {1:d}'.format(season, game), print_and_log=False)
     return True
 
 
+def get_pbp_updates_from_page(rawpbp, season, game):
+    """
+    Collects what this game's json pbp adds to the player IDs, player log and schedule files, without writing them.
+
+    :param rawpbp: json, the raw json pbp
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dict with PlayerIDs (list), PlayerLog (dataframe) and Schedule (dict of column: value)
+    """
+    return {'PlayerIDs': players.get_player_ids_from_page(rawpbp),
+            'PlayerLog': players.get_player_log_from_page(rawpbp, season, game),
+            'Schedule': manipulate_schedules.get_schedule_updates_from_pbp(rawpbp, season, game)}
+
+
+def apply_pbp_updates(season, updates):
+    """
+    Writes updates from get_pbp_updates_from_page for any number of games, with one write per file.
+
+    :param season: int, the season
+    :param updates: dict of game: updates
+
+    :return: nothing
+    """
+    if len(updates) == 0:
+        return
+    players.update_player_ids_file([pid for gameupdates in updates.values() for pid in gameupdates['PlayerIDs']])
+    players.add_to_player_log_file(pd.concat([gameupdates['PlayerLog'] for gameupdates in updates.values()]))
+    manipulate_schedules.update_schedule_with_games(season, {game: gameupdates['Schedule']
+                                                             for game, gameupdates in updates.items()})
+
+
+def _parse_game_pbp_incremental(rawpbp, season, game):
+    """
+    Parses plays added to rawpbp since the last parse and appends them to the parsed file.
+
+    :param rawpbp: json, the raw json pbp
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: True if plays were appended, False if there were no new plays, or None if a full parse is needed
+    """
+    state = helpers.read_json_file(get_game_pbp_state_filename(season, game))
+    rawplays = helpers.try_to_access_dict(rawpbp, 'liveData', 'plays', 'allPlays')
+    if state is None or rawplays is None or not parsed_store.has_game('pbp', season, game):
+        return None
+
+    # If the feed has been revised so that the last play we parsed is gone or different, start over
+    last = state['LastPlayIndex']
+    if last >= len(rawplays) or \
+            helpers.try_to_access_dict(rawplays, last, 'about', 'eventIdx') != state['LastEventIdx']:
+        return None
+    if last == len(rawplays) - 1:
+        return False
+
+    try:
+        newpbp = read_events_from_page(rawpbp, season, game, last + 1, (state['HomeScore'], state['RoadScore']))
+        save_parsed_pbp(newpbp, season, game, append=True)
+    except (ValueError, TypeError):
+        # E.g. a column changed type mid-game. Safer to redo the whole thing
+        return None
+    _save_pbp_state(rawplays, newpbp, season, game)
+    return True
+
+
 def parse_game_pbp_from_html(season, game, force_overwrite=False):
     """
-    Reads the raw pbp from file, updates player IDs, updates player logs, and parses the JSON to a pandas DF
-    and writes to file. Also updates team logs accordingly.
+    Reads the raw html pbp from file, parses it to a pandas DF (see read_events_from_html), and writes to file. Use for
+    games without the json pbp (before 2010-11).
+
+    Unlike parse_game_pbp, does not update player IDs, player logs or the schedule, which need the json.
 
     :param season: int, the season
     :param game: int, the game
@@ -299,17 +675,11 @@ def parse_game_pbp_from_html(season, game, force_overwrite=False):
     :return: True if parsed, False if not
     """
 
-    filename = scrape_pbp.get_game_pbplog_filename(season, game)
-    if not force_overwrite and os.path.exists(filename):
+    if not force_overwrite and parsed_store.has_game('pbp', season, game):
         return False
 
-    rawpbp = scrape_pbp.save(season, game)
-    players.update_player_ids_from_page(rawpbp)
-    manipulate_schedules.update_player_logs_from_page(rawpbp, season, game)
-    manipulate_schedules.update_schedule_with_coaches(rawpbp, season, game)
-    manipulate_schedules.update_schedule_with_result(rawpbp, season, game)
-
-    parsedpbp = read_events_from_page(rawpbp, season, game)
+    rawpbp = scrape_pbp.get_raw_html_pbp(season, game)
+    parsedpbp = read_events_from_html(rawpbp, season, game)
     save_parsed_pbp(parsedpbp, season, game)
     # ed.print_and_log('Parsed events for {0:d} {1:d}'.format(season, game), print_and_log=False)
     return True
@@ -332,12 +702,12 @@ def get_5v5_corsi_pm(season, game, cfca=None):
 
     pbp = pbp[['Time', 'Event', 'Team']] \
         .merge(toi[['Time', 'R1', 'R2', 'R3', 'R4', 'R5', 'H1', 'H2', 'H3', 'H4', 'H5',
-                    'HomeStrength', 'RoadStrength']], how='inner', on='Time')
+                    'HomeStrength', 'RoadStrength', 'HomeStrengthCode', 'RoadStrengthCode']], how='inner', on='Time')
 
     from scrapenhl2.manipulate import manipulate as manip
 
     corsi = manip.filter_for_five_on_five(manip.filter_for_corsi(pbp)) \
-        .drop(['HomeStrength', 'RoadStrength'], axis=1)
+        .drop(['HomeStrength', 'RoadStrength', 'HomeStrengthCode', 'RoadStrengthCode'], axis=1)
 
     hometeam = schedules.get_home_team(season, game)
 
@@ -1,25 +1,38 @@
 """
 This module contains methods for parsing TOI.
+
+Parsed TOI is saved as the game's shifts, one row per shift, which take much less space than one row per second.
+get_parsed_toi makes the per-second matrix from them when read, and get_parsed_toi_summary adds up time on ice by
+player and strength straight from the shifts.
 """
 
 import os.path
-import re
+import time
 
+import numpy as np
 import pandas as pd
 
+import scrapenhl2.scrape.clock as clock
 import scrapenhl2.scrape.general_helpers as helpers
 import scrapenhl2.scrape.organization as organization
+import scrapenhl2.scrape.parsed_store as parsed_store
 import scrapenhl2.scrape.players as players
 import scrapenhl2.scrape.schedules as schedules
+import scrapenhl2.scrape.schemas as schemas
 import scrapenhl2.scrape.scrape_toi as scrape_toi
-from numba import jit
+import scrapenhl2.scrape.shift_log as shift_log
+import scrapenhl2.scrape.strengths as strengths
+import scrapenhl2.scrape.toi_kernels as toi_kernels
 
-def parse_season_toi(season, force_overwrite=False):
+def parse_season_toi(season, force_overwrite=False, workers=1):
     """
-    Parses toi from the given season. Final games covered only.
+    Parses toi from the given season. Final games covered only. Logs how long each game took, and games that could not
+    be parsed.
 
     :param season: int, the season
     :param force_overwrite: bool. If true, parses all games. If false, only previously unparsed ones
+    :param workers: int, number of processes parsing games at once. Each game writes only its own files, so nothing
+        needs to be sent back to this process.
 
     :return:
     """
@@ -28,28 +41,56 @@ def parse_season_toi(season, force_overwrite=False):
         season = schedules.get_current_season()
 
     sch = schedules.get_season_schedule(season)
-    games = sch[sch.Status == "Final"].Game.values
-    games.sort()
+    games = np.sort(sch[sch.Status == "Final"].Game.values)
     intervals = helpers.intervals(games)
     interval_j = 0
-    for i, game in enumerate(games):
-        try:
-            if season >= 2010:
-                parse_game_toi(season, game, force_overwrite)
-            else:
-                parse_game_toi_from_html(season, game, force_overwrite)
-            if len(get_parsed_toi(season, game)) < 3600:
-                parse_game_toi_from_html(season, game, force_overwrite)
-        except Exception as e:
-            try:
-                parse_game_toi_from_html(season, game, force_overwrite)
-            except Exception as e:
-                pass  # ed.print_and_log('{0:d} {1:d} {2:s}'.format(season, game, str(e)), 'warn')
+    failures = 0
+    starttime = time.perf_counter()
+    arglists = [(season, game, force_overwrite) for game in games]
+    for i, (game, error, secs) in enumerate(helpers.map_in_processes(_parse_game_toi_for_season, arglists, workers)):
+        if error is not None:
+            failures += 1
+            helpers.print_and_log('Could not parse toi for {0:d} {1:d} ({2:.2f} s): {3:s}'.format(
+                season, game, secs, error), 'warn', print_and_log=False)
+        else:
+            helpers.print_and_log('Parsed toi for {0:d} {1:d} in {2:.2f} s'.format(season, game, secs),
+                                  print_and_log=False)
         if interval_j < len(intervals):
             if i == intervals[interval_j][0]:
                 print('Done parsing toi through {0:d} {1:d} ({2:d}%)'.format(
                     season, game, round(intervals[interval_j][0] / len(games) * 100)))
                 interval_j += 1
+    parsed_store.compact_season('shifts', season)
+    helpers.print_and_log('Parsed toi for {0:d} games in {1:.1f} s; {2:d} could not be parsed'.format(
+        len(games), time.perf_counter() - starttime, failures))
+
+
+def _parse_game_toi_for_season(season, game, force_overwrite):
+    """
+    Parses one game for parse_season_toi, timing it and catching errors, so it can run in a worker process. Uses the
+    json shifts from 2010-11 on, and the html shift logs before that or if the json is missing or incomplete.
+
+    :param season: int, the season
+    :param game: int, the game
+    :param force_overwrite: bool, as in parse_game_toi
+
+    :return: (game, error message or None, secs taken)
+    """
+    error = None
+    starttime = time.perf_counter()
+    try:
+        if season >= 2010:
+            parse_game_toi(season, game, force_overwrite)
+        else:
+            parse_game_toi_from_html(season, game, force_overwrite)
+        if len(get_parsed_toi(season, game)) < 3600:
+            parse_game_toi_from_html(season, game, force_overwrite)
+    except Exception:
+        try:
+            parse_game_toi_from_html(season, game, force_overwrite)
+        except Exception as e:
+            error = '{0:s}: {1:s}'.format(type(e).__name__, str(e))
+    return game, error, time.perf_counter() - starttime
 
 
 def parse_game_toi(season, game, force_overwrite=False):
@@ -62,38 +103,56 @@ def parse_game_toi(season, game, force_overwrite=False):
 
     :return: nothing
     """
-    filename = get_game_parsed_toi_filename(season, game)
-    if not force_overwrite and os.path.exists(filename):
+    if not force_overwrite and has_parsed_toi(season, game):
         return False
 
     # TODO for some earlier seasons I need to read HTML instead. Also for live games
     # Looks like 2010-11 is the first year where this feed supplies more than just boxscore data
     rawtoi = scrape_toi.get_raw_toi(season, game)
+    return parse_game_toi_from_page(rawtoi, season, game)
+
+
+def parse_game_toi_from_page(rawtoi, season, game):
+    """
+    Same as parse_game_toi, but takes the json shifts already in memory (e.g. straight from the scrape) instead of
+    reading them back from the raw file.
+
+    :param rawtoi: dict, the json shifts
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: True if parsed, False if not
+    """
     try:
-        parsedtoi = read_shifts_from_page(rawtoi, season, game)
+        shifts = _read_shift_table_from_page(rawtoi)
+        if shifts is not None:
+            shifts = _check_shifts(_clean_shifts(shifts), season, game)
     except ValueError as ve:
         # ed.print_and_log('Error with {0:d} {1:d}'.format(season, game), 'warning')
         # ed.print_and_log(str(ve), 'warning')  # TODO look through 2016, getting some errors
-        parsedtoi = None
+        shifts = None
 
-    if parsedtoi is None:
+    if shifts is None:
         return False
 
     # PbP doesn't have strengths, so let's add those in
     # Ok maybe leave strengths, scores, etc, for team logs
     # update_pbp_from_toi(parsedtoi, season, game)
-    save_parsed_toi(parsedtoi, season, game)
+    save_parsed_shifts(shifts, season, game)
     # ed.print_and_log('Parsed shifts for {0:d} {1:d}'.format(season, game))
     return True
 
 
-def parse_game_toi_from_html(season, game, force_overwrite=False):
+def parse_game_toi_from_html(season, game, force_overwrite=False, incremental=False):
     """
     Parses TOI from the html shift log from this game.
 
     :param season: int, the season
     :param game: int, the game
     :param force_overwrite: bool. If True, will execute. If False, executes only if file does not exist yet.
+    :param incremental: bool. If True, the game's shifts are rewritten only if there are shifts not seen in the last
+        parse. Use for in-progress games; falls back to a full parse if there is no usable state from a previous
+        parse.
 
     :return: nothing
     """
@@ -106,49 +165,224 @@ def parse_game_toi_from_html(season, game, force_overwrite=False):
 
     gameinfo = schedules.get_game_data_from_schedule(season, game)
     try:
-        parsedtoi = read_shifts_from_html_pages(scrape_toi.get_raw_html_toi(season, game, 'H'),
-                                                scrape_toi.get_raw_html_toi(season, game, 'R'),
-                                                gameinfo['Home'], gameinfo['Road'],
-                                                season, game)
+        shifts = _read_shift_table_from_html_pages(scrape_toi.get_raw_html_toi(season, game, 'H'),
+                                                   scrape_toi.get_raw_html_toi(season, game, 'R'),
+                                                   gameinfo['Home'], gameinfo['Road'])
     except ValueError as ve:
         # ed.print_and_log('Error with {0:d} {1:d}'.format(season, game), 'warning')
         # ed.print_and_log(str(ve), 'warning')
-        parsedtoi = None
+        save_parsed_shifts(None, season, game)
+        return True
+
+    if incremental:
+        parsed = _parse_game_toi_incremental(shifts, season, game)
+        if parsed is not None:
+            return parsed
+
+    try:
+        cleanshifts = _check_shifts(_clean_shifts(shifts), season, game)
+    except ValueError:
+        cleanshifts = None
 
-    save_parsed_toi(parsedtoi, season, game)
+    save_parsed_shifts(cleanshifts, season, game)
+    if cleanshifts is not None:
+        _save_toi_state(shifts, season, game)
     # ed.print_and_log('Parsed shifts for {0:d} {1:d}'.format(season, game))
     return True
 
 
+def _parse_game_toi_incremental(shifts, season, game):
+    """
+    Saves this game's shifts again if there are any not seen in the last parse. Shifts are small, so all of them are
+    rewritten; the per-second TOI is only made from them when read (see get_parsed_toi).
+
+    :param shifts: dataframe, all shifts from the html logs, as from _read_shift_table_from_html_pages
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: True if TOI was updated, False if there were no new shifts, or None if a full parse is needed
+    """
+    state = helpers.read_json_file(get_game_toi_state_filename(season, game))
+    if state is None or not parsed_store.has_game('shifts', season, game):
+        return None
+
+    last_shifts = shifts.PlayerID.astype(str).map(state['LastShifts']).fillna(0)
+    newshifts = shifts[shifts.ShiftNum > last_shifts]
+    if len(newshifts) == 0:
+        return False
+
+    try:
+        cleanshifts = _check_shifts(_clean_shifts(shifts), season, game)
+    except (ValueError, TypeError):
+        return None
+    save_parsed_shifts(cleanshifts, season, game)
+    _save_toi_state(shifts, season, game)
+    return True
+
+
+def get_game_toi_state_filename(season, game):
+    """
+    Returns the filename of the state kept for incremental parsing of this game's html shifts while in progress
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: str, /scrape/data/parsed/toi/[season]/[game]_live.json
+    """
+    return os.path.join(organization.get_season_parsed_toi_folder(season), str(game) + '_live.json')
+
+
+def delete_toi_state(season, game):
+    """
+    Deletes the incremental parsing state for this game, if any. Do this once the game goes final.
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: nothing
+    """
+    filename = get_game_toi_state_filename(season, game)
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+def _save_toi_state(shifts, season, game):
+    """
+    Records the last shift number parsed for each player in this game.
+
+    :param shifts: dataframe, all shifts parsed so far, with columns PlayerID and ShiftNum
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: nothing
+    """
+    lastshifts = shifts[['PlayerID', 'ShiftNum']].groupby('PlayerID').max().ShiftNum
+    helpers.write_json_file({'LastShifts': {str(pid): int(num) for pid, num in lastshifts.items()}},
+                            get_game_toi_state_filename(season, game))
+
+
 def get_parsed_toi(season, game):
     """
-    Loads the compressed json file containing this game's shifts from disk.
+    Loads this game's parsed TOI, one row per second. It is made from the game's shifts in the parsed dataset (see
+    parsed_store); games parsed before shifts were saved have the per-second TOI stored instead.
 
     :param season: int, the season
     :param game: int, the game
 
-    :return: json, the json shifts
+    :return: dataframe, the parsed TOI
     """
-    return pd.read_hdf(get_game_parsed_toi_filename(season, game))
+    if parsed_store.has_game('shifts', season, game):
+        gameinfo = schedules.get_game_data_from_schedule(season, game)
+        toi = toi_from_shifts(get_parsed_shifts(season, game), gameinfo['Home'], gameinfo['Road'])
+    else:
+        # Files parsed before strength codes were added have labels only
+        toi = strengths.add_strength_codes(parsed_store.read_game('toi', season, game))
+    return schemas.apply_schema(toi, schemas.TOI_SCHEMA)
 
 
-def save_parsed_toi(toi, season, game):
+def get_parsed_toi_summary(season, game):
     """
-    Saves the pandas dataframe containing shift information to disk as an HDF5.
+    Loads each player's seconds on ice in this game at each strength. For games with shifts saved, this is added up
+    from the shifts without making the per-second TOI.
 
-    :param toi: df, a pandas dataframe with the shifts of the game
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dataframe with PlayerID, Team (H or R), Goalie (bool), HomeStrengthCode, RoadStrengthCode and Secs
+    """
+    if parsed_store.has_game('shifts', season, game):
+        gameinfo = schedules.get_game_data_from_schedule(season, game)
+        return summarize_toi_from_shifts(get_parsed_shifts(season, game), gameinfo['Home'], gameinfo['Road'])
+    toi = get_parsed_toi(season, game)
+    columns = {col: toi[col].astype(float).values for col in toi.columns
+               if schemas.get_dtype(col, schemas.TOI_SCHEMA) == schemas.PLAYER_ID}
+    return _summarize_toi_columns(columns, toi.HomeStrengthCode.values, toi.RoadStrengthCode.values)
+
+
+def has_parsed_toi(season, game):
+    """
+    Checks whether this game's TOI has been parsed, as shifts or (for games parsed before shifts were saved) per
+    second.
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: bool
+    """
+    return parsed_store.has_game('shifts', season, game) or parsed_store.has_game('toi', season, game)
+
+
+def get_parsed_shifts(season, game):
+    """
+    Loads this game's shifts from the parsed dataset (see parsed_store).
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dataframe with PlayerID, Start, End, Team, Duration and Pos, one row per shift
+    """
+    return parsed_store.read_game('shifts', season, game)
+
+
+def save_parsed_shifts(shifts, season, game):
+    """
+    Saves this game's shifts to the parsed dataset (see parsed_store). These are what get_parsed_toi reads.
+
+    :param shifts: dataframe, as from _clean_shifts
     :param season: int, the season
     :param game: int, the game
 
     :return: nothing
     """
-    if toi is None:
+    if shifts is None:
         print('None for TOI for', season, game)
         return
-    toi = toi.drop_duplicates()  # TODO why do I need this? E.g. see 20008 second 329
-    toi.to_hdf(get_game_parsed_toi_filename(season, game),
-               key='T{0:d}0{1:d}'.format(season, game),
-               mode='w', complib='zlib')
+    gameinfo = schedules.get_game_data_from_schedule(season, game)
+    parsed_store.save_game('shifts', shifts, season, game, gameinfo['Home'], gameinfo['Road'])
+
+
+def _check_shifts(shifts, season, game):
+    """
+    Makes sure the per-second TOI can be made from these shifts (e.g. no team has two goalies on at once), without
+    making it (see _check_goalie_shifts).
+
+    :param shifts: dataframe, as from _clean_shifts
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: shifts. Raises ValueError if the TOI cannot be made.
+    """
+    gameinfo = schedules.get_game_data_from_schedule(season, game)
+    _check_goalie_shifts(shifts, gameinfo['Home'], gameinfo['Road'])
+    return shifts
+
+
+def _check_goalie_shifts(shifts, home, road):
+    """
+    Raises the error _fill_toi_columns would for these shifts, from the goalies' shifts alone: seconds where a team
+    still has more than one goalie after keeping only the top goalie of each team with too many.
+
+    :param shifts: dataframe, as from _clean_shifts or get_parsed_shifts
+    :param home: int, the home team ID
+    :param road: int, the road team ID
+
+    :return: nothing. Raises ValueError if the TOI cannot be made.
+    """
+    shifts, numtimes, home, road = _get_shift_arrays(shifts, home, road)
+    shifts = shifts[(shifts.Pos == 'G').values]
+    teams = shifts.Team.apply(lambda x: 0 if str(int(x)) == home else 1).values.astype(np.int64)
+    times, rows = _expand_shifts(shifts.Start.values, shifts.End.values, numtimes)
+    teamtimes = teams[rows] * numtimes + times
+    pids = shifts.PlayerID.values[rows]
+
+    toomany = (np.bincount(teamtimes, minlength=2 * numtimes) > 1).reshape(2, numtimes)
+    keep = np.ones(len(rows), dtype=bool)
+    for team in range(2):
+        if toomany[team].any():
+            keep &= ~toomany[team][times] | (pids == _get_top_goalie(pids[teams[rows] == team]))
+    duplicates = np.sum(np.bincount(teamtimes[keep], minlength=2 * numtimes) > 1)
+    if duplicates > 0:
+        raise ValueError('Multiple goalies for a team at {0:d} seconds'.format(duplicates))
 
 
 def read_shifts_from_html_pages(rawtoi1, rawtoi2, teamid1, teamid2, season, game):
@@ -164,61 +398,39 @@ def read_shifts_from_html_pages(rawtoi1, rawtoi2, teamid1, teamid2, season, game
 
     :return: dataframe
     """
+    return _finish_toidf_manipulations(_read_shift_table_from_html_pages(rawtoi1, rawtoi2, teamid1, teamid2),
+                                       season, game)
+
 
-    from html_table_extractor.extractor import Extractor
+def _read_shift_table_from_html_pages(rawtoi1, rawtoi2, teamid1, teamid2):
+    """
+    Reads shifts from the two html pages given into a dataframe with one row per shift.
+
+    :param rawtoi1: str, html page of shift log for team id1
+    :param rawtoi2: str, html page of shift log for teamid2
+    :param teamid1: int, team id corresponding to rawtoi1
+    :param teamid2: int, team id corresponding to rawtoi1
+
+    :return: dataframe with columns PlayerID, ShiftNum, Period, Start, End, Team, Duration
+    """
     dflst = []
     for rawtoi, teamid in zip((rawtoi1, rawtoi2), (teamid1, teamid2)):
-        extractor = Extractor(rawtoi)
-        extractor.parse()
-        tables = extractor.return_list()
-
-        ids = []
-        periods = []
-        starts = []
-        ends = []
-        durationtime = []
-        teams = []
-        i = 0
-        while i < len(tables):
-            # A convenient artefact of this package: search for [p, p, p, p, p, p, p, p]
-            if len(tables[i]) == 8 and helpers.check_number_last_first_format(tables[i][0]):
-                pname = helpers.remove_leading_number(tables[i][0])
-                pname = helpers.flip_first_last(pname)
-                pid = players.player_as_id(pname)
-                i += 2  # skip the header row
-                while re.match('\d{1,2}', tables[i][0]):  # First entry is shift number
-                    # print(tables[i])
-                    shiftnum, per, start, end, dur, ev = tables[i]
-                    # print(pname, pid, shiftnum, per, start, end)
-                    ids.append(pid)
-                    if per == 'OT':
-                        per = 4
-                    periods.append(int(per))
-                    starts.append(start[:start.index('/')].strip())
-                    ends.append(end[:end.index('/')].strip())
-                    durationtime.append(helpers.mmss_to_secs(dur))
-                    teams.append(teamid)
-                    i += 1
-                i += 1
-            else:
-                i += 1
-
-        startmin = [x[:x.index(':')] for x in starts]
-        startsec = [x[x.index(':') + 1:] for x in starts]
-        starttimes = [1200 * (p - 1) + 60 * int(m) + int(s) + 1 for p, m, s in zip(periods, startmin, startsec)]
-        # starttimes = [0 if x == 1 else x for x in starttimes]
-        endmin = [x[:x.index(':')] for x in ends]
-        endsec = [x[x.index(':') + 1:] for x in ends]
-        # There is an extra -1 in endtimes to avoid overlapping start/end
-        endtimes = [1200 * (p - 1) + 60 * int(m) + int(s) for p, m, s in zip(periods, endmin, endsec)]
-
-        durationtime = [e - s for s, e in zip(starttimes, endtimes)]
-
-        df = pd.DataFrame({'PlayerID': ids, 'Period': periods, 'Start': starttimes, 'End': endtimes,
-                           'Team': teams, 'Duration': durationtime})
+        shifts = shift_log.read_shift_log(rawtoi)
+        pids = {name: players.player_as_id(helpers.flip_first_last(helpers.remove_leading_number(name)))
+                for name in set(shifts['Name'])}
+        ids = [pids[name] for name in shifts['Name']]
+        periods, starts, ends = shifts['Period'], shifts['Start'], shifts['End']
+
+        # Start times get 1 added to avoid overlapping start/end; see _read_shift_table_from_page
+        starttimes = clock.to_game_secs(periods, starts) + 1
+        endtimes = clock.to_game_secs(periods, ends)
+        durationtime = endtimes - starttimes
+
+        df = pd.DataFrame({'PlayerID': ids, 'ShiftNum': shifts['ShiftNum'], 'Period': periods, 'Start': starttimes,
+                           'End': endtimes, 'Team': teamid, 'Duration': durationtime})
         dflst.append(df)
 
-    return _finish_toidf_manipulations(pd.concat(dflst), season, game)
+    return pd.concat(dflst)
 
 
 def read_shifts_from_page(rawtoi, season, game):
@@ -231,6 +443,20 @@ def read_shifts_from_page(rawtoi, season, game):
 
     :return: dataframe
     """
+    df = _read_shift_table_from_page(rawtoi)
+    if df is None:
+        return
+    return _finish_toidf_manipulations(df, season, game)
+
+
+def _read_shift_table_from_page(rawtoi):
+    """
+    Reads JSON shift start-ends into a dataframe with one row per shift.
+
+    :param rawtoi: dict, json from NHL API
+
+    :return: dataframe with columns PlayerID, Period, Start, End, Team, Duration, or None if there are no shifts
+    """
     toi = rawtoi['data']
     if len(toi) == 0:
         return
@@ -250,8 +476,6 @@ def read_shifts_from_page(rawtoi, season, game):
         durations[i] = helpers.try_to_access_dict(dct, 'duration', default_return=0)
         teams[i] = helpers.try_to_access_dict(dct, 'teamId', default_return='')
 
-    gameinfo = schedules.get_game_data_from_schedule(season, game)
-
     # I originally took start times at face value and subtract 1 from end times
     # This caused problems with joining events--when there's a shot and the goalie freezes immediately
     # then, when you join this to the pbp, you'll get the players on the ice for the next draw as having
@@ -259,21 +483,12 @@ def read_shifts_from_page(rawtoi, season, game):
     # So I switch to adding 1 to start times, and leaving end times as-are.
     # That means that when joining on faceoffs, add 1 to faceoff times.
     # Exception: start time 1 --> start time 0
-    startmin = [x[:x.index(':')] for x in starts]
-    startsec = [x[x.index(':') + 1:] for x in starts]
-    starttimes = [1200 * (p - 1) + 60 * int(m) + int(s) + 1 for p, m, s in zip(periods, startmin, startsec)]
-    # starttimes = [0 if x == 1 else x for x in starttimes]
-    endmin = [x[:x.index(':')] for x in ends]
-    endsec = [x[x.index(':') + 1:] for x in ends]
-    # There is an extra -1 in endtimes to avoid overlapping start/end
-    endtimes = [1200 * (p - 1) + 60 * int(m) + int(s) for p, m, s in zip(periods, endmin, endsec)]
+    starttimes = clock.to_game_secs(periods, starts) + 1
+    endtimes = clock.to_game_secs(periods, ends)
+    durationtime = endtimes - starttimes
 
-    durationtime = [e - s for s, e in zip(starttimes, endtimes)]
-
-    df = pd.DataFrame({'PlayerID': ids, 'Period': periods, 'Start': starttimes, 'End': endtimes,
-                       'Team': teams, 'Duration': durationtime})
-
-    return _finish_toidf_manipulations(df, season, game)
+    return pd.DataFrame({'PlayerID': ids, 'Period': periods, 'Start': starttimes, 'End': endtimes,
+                         'Team': teams, 'Duration': durationtime})
 
 
 def _finish_toidf_manipulations(df, season, game):
@@ -287,7 +502,18 @@ def _finish_toidf_manipulations(df, season, game):
     :return: dataframe
     """
     gameinfo = schedules.get_game_data_from_schedule(season, game)
+    return toi_from_shifts(_clean_shifts(df), gameinfo['Home'], gameinfo['Road'])
 
+
+def _clean_shifts(df):
+    """
+    Fixes up a dataframe of shifts (one row per shift) read from json or html, and adds positions. This is what is
+    saved as the game's shifts.
+
+    :param df: dataframe with PlayerID, Start, End, Team and Duration
+
+    :return: dataframe with PlayerID, Start, End, Team, Duration and Pos
+    """
     # TODO don't read end times. Use duration, which has good coverage, to infer end. Then end + 1200 not needed below.
     # Sometimes shifts have the same start and time.
     # By the time we're here, they'll have start = end + 1
@@ -297,238 +523,323 @@ def _finish_toidf_manipulations(df, season, game):
     # Sometimes you see goalies with a shift starting in one period and ending in another
     # This is to help in those cases.
     if sum(df.End < df.Start) > 0:
-        # ed.print_and_log('Have to adjust a shift time', 'warn')
         # TODO I think I'm making a mistake with overtime shifts--end at 3900!
         # TODO also, maybe only go to the end of the period, not to 1200
-        # ed.print_and_log(df[df.End < df.Start])
+        df = df.copy()
         df.loc[df.End < df.Start, 'End'] = df.loc[df.End < df.Start, 'End'] + 1200
     # One issue coming up is when the above line comes into play--missing times are filled in as 0:00
-    tempdf = df[['PlayerID', 'Start', 'End', 'Team', 'Duration']].query("Duration > 0")
-    tempdf = tempdf.assign(Time=tempdf.Start)
-    # print(tempdf.head(20))
 
-    # Let's filter out goalies for now. We can add them back in later.
-    # This will make it easier to get the strength later
+    # Goalies are separated out by position below. This will make it easier to get the strength later
     pids = players.get_player_ids_file()
-    tempdf = tempdf.merge(pids[['ID', 'Pos']], how='left', left_on='PlayerID', right_on='ID')
-
-    # toi = pd.DataFrame({'Time': [i for i in range(0, max(df.End) + 1)]})
-    toi = pd.DataFrame({'Time': [i for i in range(0, int(round(max(df.End))))]})
-
-    # Originally used a hacky way to fill in times between shift start and end: increment tempdf by one, filter, join
-    # Faster to work with base structures
-    # Or what if I join each player to full df, fill backward on start and end, and filter out rows where end > time
-    # toidict = toi.to_dict(orient='list')
-    # players_by_sec = [[] for _ in range(min(toidict['Start'], toidict['End'] + 1))]
-    # for i in range(len(players_by_sec)):
-    #    for j in range(toidict['Start'][i], toidict['End'][i] + 1):
-    #        players_by_sec[j].append(toidict['PlayerID'][i])
-    # Maybe I can create a matrix with rows = time and columns = players
-    # Loop over start and end, and use iloc[] to set booleans en masse.
-    # Then melt and filter
-
-    # Create one row per second
-    alltimes = toi.Time
-    newdf = pd.DataFrame(index=alltimes)
-
-    # Add rows and set times to True simultaneously
-    for i, (pid, start, end, team, duration, time, pid, pos) in tempdf.iterrows():
-        newdf.loc[start:end, pid] = True
-
-    # Fill NAs to False
-    for col in newdf:
-        newdf.loc[:, col] = newdf[col].fillna(False)
-
-    # Go wide to long and then drop unneeded rows
-    newdf = helpers.melt_helper(newdf.reset_index(), id_vars='Time', # value_vars=newdf.columns,  # cols with num colnames causing errors
-                                var_name='PlayerID', value_name='OnIce')
-    newdf = newdf[newdf.OnIce].drop('OnIce', axis=1)
-    newdf = newdf.merge(tempdf.drop('Time', axis=1), how='left', on='PlayerID') \
-        .query("Time <= End & Time >= Start") \
+    df = df[['PlayerID', 'Start', 'End', 'Team', 'Duration']] \
+        .merge(pids[['ID', 'Pos']], how='left', left_on='PlayerID', right_on='ID') \
         .drop('ID', axis=1)
+    return schemas.apply_schema(df, schemas.SHIFT_SCHEMA)
 
-    # In case there were rows that were all missing, join onto TOI
-    tempdf = toi.merge(newdf, how='left', on='Time')
-    # TODO continue here--does newdf match tempdf after sort_values?
 
-    # Old method
-    # toidfs = []
-    # while len(tempdf.index) > 0:
-    #    temptoi = toi.merge(tempdf, how='inner', on='Time')
-    #    toidfs.append(temptoi)
+def toi_from_shifts(shifts, home, road):
+    """
+    Makes the matrix of players on ice for each second from this game's shifts.
 
-    #    tempdf = tempdf.assign(Time=tempdf.Time + 1)
-    #    tempdf = tempdf.query('Time <= End')
+    :param shifts: dataframe, as from _clean_shifts or get_parsed_shifts
+    :param home: int, the home team ID
+    :param road: int, the road team ID
 
-    # tempdf = pd.concat(toidfs)
-    # tempdf = tempdf.sort_values(by='Time')
+    :return: dataframe with Time, H1-H6, HG, R1-R6, RG, HomeStrength, RoadStrength, HomeStrengthCode and
+        RoadStrengthCode
+    """
+    # TODO data quality check that I don't miss times in the middle of the game
+    return _make_toi_frame(*_fill_complete_seconds(shifts, home, road))
 
-    goalies = tempdf[tempdf.Pos == 'G'].drop({'Pos'}, axis=1)
-    tempdf = tempdf[tempdf.Pos != 'G'].drop({'Pos'}, axis=1)
 
-    # Append team name to start of columns by team
-    home = str(gameinfo['Home'])
-    road = str(gameinfo['Road'])
+def _fill_complete_seconds(shifts, home, road):
+    """
+    Fills in the players on ice for each second from this game's shifts, keeping only seconds with enough players on
+    ice (see _has_enough_players).
 
-    # Goalies
-    # Let's assume we get only one goalie per second per team.
-    # TODO: flag if there are multiple listed and pick only one
-    goalies.loc[:, 'GTeam'] = goalies.Team.apply(lambda x: 'HG' if str(int(x)) == home else 'RG')
-    try:
-        goalies2 = goalies[['Time', 'PlayerID', 'GTeam']] \
-            .pivot(index='Time', columns='GTeam', values='PlayerID') \
-            .reset_index()
-    except ValueError:
-        # Duplicate entries in index error.
-        # ed.print_and_log('Multiple goalies for a team in {0:d} {1:d}, picking one with the most TOI'.format(
-        #    season, game), 'warn')
-
-        # Find times with multiple goalies
-        too_many_goalies_h = goalies[goalies.GTeam == 'HG'][['Time']] \
-            .assign(GoalieCount=1) \
-            .groupby('Time').count() \
-            .reset_index() \
-            .query('GoalieCount > 1')
-
-        too_many_goalies_r = goalies[goalies.GTeam == 'RG'][['Time']] \
-            .assign(GoalieCount=1) \
-            .groupby('Time').count() \
-            .reset_index() \
-            .query('GoalieCount > 1')
-
-        # Find most common goalie for each team
-        if len(too_many_goalies_h) == 0:
-            problem_times_revised_h = goalies
-        else:  # i.e. if len(too_many_goalies_h) > 0:
-            top_goalie_h = goalies[goalies.GTeam == 'HG'][['PlayerID']] \
-                .assign(GoalieCount=1) \
-                .groupby('PlayerID').count() \
-                .reset_index() \
-                .sort_values('GoalieCount', ascending=False) \
-                .PlayerID.iloc[0]
-            # and now finally drop problem times
-            problem_times_revised_h = goalies \
-                .merge(too_many_goalies_h[['Time']], how='outer', on='Time', indicator=True)
-            problem_times_revised_h.loc[:, 'ToDrop'] = (problem_times_revised_h._merge == 'both') & \
-                                                       (problem_times_revised_h.PlayerID != top_goalie_h)
-            problem_times_revised_h = problem_times_revised_h[problem_times_revised_h.ToDrop == False] \
-                .drop({'_merge', 'ToDrop'}, axis=1)
-
-        if len(too_many_goalies_r) == 0:
-            problem_times_revised_r = problem_times_revised_h
-        else:  # i.e. if len(too_many_goalies_r) > 0:
-            top_goalie_r = goalies[goalies.GTeam == 'RG'][['PlayerID']] \
-                .assign(GoalieCount=1) \
-                .groupby('PlayerID').count() \
-                .reset_index() \
-                .sort_values('GoalieCount', ascending=False) \
-                .PlayerID.iloc[0]
-            problem_times_revised_r = problem_times_revised_h \
-                .merge(too_many_goalies_r[['Time']], how='outer', on='Time', indicator=True)
-            problem_times_revised_r.loc[:, 'ToDrop'] = (problem_times_revised_r._merge == 'both') & \
-                                                       (problem_times_revised_r.PlayerID != top_goalie_r)
-            problem_times_revised_r = problem_times_revised_r[problem_times_revised_r.ToDrop == False] \
-                .drop({'_merge', 'ToDrop'}, axis=1)
-
-        # Pivot again
-        goalies2 = problem_times_revised_r[['Time', 'PlayerID', 'GTeam']] \
-            .pivot(index='Time', columns='GTeam', values='PlayerID') \
-            .reset_index()
-
-    # Home
-    hdf = tempdf.query('Team == "' + home + '"').sort_values(['Time', 'Duration'], ascending=[True, False])
-    if len(hdf) == 0:
-        # Earlier versions of pandas can have diff behavior
-        hdf = tempdf.query('Team == ' + home).sort_values(['Time', 'Duration'], ascending=[True, False])
-    hdf2 = hdf[['Time', 'Duration']].groupby('Time').rank(method='first', ascending=False)
-    hdf2 = hdf2.rename(columns={'Duration': 'rank'})
-    hdf2.loc[:, 'rank'] = hdf2['rank'].apply(lambda x: int(x))
-    hdf.loc[:, 'rank'] = 'H' + hdf2['rank'].astype('str')
-
-    rdf = tempdf.query('Team == "' + road + '"').sort_values(['Time', 'Duration'], ascending=[True, False])
-    if len(rdf) == 0:
-        rdf = tempdf.query('Team == ' + road).sort_values(['Time', 'Duration'], ascending=[True, False])
-    rdf2 = rdf[['Time', 'Duration']].groupby('Time').rank(method='first', ascending=False)
-    rdf2 = rdf2.rename(columns={'Duration': 'rank'})
-    rdf2.loc[:, 'rank'] = rdf2['rank'].apply(lambda x: int(x))
-    rdf.loc[:, 'rank'] = 'R' + rdf2['rank'].astype('str')
-
-    # Remove values above 6--looking like there won't be many
-    # But in those cases take shifts with longest durations
-    # That's why we create hdf and rdf by also sorting by Time and Duration above, and select duration for rank()
-    if len(hdf[hdf['rank'] == "H7"]) > 0:
-        # ed.print_and_log('Some times from {0:d} {1:d} have too many home players; cutting off at 6'.format(
-        #    season, game), 'warn')
-        # ed.print_and_log('Longest shift being lost was {0:d} seconds'.format(
-        #    hdf[hdf['rank'] == "H7"].Duration.max()), 'warn')
-        pass
-    if len(rdf[rdf['rank'] == "R7"]) > 0:
-        # ed.print_and_log('Some times from {0:d} {1:d} have too many road players; cutting off at 6'.format(
-        #    season, game), 'warn')
-        # ed.print_and_log('Longest shift being lost was {0:d} seconds'.format(
-        #    rdf[rdf['rank'] == "H7"].Duration.max()), 'warn')
-        pass
-
-    hdf = hdf.pivot(index='Time', columns='rank', values='PlayerID').iloc[:, 0:6]
-    hdf.reset_index(inplace=True)  # get time back as a column
-    rdf = rdf.pivot(index='Time', columns='rank', values='PlayerID').iloc[:, 0:6]
-    rdf.reset_index(inplace=True)
-
-    toi = toi.merge(hdf, how='left', on='Time') \
-        .merge(rdf, how='left', on='Time') \
-        .merge(goalies2, how='left', on='Time')
-
-    column_order = list(toi.columns.values)
-    column_order = ['Time'] + [x for x in sorted(column_order[1:])]  # First entry is Time; sort rest
-    toi = toi[column_order]
-    # Now should be Time, H1, H2, ... HG, R1, R2, ..., RG
-
-    # For games in the first, HG and RG may not exist yet. Have dummy replacements in there.
-    # Will be wrong for when goalie is pulled in first, but oh well...
-    if 'HG' not in toi.columns:
-        newcol = [0 for _ in range(len(toi))]
-        toi.insert(loc=toi.columns.get_loc('R1'), column='HG', value=newcol)
-    if 'RG' not in toi.columns:
-        toi.loc[:, 'RG'] = 0
-
-    toi.loc[:, 'HomeSkaters'] = 0
-    for col in toi.loc[:, 'H1':'HG'].columns[:-1]:
-        toi.loc[:, 'HomeSkaters'] = toi[col].notnull() + toi.HomeSkaters
-    toi.loc[:, 'HomeSkaters'] = 100 * toi['HG'].notnull() + toi.HomeSkaters  # a hack to make it easy to recognize
-    toi.loc[:, 'RoadSkaters'] = 0
-    for col in toi.loc[:, 'R1':'RG'].columns[:-1]:
-        toi.loc[:, 'RoadSkaters'] = toi[col].notnull() + toi.RoadSkaters
-    toi.loc[:, 'RoadSkaters'] = 100 * toi['RG'].notnull() + toi.RoadSkaters  # a hack to make it easy to recognize
-
-    # This is how we label strengths: 5 means 5 skaters plus goalie; five skaters w/o goalie is 4+1.
-    toi.loc[:, 'HomeStrength'] = toi.HomeSkaters.apply(
-        lambda x: '{0:d}'.format(x - 100) if x >= 100 else '{0:d}+1'.format(x - 1))
-    toi.loc[:, 'RoadStrength'] = toi.RoadSkaters.apply(
-        lambda x: '{0:d}'.format(x - 100) if x >= 100 else '{0:d}+1'.format(x - 1))
-
-    toi.drop({'HomeSkaters', 'RoadSkaters'}, axis=1, inplace=True)
-
-    # Also drop -1+1 and 0+1 cases, which are clearly errors, and the like.
-    # Need at least 3 skaters apiece, 1 goalie apiece, time, and strengths to be non-NA = 11 non NA values
-    toi2 = toi.dropna(axis=0, thresh=11)  # drop rows without at least 11 non-NA values
-    if len(toi2) < len(toi):
-        # ed.print_and_log('Dropped {0:d}/{1:d} times in {2:d} {3:d} because of invalid strengths'.format(
-        #    len(toi) - len(toi2), len(toi), season, game), 'warn')
-        pass
+    :param shifts: dataframe, as from _clean_shifts or get_parsed_shifts
+    :param home: int, the home team ID
+    :param road: int, the road team ID
+
+    :return: (times, columns, homecodes, roadcodes), as from _fill_toi_columns but for the kept seconds only
+    """
+    columns, homecodes, roadcodes = _fill_toi_columns(*_get_shift_arrays(shifts, home, road))
+    keep = _has_enough_players(columns)
+    return (np.flatnonzero(keep), {col: values[keep] for col, values in columns.items()},
+            homecodes[keep], roadcodes[keep])
+
+
+def _get_shift_arrays(shifts, home, road):
+    """
+    Gets the arguments for _build_toi_matrix or _fill_toi_columns from this game's shifts.
+
+    :param shifts: dataframe, as from _clean_shifts or get_parsed_shifts
+    :param home: int, the home team ID
+    :param road: int, the road team ID
+
+    :return: (shifts, numtimes, home, road)
+    """
+    shifts = schemas.apply_schema(shifts, schemas.SHIFT_SCHEMA)
+    numtimes = int(round(shifts.End.max()))
+    # Missing player and team IDs are NaN here, so they stay out of slots
+    shifts = shifts[shifts.Duration > 0]
+    shifts = shifts.assign(PlayerID=shifts.PlayerID.astype(float).values, Team=shifts.Team.astype(float).values)
+    return shifts, numtimes, str(home), str(road)
+
+
+def _has_enough_players(columns):
+    """
+    Flags seconds with enough players on ice to keep. Drops -1+1 and 0+1 cases, which are clearly errors, and the like.
+    Need at least 3 skaters apiece and 1 goalie apiece.
+
+    :param columns: dict of arrays, with player columns (H1, HG, R1, etc) and maybe others
+
+    :return: array of bool
+    """
+    onice = [pd.notnull(values) for col, values in columns.items()
+             if schemas.get_dtype(col, schemas.TOI_SCHEMA) == schemas.PLAYER_ID]
+    return np.sum(onice, axis=0) >= 8
 
-    # TODO data quality check that I don't miss times in the middle of the game
 
-    return toi2
+def summarize_toi_from_shifts(shifts, home, road):
+    """
+    Adds up each player's seconds on ice in this game at each strength, without making the matrix of players on ice
+    for each second.
+
+    :param shifts: dataframe, as from _clean_shifts or get_parsed_shifts
+    :param home: int, the home team ID
+    :param road: int, the road team ID
+
+    :return: dataframe with PlayerID, Team (H or R), Goalie (bool), HomeStrengthCode, RoadStrengthCode and Secs
+    """
+    _, columns, homecodes, roadcodes = _fill_complete_seconds(shifts, home, road)
+    return _summarize_toi_columns(columns, homecodes, roadcodes)
+
+
+def _summarize_toi_columns(columns, homecodes, roadcodes):
+    """
+    Adds up each player's seconds on ice at each strength.
+
+    :param columns: dict of player columns (H1, HG, R1, etc) to arrays of player IDs, one per second
+    :param homecodes: array of home strength codes, one per second
+    :param roadcodes: array of road strength codes, one per second
+
+    :return: dataframe with PlayerID, Team (H or R), Goalie (bool), HomeStrengthCode, RoadStrengthCode and Secs
+    """
+    # Packs each second on ice into one int: player, then team, goalie or not, and the two codes in a byte apiece.
+    # Counting unique ints is much faster than a groupby on five columns.
+    keys = []
+    for col, pids in columns.items():
+        pids = np.asarray(pids, dtype=float)
+        # Teams without a goalie have a dummy 0 in HG or RG
+        onice = ~np.isnan(pids) & (pids != 0)
+        flags = (int(col.startswith('R')) << 17) | (int(col.endswith('G')) << 16)
+        keys.append((pids[onice].astype(np.int64) << 18) | flags |
+                    (np.asarray(homecodes)[onice].astype(np.uint8).astype(np.int64) << 8) |
+                    np.asarray(roadcodes)[onice].astype(np.uint8).astype(np.int64))
+    keys, secs = np.unique(np.concatenate(keys), return_counts=True)
+
+    return pd.DataFrame({'PlayerID': schemas.as_player_ids(keys >> 18),
+                         'Team': np.where((keys >> 17) & 1, 'R', 'H'),
+                         'Goalie': ((keys >> 16) & 1).astype(bool),
+                         'HomeStrengthCode': ((keys >> 8) & 0xFF).astype(np.uint8).view(np.int8),
+                         'RoadStrengthCode': (keys & 0xFF).astype(np.uint8).view(np.int8),
+                         'Secs': secs})
+
+
+def _build_toi_matrix(shifts, numtimes, home, road):
+    """
+    Makes the matrix of players on ice for each second from a table of shifts.
+
+    :param shifts: dataframe with PlayerID, Start, End, Team, Duration and Pos, one row per shift
+    :param numtimes: int, the number of seconds
+    :param home: str, the home team ID
+    :param road: str, the road team ID
+
+    :return: dataframe with Time, H1-H6, HG, R1-R6, RG, HomeStrength, RoadStrength, HomeStrengthCode and
+        RoadStrengthCode (see strengths)
+    """
+    return _make_toi_frame(np.arange(numtimes, dtype=np.int64), *_fill_toi_columns(shifts, numtimes, home, road))
+
+
+def _make_toi_frame(times, columns, homecodes, roadcodes):
+    """
+    Puts players on ice and strengths for each second, as from _fill_toi_columns, into a dataframe.
+
+    :param times: array of int, the seconds
+    :param columns: dict of H1-H6, HG, R1-R6 and RG to arrays of player IDs
+    :param homecodes: array of home strength codes
+    :param roadcodes: array of road strength codes
+
+    :return: dataframe with Time, H1-H6, HG, R1-R6, RG, HomeStrength, RoadStrength, HomeStrengthCode and
+        RoadStrengthCode
+    """
+    # Should be Time, H1, H2, ... HG, R1, R2, ..., RG
+    return pd.DataFrame(dict([('Time', times)] + [(col, columns[col]) for col in sorted(columns)] +
+                             [('HomeStrength', strengths.code_as_strength(homecodes)),
+                              ('RoadStrength', strengths.code_as_strength(roadcodes)),
+                              ('HomeStrengthCode', homecodes), ('RoadStrengthCode', roadcodes)]))
+
+
+def _fill_toi_columns(shifts, numtimes, home, road):
+    """
+    Fills in the players on ice for each second from a table of shifts, as arrays.
+
+    Rather than filling in each shift second by second, all shifts are expanded to one entry per second at once
+    (see _expand_shifts). After one sort, slots, goalies and strengths are filled in by toi_kernels.fill_seconds in a
+    single pass over the seconds. Times run from 0 to numtimes - 1.
+
+    :param shifts: dataframe with PlayerID, Start, End, Team, Duration and Pos, one row per shift
+    :param numtimes: int, the number of seconds
+    :param home: str, the home team ID
+    :param road: str, the road team ID
+
+    :return: (columns, homecodes, roadcodes): a dict of H1-H6, HG, R1-R6 and RG to arrays of player IDs (NaN for
+        nobody, and 0 in HG or RG for a team with no goalie at all), and two arrays of strength codes
+    """
+    times, rows = _expand_shifts(shifts.Start.values, shifts.End.values, numtimes)
+
+    # Players are numbered in order of first appearance. When shifts are tied on duration, the lower number gets the
+    # lower slot, and then the earlier shift.
+    codes, pids = pd.factorize(shifts.PlayerID)
+    isgoalie = (shifts.Pos == 'G').values
+    durations = shifts.Duration.values.astype(float)
+
+    # Team for each shift: 0 for home, 1 for road, -1 for goalies and anyone else
+    skaterteams = np.full(len(shifts), -1, dtype=np.int64)
+    skaterteams[_is_team(shifts.Team, road)] = 1
+    skaterteams[_is_team(shifts.Team, home)] = 0
+    skaterteams[isgoalie] = -1
+    goalieteams = np.full(len(shifts), 1, dtype=np.int64)
+    goalieteams[isgoalie] = shifts.Team[isgoalie].apply(lambda x: 0 if str(int(x)) == home else 1).values
+
+    entries = skaterteams[rows] >= 0
+    skatertimes, skaterrows = times[entries], rows[entries]
+    order = np.lexsort((skaterrows, codes[skaterrows], -durations[skaterrows], skatertimes, skaterteams[skaterrows]))
+    skatertimes, skaterrows = skatertimes[order], skaterrows[order]
+    skateroffsets = toi_kernels.get_team_offsets(skaterteams[skaterrows], skatertimes, numtimes)
+
+    entries = isgoalie[rows]
+    goalietimes, goalierows = times[entries], rows[entries]
+    order = np.lexsort((goalietimes, goalieteams[goalierows]))
+    goalietimes, goalierows = goalietimes[order], goalierows[order]
+    goalieoffsets = toi_kernels.get_team_offsets(goalieteams[goalierows], goalietimes, numtimes)
+
+    # Looking like there won't be many seconds with more than six skaters, but in those cases drop the shortest shifts
+    names = []
+    maxslots = np.diff(skateroffsets).reshape(2, numtimes).max(axis=1) if numtimes > 0 else np.zeros(2, dtype=int)
+    slotcols = np.full((2, max(maxslots) + 1), -1, dtype=np.int64)
+    for team, prefix in enumerate(('H', 'R')):
+        names.append(_get_slot_names(prefix, maxslots[team]))
+        for col, name in enumerate(names[team]):
+            slotcols[team, int(name[1:])] = col
+
+    # If a team has more than one goalie at some seconds, we keep the one on ice the most for that team
+    topgoalies = np.full(2, -1, dtype=np.int64)
+    goaliecounts = np.diff(goalieoffsets).reshape(2, numtimes)
+    for team in range(2):
+        if (goaliecounts[team] > 1).any():
+            teampids = pids.take(codes[goalierows[goalieteams[goalierows] == team]])
+            topgoalies[team] = pids.get_loc(_get_top_goalie(teampids))
+
+    skaters, goalies, counts, duplicates = toi_kernels.fill_seconds(
+        numtimes, skateroffsets, codes[skaterrows], slotcols, goalieoffsets, codes[goalierows], topgoalies)
+    if duplicates > 0:
+        raise ValueError('Multiple goalies for a team at {0:d} seconds'.format(duplicates))
+
+    # Code -1 (nobody) picks the NaN at the end
+    pidvalues = np.append(np.asarray(pids, dtype=float if np.issubdtype(pids.dtype, np.number) else object), np.nan)
+    columns = {}
+    for team, prefix in enumerate(('H', 'R')):
+        for col, name in enumerate(names[team]):
+            columns[name] = pidvalues[skaters[team, col]]
+        if (goalies[team] >= 0).any():
+            columns[prefix + 'G'] = pidvalues[goalies[team]]
+        else:
+            # For games in the first, HG and RG may not exist yet. Have dummy replacements in there.
+            # Will be wrong for when goalie is pulled in first, but oh well...
+            columns[prefix + 'G'] = np.zeros(numtimes, dtype=np.int64)
+            counts[team] += 100
+
+    return columns, strengths.counts_as_codes(counts[0]), strengths.counts_as_codes(counts[1])
+
+
+def _expand_shifts(starts, ends, numtimes):
+    """
+    Expands shifts into one entry per second on ice, from start to end inclusive, dropping seconds outside
+    0 to numtimes - 1.
+
+    Each shift takes (end - start + 1) consecutive entries; within a shift, times are the start plus a running count
+    that restarts at each shift.
+
+    :param starts: array of int
+    :param ends: array of int
+    :param numtimes: int, the number of seconds
+
+    :return: (times, rows), two arrays of int with one entry per second on ice: the second, and the shift's position
+    """
+    starts = np.maximum(np.asarray(starts, dtype=np.int64), 0)
+    ends = np.minimum(np.asarray(ends, dtype=np.int64), numtimes - 1)
+    lengths = np.maximum(ends - starts + 1, 0)
+
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    shiftfirst = np.cumsum(lengths) - lengths
+    times = starts[rows] + np.arange(lengths.sum()) - shiftfirst[rows]
+    return times, rows
+
+
+def _is_team(teams, team):
+    """
+    Flags shifts for this team.
+
+    :param teams: series, the team ID for each shift
+    :param team: str, the team ID
+
+    :return: array of bool
+    """
+    if pd.api.types.is_numeric_dtype(teams):
+        return (teams == int(team)).values
+    return (teams.astype(str) == team).values
+
+
+def _get_slot_names(prefix, maxslots):
+    """
+    Returns the skater columns kept for a team. Slot names sort as strings (so H10 comes before H2), and the first six
+    names are the ones kept.
+
+    :param prefix: str, H or R
+    :param maxslots: int, the most skaters the team has at any second
+
+    :return: list of str, e.g. ['H1', 'H2', 'H3', 'H4', 'H5', 'H6']
+    """
+    return sorted('{0:s}{1:d}'.format(prefix, slot) for slot in range(1, maxslots + 1))[:toi_kernels.MAX_SKATERS]
+
+
+def _get_top_goalie(pids):
+    """
+    Returns the goalie with the most seconds on ice.
+
+    :param pids: array of player IDs, one per second on ice
+
+    :return: player ID
+    """
+    return pd.DataFrame({'PlayerID': pids}) \
+        .assign(GoalieCount=1) \
+        .groupby('PlayerID').count() \
+        .reset_index() \
+        .sort_values('GoalieCount', ascending=False) \
+        .PlayerID.iloc[0]
 
 
 def get_game_parsed_toi_filename(season, game):
     """
-    Returns the filename of the parsed toi folder
+    Returns the filename parsed toi was saved to, one HDF5 file per game, before parsed_store. Only used to migrate
+    those files (see scripts/migrate_parsed_to_dataset.py).
 
     :param season: int, current season
     :param game: int, game
 
-    :return: str, /scrape/data/parsed/toi/[season]/[game].zlib
+    :return: str, /scrape/data/parsed/toi/[season]/[game].h5
     """
     return os.path.join(organization.get_season_parsed_toi_folder(season), str(game) + '.h5')
 
@@ -543,7 +854,7 @@ def get_melted_home_road_5v5_toi(season, game):
     :return: (home_df, road_df), each with columns Time, PlayerID, and Team (which will be H or R)
     """
     toi = get_parsed_toi(season, game)
-    fives = toi[(toi.HomeStrength == "5") & (toi.RoadStrength == "5")]
+    fives = toi[strengths.is_five_on_five(toi)]
     home = helpers.melt_helper(fives[['Time', 'H1', 'H2', 'H3', 'H4', 'H5']],
                                id_vars='Time', var_name='P', value_name='PlayerID') \
         .drop('P', axis=1) \
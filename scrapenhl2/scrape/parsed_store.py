@@ -0,0 +1,495 @@
+"""
+This module contains methods for storing parsed pbp and toi as one partitioned Parquet dataset per table, instead of
+one HDF5 file per game.
+
+The tables are pbp, shifts (TOI as one row per shift, which is how it is parsed now; see parse_toi.get_parsed_toi)
+and toi (TOI as one row per second, for games parsed before shifts were saved). Each table is a folder under the parsed data folder, partitioned by season and game type, e.g.
+/scrape/data/parsed/dataset/toi/Season=2016/GameType=R/. Within a partition:
+
+* games.parquet holds games compacted together, sorted by game, with one row group per game
+* games-[n].parquet holds games from a later compaction, laid out the same way
+* game-[game].parquet holds a game written since the last compaction (e.g. a game in progress, or one reparsed)
+
+If a game is in more than one file, the newest one is used: loose files first, then batches from the highest n down,
+then games.parquet. compact_season writes the loose files to a new batch, so a daily update rewrites only the games it
+parsed, and merges everything into games.parquet once there are MERGE_AFTER_BATCHES batches.
+
+Every row carries its game and the game's home and road team IDs. Reads filtered on game or team skip whole files and
+row groups using the min/max statistics Parquet keeps for each, and read only the columns asked for.
+
+Games read with read_game are kept in an in-process cache, up to a budget in bytes (see set_cache_budget), evicting
+the least recently used first. An entry is dropped when its game is saved, and is not used if the game's files have
+changed on disk since (e.g. written by another process, or compacted).
+"""
+
+import collections
+import os
+import os.path
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from scrapenhl2.scrape import organization, schemas
+
+TABLES = {'pbp': schemas.PBP_SCHEMA, 'shifts': schemas.SHIFT_SCHEMA, 'toi': schemas.TOI_SCHEMA}
+KEY_COLUMNS = ['Game', 'Home', 'Road']
+
+# Game types by the first digit of the game number, as the schedule names them
+_GAME_TYPES = {1: 'PR', 2: 'R', 3: 'P', 4: 'A'}
+_COMPACTED = 'games.parquet'
+_BATCH = re.compile(r'^games-(\d+)\.parquet$')
+_COMPRESSION = 'zstd'
+MERGE_AFTER_BATCHES = 8
+
+_COMPACTED_GAMES = {}  # filename: ((modification time in ns, size), set of games in it)
+
+# Bytes of dataframes read_game may keep in memory. Override with set_cache_budget or the SCRAPENHL2_PARSED_CACHE_MB
+# environment variable.
+DEFAULT_CACHE_BUDGET = int(float(os.environ.get('SCRAPENHL2_PARSED_CACHE_MB', 256)) * 1024 * 1024)
+
+_CACHE = collections.OrderedDict()  # (table, season, game): (files' modification times, dataframe, bytes), oldest first
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {}
+_CACHE_BUDGET = DEFAULT_CACHE_BUDGET
+
+
+def get_game_type(game):
+    """
+    Returns the game type from the game number: PR for preseason, R for regular season, P for playoffs, A for
+    all-star.
+
+    :param game: int, the game
+
+    :return: str
+    """
+    return _GAME_TYPES.get(int(game) // 10000, 'NA')
+
+
+def get_table_folder(table):
+    """
+    Returns the folder containing this table's dataset.
+
+    :param table: str, pbp, shifts or toi
+
+    :return: str, /scrape/data/parsed/dataset/[table]/
+    """
+    return os.path.join(organization.get_parsed_data_folder(), 'dataset', table)
+
+
+def get_partition_folder(table, season, gametype):
+    """
+    Returns the folder containing this table's games of this type from this season.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+    :param gametype: str, e.g. R (see get_game_type)
+
+    :return: str, /scrape/data/parsed/dataset/[table]/Season=[season]/GameType=[gametype]/
+    """
+    return os.path.join(get_table_folder(table), 'Season={0:d}'.format(season), 'GameType={0:s}'.format(gametype))
+
+
+def get_game_filename(table, season, game):
+    """
+    Returns the filename this game is written to until the next compaction.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: str, /scrape/data/parsed/dataset/[table]/Season=[season]/GameType=[type]/game-[game].parquet
+    """
+    return os.path.join(get_partition_folder(table, season, get_game_type(game)), 'game-{0:d}.parquet'.format(game))
+
+
+def _get_partition_folders(table, season, games=None):
+    """
+    Returns partition folders for this season that exist, and could hold these games.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+    :param games: list of int, or None for all
+
+    :return: list of str
+    """
+    seasonfolder = os.path.dirname(get_partition_folder(table, season, ''))
+    if not os.path.isdir(seasonfolder):
+        return []
+    gametypes = None if games is None else {get_game_type(game) for game in games}
+    return [os.path.join(seasonfolder, name) for name in sorted(os.listdir(seasonfolder))
+            if name.startswith('GameType=') and (gametypes is None or name[len('GameType='):] in gametypes)]
+
+
+def _get_loose_files(folder):
+    """
+    Returns files in this partition written since the last compaction.
+
+    :param folder: str, a partition folder
+
+    :return: dict of game: filename
+    """
+    return {int(name[len('game-'):-len('.parquet')]): os.path.join(folder, name) for name in os.listdir(folder)
+            if name.startswith('game-') and name.endswith('.parquet')}
+
+
+def _get_compacted_files(folder):
+    """
+    Returns the compacted files in this partition, newest first: batches from the highest number down, then
+    games.parquet.
+
+    :param folder: str, a partition folder
+
+    :return: list of str
+    """
+    if not os.path.isdir(folder):
+        return []
+    names = os.listdir(folder)
+    batches = sorted((int(match.group(1)), match.group(0)) for match in map(_BATCH.match, names) if match)
+    filenames = [name for _, name in reversed(batches)]
+    if _COMPACTED in names:
+        filenames.append(_COMPACTED)
+    return [os.path.join(folder, name) for name in filenames]
+
+
+def _get_file_version(filename):
+    """
+    Returns what caches use to tell whether a file has changed. Modification times alone can miss a rewrite within
+    the same tick on filesystems with coarse timestamps, so the size is checked too.
+
+    :param filename: str
+
+    :return: (int, int), modification time in ns and size
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_compacted_games(filename):
+    """
+    Returns games in this compacted file, from the statistics of its row groups (one per game) rather than the data.
+    Cached until the file changes.
+
+    :param filename: str
+
+    :return: set of int
+    """
+    version = _get_file_version(filename)
+    cached = _COMPACTED_GAMES.get(filename)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    metadata = pq.ParquetFile(filename).metadata
+    col = metadata.schema.names.index('Game')
+    games = {metadata.row_group(i).column(col).statistics.min for i in range(metadata.num_row_groups)}
+    _COMPACTED_GAMES[filename] = (version, games)
+    return games
+
+
+def has_game(table, season, game):
+    """
+    Checks whether this game has been written to this table.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: bool
+    """
+    if os.path.exists(get_game_filename(table, season, game)):
+        return True
+    return any(int(game) in _get_compacted_games(filename)
+               for filename in _get_compacted_files(get_partition_folder(table, season, get_game_type(game))))
+
+
+def save_game(table, df, season, game, home, road):
+    """
+    Writes this game to the table, replacing anything written for it before. Columns are typed as in schemas, with
+    categoricals stored as their values, so files written at different times line up.
+
+    :param table: str, pbp, shifts or toi
+    :param df: dataframe, e.g. the parsed pbp of the game
+    :param season: int, the season
+    :param game: int, the game
+    :param home: int, the home team ID
+    :param road: int, the road team ID
+
+    :return: nothing
+    """
+    df = schemas.apply_schema(df, TABLES[table])
+    df = df.assign(**{col: np.asarray(df[col].values) for col in df.columns
+                      if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    df = df.assign(Game=np.int32(game), Home=np.int32(home), Road=np.int32(road))
+
+    filename = get_game_filename(table, season, game)
+    organization.check_create_folder(os.path.dirname(filename))
+    # Write elsewhere and then move, so readers never see half a file
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), filename + '.tmp', compression=_COMPRESSION)
+    os.replace(filename + '.tmp', filename)
+    with _CACHE_LOCK:
+        _CACHE.pop((table, int(season), int(game)), None)
+
+
+def _read_partitions(folders, games=None, teams=None, columns=None):
+    """
+    Reads from these partitions, taking each game from the newest file it is in (see the module docstring).
+
+    :param folders: list of str, partition folders
+    :param games: list of int, or None for all
+    :param teams: list of int, or None for all
+    :param columns: list of str, or None for all
+
+    :return: pyarrow table, sorted by game, or None if nothing is stored
+    """
+    loose = {}
+    compacted = []  # (filename, games in newer files of the same partition)
+    for folder in folders:
+        folderloose = _get_loose_files(folder)
+        loose.update(folderloose)
+        newer = set(folderloose)
+        for filename in _get_compacted_files(folder):
+            compacted.append((filename, set(newer)))
+            newer.update(_get_compacted_games(filename))
+    if games is not None:
+        games = {int(game) for game in games}
+        loose = {game: filename for game, filename in loose.items() if game in games}
+        compacted = [(filename, newer) for filename, newer in compacted
+                     if len(games.intersection(_get_compacted_games(filename)) - newer) > 0]
+    if len(loose) + len(compacted) == 0:
+        return None
+
+    # Files written at different times may have different columns (e.g. H6) or string types; line them up
+    schema = pa.unify_schemas([pq.read_schema(filename)
+                               for filename in list(loose.values()) + [filename for filename, _ in compacted]],
+                              promote_options='permissive').remove_metadata()
+    if columns is not None:
+        columns = list(dict.fromkeys(['Game'] + list(columns)))
+
+    condition = None
+    if games is not None:
+        condition = ds.field('Game').isin(sorted(games))
+    if teams is not None:
+        teams = sorted(int(team) for team in teams)
+        teamcondition = ds.field('Home').isin(teams) | ds.field('Road').isin(teams)
+        condition = teamcondition if condition is None else condition & teamcondition
+
+    tables = []
+    for filename, newer in compacted:
+        compactedcondition = condition
+        if len(newer) > 0:
+            notnewer = ~ds.field('Game').isin(sorted(newer))
+            compactedcondition = notnewer if condition is None else condition & notnewer
+        tables.append(ds.dataset([filename], schema=schema, format='parquet').to_table(
+            columns=columns, filter=compactedcondition))
+    if len(loose) > 0:
+        tables.append(ds.dataset(sorted(loose.values()), schema=schema, format='parquet').to_table(
+            columns=columns, filter=condition))
+    # Stable sort, so rows keep their order within each game
+    return pa.concat_tables(tables).sort_by('Game')
+
+
+def read_games(table, season, games=None, teams=None, columns=None):
+    """
+    Reads games from this table for this season.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+    :param games: list of int, or None for all
+    :param teams: list of int, or None for all. Games with any of these teams home or road are read.
+    :param columns: list of str, or None for all. Game is always included.
+
+    :return: dataframe with columns typed as in schemas, plus Game, Home and Road. Empty if nothing is stored.
+    """
+    result = _read_partitions(_get_partition_folders(table, season, games), games, teams, columns)
+    if result is None:
+        return pd.DataFrame({col: [] for col in (KEY_COLUMNS if columns is None else ['Game'] + list(columns))})
+    df = result.to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get)
+    return schemas.apply_schema(df, dict(TABLES[table], Game=np.int32, Home=np.int32, Road=np.int32))
+
+
+def read_game(table, season, game):
+    """
+    Reads one game from this table, from the cache if possible.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dataframe with columns typed as in schemas, without Game, Home and Road. A copy, so callers may change it.
+
+    :raises FileNotFoundError: if the game has not been written
+    """
+    key = (table, int(season), int(game))
+    mtimes = _get_game_mtimes(table, season, game)
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+        if entry is not None and entry[0] == mtimes:
+            _CACHE.move_to_end(key)
+            _CACHE_STATS['hits'] += 1
+            return entry[1].copy()
+        _CACHE_STATS['misses'] += 1
+
+    if not has_game(table, season, game):
+        raise FileNotFoundError('No {0:s} for {1:d} {2:d}'.format(table, season, game))
+    df = read_games(table, season, [game]).drop(KEY_COLUMNS, axis=1).reset_index(drop=True)
+    _add_to_cache(key, mtimes, df)
+    return df.copy()
+
+
+def _get_game_mtimes(table, season, game):
+    """
+    Returns modification times of the files this game could be read from, to tell whether a cached copy is current.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: tuple of (int, int) or None, for the game's own file, then (filename, (int, int)) for each compacted file
+    """
+    try:
+        mtimes = [_get_file_version(get_game_filename(table, season, game))]
+    except OSError:
+        mtimes = [None]
+    for filename in _get_compacted_files(get_partition_folder(table, season, get_game_type(game))):
+        try:
+            mtimes.append((filename, _get_file_version(filename)))
+        except OSError:
+            pass
+    return tuple(mtimes)
+
+
+def _add_to_cache(key, mtimes, df):
+    """
+    Caches a game read by read_game, evicting least recently used games to stay within budget. Games bigger than the
+    budget are not cached.
+
+    :param key: (table, season, game)
+    :param mtimes: tuple, as from _get_game_mtimes
+    :param df: dataframe
+
+    :return: nothing
+    """
+    nbytes = int(df.memory_usage(deep=True).sum())
+    with _CACHE_LOCK:
+        _CACHE.pop(key, None)
+        if nbytes > _CACHE_BUDGET:
+            return
+        _CACHE[key] = (mtimes, df, nbytes)
+        _evict_from_cache()
+
+
+def _evict_from_cache():
+    """
+    Evicts least recently used games until the cache is within budget. Call with _CACHE_LOCK held.
+
+    :return: nothing
+    """
+    total = sum(entry[2] for entry in _CACHE.values())
+    while total > _CACHE_BUDGET:
+        _, (_, _, nbytes) = _CACHE.popitem(last=False)
+        total -= nbytes
+        _CACHE_STATS['evictions'] += 1
+
+
+def set_cache_budget(nbytes):
+    """
+    Sets how many bytes of games read_game may keep in memory, evicting games if over. 0 turns the cache off.
+
+    :param nbytes: int
+
+    :return: nothing
+    """
+    global _CACHE_BUDGET
+    with _CACHE_LOCK:
+        _CACHE_BUDGET = int(nbytes)
+        _evict_from_cache()
+
+
+def clear_cache():
+    """
+    Empties the cache kept by read_game. Counters are left alone (see reset_cache_stats).
+
+    :return: nothing
+    """
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+def reset_cache_stats():
+    """
+    Resets the cache counters (hits, misses, evictions) to zero.
+
+    :return: nothing
+    """
+    with _CACHE_LOCK:
+        _CACHE_STATS.clear()
+        _CACHE_STATS.update({'hits': 0, 'misses': 0, 'evictions': 0})
+
+
+def get_cache_stats():
+    """
+    Returns the cache counters since the last reset_cache_stats(), and the cache's current size.
+
+    :return: dict of str to int: hits, misses, evictions, games (number cached), bytes (taken by them) and budget
+    """
+    with _CACHE_LOCK:
+        return dict(_CACHE_STATS, games=len(_CACHE), bytes=sum(entry[2] for entry in _CACHE.values()),
+                    budget=_CACHE_BUDGET)
+
+
+def _write_compacted(filename, data):
+    """
+    Writes these rows, sorted by game, to this file with one row group per game. Replaces the file in one step.
+
+    :param filename: str
+    :param data: pyarrow table
+
+    :return: nothing
+    """
+    games = data.column('Game').to_numpy()
+    starts = np.flatnonzero(np.r_[True, games[1:] != games[:-1]])
+    ends = np.r_[starts[1:], len(games)]
+
+    with pq.ParquetWriter(filename + '.tmp', data.schema, compression=_COMPRESSION) as writer:
+        for start, end in zip(starts, ends):
+            writer.write_table(data.slice(start, end - start))
+    os.replace(filename + '.tmp', filename)
+
+
+def compact_season(table, season):
+    """
+    Folds games written since the last compaction into each partition's compacted files, one row group per game.
+
+    Only the loose files are read and written, to a new batch file. Once a partition has MERGE_AFTER_BATCHES batches,
+    everything in it is merged into games.parquet instead. Files are removed oldest first, so that a crash partway
+    through leaves every game readable. Don't run this while games from this season are being written.
+
+    :param table: str, pbp, shifts or toi
+    :param season: int, the season
+
+    :return: nothing
+    """
+    for folder in _get_partition_folders(table, season):
+        loose = _get_loose_files(folder)
+        if len(loose) == 0:
+            continue
+
+        compacted = _get_compacted_files(folder)
+        batches = [filename for filename in compacted if os.path.basename(filename) != _COMPACTED]
+        if len(compacted) == 0 or len(batches) >= MERGE_AFTER_BATCHES:
+            _write_compacted(os.path.join(folder, _COMPACTED), _read_partitions([folder]))
+            stale = list(reversed(batches))
+        else:
+            number = max([int(_BATCH.match(os.path.basename(filename)).group(1)) for filename in batches] + [0]) + 1
+            _write_compacted(os.path.join(folder, 'games-{0:d}.parquet'.format(number)),
+                             _read_partitions([folder], games=loose.keys()))
+            stale = []
+        for filename in stale + list(loose.values()):
+            os.remove(filename)
+
+
+reset_cache_stats()
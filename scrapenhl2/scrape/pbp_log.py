@@ -0,0 +1,146 @@
+"""
+This module contains a streaming parser for the NHL's html play by play reports (PL0xxxxx.HTM). It reads events straight
+into columns as it goes through the page, without building a tree or tables first.
+
+Each event is a row (class evenColor or oddColor) with eight cells: event number, period, strength, time (elapsed, then
+remaining), event type (e.g. FAC), description, and then the road and home players on ice. Each player on ice is a
+number in a font tag titled with his position and name, e.g. Center - NICKLAS BACKSTROM. The column headings name the
+teams as they appear in descriptions, e.g. WSH On Ice (road first, then home).
+"""
+
+from html.parser import HTMLParser
+
+# Cells in an event row before the players on ice, and where the road and home players are
+_EVENT_CELLS = 6
+_ONICE_CELLS = {6: 0, 7: 1}
+_ROW_CLASSES = ('evenColor', 'oddColor')
+_ONICE_HEADING = 'On Ice'
+
+
+class PbpLogParser(HTMLParser):
+    """
+    Reads events from an html play by play into columns. Use read_pbp_log unless feeding a page in pieces.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.teams = []
+        self.eventnums = []
+        self.periods = []
+        self.strengths = []
+        self.times = []
+        self.events = []
+        self.descriptions = []
+        self.roadonice = []
+        self.homeonice = []
+
+        self._tables = 0
+        self._text = None  # Text of a heading cell, outside event rows
+
+        # The event row being read: its table depth, and its cells as lists of lines (split at <br>)
+        self._rowdepth = None
+        self._cells = None
+        self._onice = None
+        self._font = None  # (title, number text) of a player on ice being read
+
+    def get_columns(self):
+        """
+        Returns events read so far.
+
+        :return: dict of column: list. EventNum is int; Period, Strength, MinSec (m:ss elapsed), Event (e.g. FAC) and
+            Description are str; RoadOnIce and HomeOnIce are lists of (number, position, name) tuples, e.g.
+            ('19', 'Center', 'NICKLAS BACKSTROM').
+        """
+        return {'EventNum': self.eventnums, 'Period': self.periods, 'Strength': self.strengths,
+                'MinSec': self.times, 'Event': self.events, 'Description': self.descriptions,
+                'RoadOnIce': self.roadonice, 'HomeOnIce': self.homeonice}
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._tables += 1
+        elif tag == 'tr':
+            if self._rowdepth == self._tables:
+                self._close_row()  # Previous row was not closed
+            if self._rowdepth is None:
+                rowclass = dict(attrs).get('class') or ''
+                if any(x in rowclass for x in _ROW_CLASSES):
+                    self._rowdepth = self._tables
+                    self._cells = []
+                    self._onice = ([], [])
+        elif tag == 'td' or tag == 'th':
+            if self._rowdepth is None:
+                self._text = []
+            elif self._rowdepth == self._tables:
+                self._cells.append([[]])
+        elif tag == 'br':
+            if self._rowdepth is not None and len(self._cells) > 0:
+                self._cells[-1].append([])
+        elif tag == 'font':
+            title = dict(attrs).get('title')
+            if title is not None and self._rowdepth is not None and len(self._cells) - 1 in _ONICE_CELLS:
+                self._font = (title, [])
+
+    def handle_endtag(self, tag):
+        if tag == 'table':
+            if self._rowdepth is not None and self._rowdepth >= self._tables:
+                self._close_row()
+            self._tables = max(self._tables - 1, 0)
+        elif tag == 'tr':
+            if self._rowdepth == self._tables:
+                self._close_row()
+        elif tag == 'td' or tag == 'th':
+            if self._text is not None:
+                heading = ''.join(self._text).strip()
+                if heading.endswith(_ONICE_HEADING) and len(self.teams) < 2:
+                    self.teams.append(heading[:-len(_ONICE_HEADING)].strip())
+                self._text = None
+        elif tag == 'font':
+            if self._font is not None:
+                title, number = self._font
+                position, _, name = title.partition(' - ')
+                self._onice[_ONICE_CELLS[len(self._cells) - 1]].append((''.join(number).strip(), position.strip(),
+                                                                       name.strip()))
+                self._font = None
+
+    def handle_data(self, data):
+        if self._rowdepth is None:
+            if self._text is not None:
+                self._text.append(data)
+        elif len(self._cells) > 0:
+            self._cells[-1][-1].append(data)
+            if self._font is not None:
+                self._font[1].append(data)
+
+    def _close_row(self):
+        cells = [[''.join(line).strip() for line in cell] for cell in self._cells]
+        roadonice, homeonice = self._onice
+        self._rowdepth = None
+        self._cells = None
+        self._onice = None
+        self._font = None
+
+        if len(cells) < _EVENT_CELLS or not cells[0][0].isdigit():
+            return
+        self.eventnums.append(int(cells[0][0]))
+        self.periods.append(cells[1][0])
+        self.strengths.append(cells[2][0])
+        self.times.append(cells[3][0])
+        self.events.append(cells[4][0])
+        self.descriptions.append(' '.join(line for line in cells[5] if line))
+        self.roadonice.append(roadonice)
+        self.homeonice.append(homeonice)
+
+
+def read_pbp_log(page):
+    """
+    Reads events from an html play by play.
+
+    :param page: str, the PL report
+
+    :return: (list of str, dict of column: list). The first is the road and home team as named in the report (e.g.
+        ['WSH', 'OTT']); the second is the events (see PbpLogParser.get_columns).
+    """
+    parser = PbpLogParser()
+    parser.feed(page)
+    parser.close()
+    return parser.teams, parser.get_columns()
@@ -152,7 +152,7 @@ def get_player_url(playerid):
 
     :return: str, https://statsapi.web.nhl.com/api/v1/people/[playerid]
     """
-    return 'https://statsapi.web.nhl.com/api/v1/people/{0:s}'.format(str(playerid))
+    return helpers.get_base_url('statsapi') + '/api/v1/people/{0:s}'.format(str(playerid))
 
 
 def update_player_ids_file(playerids, force_overwrite=False):
@@ -241,6 +241,17 @@ def update_player_log_file(playerids, seasons, games, teams, statuses):
                        'Status': statuses,  # P for played, S for scratch.
                        'Season': seasons,  # Season
                        'Game': games})  # Game
+    add_to_player_log_file(df)
+
+
+def add_to_player_log_file(df):
+    """
+    Adds these rows to the player log file, in one write.
+
+    :param df: dataframe with columns ID, Team, Status, Season, Game (see update_player_log_file)
+
+    :return: nothing
+    """
     if len(get_player_log_file()) == 1:
         # In this case, the only entry is our original entry for Ovi, that sets the datatypes properly
         write_player_log_file(df)
@@ -503,9 +514,19 @@ def update_player_ids_from_page(pbp):
 
     :return: nothing
     """
+    update_player_ids_file(get_player_ids_from_page(pbp))
+
+
+def get_player_ids_from_page(pbp):
+    """
+    Returns players listed in the game file.
+
+    :param pbp: json, the raw pbp
+
+    :return: list of str, player IDs
+    """
     playerdict = pbp['gameData']['players']  # yields the subdictionary with players
-    ids = [key[2:] for key in playerdict]  # keys are format "ID[PlayerID]"; pull that PlayerID part
-    update_player_ids_file(ids)
+    return [key[2:] for key in playerdict]  # keys are format "ID[PlayerID]"; pull that PlayerID part
 
 
 def update_player_logs_from_page(pbp, season, game):
@@ -519,6 +540,19 @@ def update_player_logs_from_page(pbp, season, game):
 
     :return: nothing
     """
+    add_to_player_log_file(get_player_log_from_page(pbp, season, game))
+
+
+def get_player_log_from_page(pbp, season, game):
+    """
+    Returns player log rows for this game (see update_player_logs_from_page), without writing them.
+
+    :param pbp: json, the pbp of the game
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dataframe with columns ID, Team, Status, Season, Game
+    """
 
     # Get players who played, and scratches, from boxscore
     home_played = helpers.try_to_access_dict(pbp, 'liveData', 'boxscore', 'teams', 'home', 'players')
@@ -536,13 +570,18 @@ def update_player_logs_from_page(pbp, season, game):
 
     # Get home and road names
     gameinfo = schedules.get_game_data_from_schedule(season, game)
-
-    # Update player logs
-    update_player_log_file(home_played, season, game, gameinfo['Home'], 'P')
-    update_player_log_file(home_scratches, season, game, gameinfo['Home'], 'S')
-    update_player_log_file(road_played, season, game, gameinfo['Road'], 'P')
-    update_player_log_file(road_scratches, season, game, gameinfo['Road'], 'S')
+    hometeam = team_info.team_as_id(gameinfo['Home'])
+    roadteam = team_info.team_as_id(gameinfo['Road'])
 
     # TODO: One issue is we do not see goalies (and maybe skaters) who dressed but did not play. How can this be fixed?
+    ids = home_played + home_scratches + road_played + road_scratches
+    return pd.DataFrame({'ID': ids,
+                         'Team': [hometeam] * (len(home_played) + len(home_scratches)) +
+                                 [roadteam] * (len(road_played) + len(road_scratches)),
+                         'Status': ['P'] * len(home_played) + ['S'] * len(home_scratches) +
+                                   ['P'] * len(road_played) + ['S'] * len(road_scratches),
+                         'Season': season,
+                         'Game': game})
+
 
 player_setup()
@@ -0,0 +1,241 @@
+"""
+This module contains methods for packing a season's raw files (one per game, or two for html toi) into a single
+archive per folder, e.g. /scrape/data/raw/pbp/[season]/archive.pack. This is optional: files that are not packed are
+read as before, and packed files are read transparently by scrape_pbp.get_raw_pbp, scrape_toi.get_raw_toi, etc.
+
+The archive is just the files' bytes (as they were on disk, so still compressed) one after another. An index next
+to it, archive.idx.json, maps each filename to its offset and length, so any one file is a single seek and read.
+New files are appended to the end. If a file is packed again, the index points to the newer copy.
+"""
+
+import io
+import os
+import os.path
+import threading
+
+import scrapenhl2.scrape.general_helpers as helpers
+import scrapenhl2.scrape.organization as organization
+import scrapenhl2.scrape.raw_codecs as raw_codecs
+
+_ARCHIVE_LOCK = threading.Lock()
+_INDEX_CACHE = {}  # index filename: ((mtime in ns, size), index)
+
+
+def get_archive_filename(folder):
+    """
+    Returns the filename of the archive for this folder
+
+    :param folder: str, e.g. organization.get_season_raw_pbp_folder(2017)
+
+    :return: str, [folder]/archive.pack
+    """
+    return os.path.join(folder, 'archive.pack')
+
+
+def get_archive_index_filename(folder):
+    """
+    Returns the filename of the archive index for this folder
+
+    :param folder: str, e.g. organization.get_season_raw_pbp_folder(2017)
+
+    :return: str, [folder]/archive.idx.json
+    """
+    return os.path.join(folder, 'archive.idx.json')
+
+
+def get_archive_index(folder):
+    """
+    Returns the archive index for this folder. Cached, and re-read only if the index file has changed.
+
+    :param folder: str
+
+    :return: dict, {filename: [offset, length]}, with filenames relative to folder. Empty if there is no archive.
+    """
+    indexfile = get_archive_index_filename(folder)
+    try:
+        version = _get_file_version(indexfile)
+    except OSError:
+        return {}
+    cached = _INDEX_CACHE.get(indexfile)
+    if cached is None or cached[0] != version:
+        cached = (version, helpers.read_json_file(indexfile, default={}))
+        _INDEX_CACHE[indexfile] = cached
+    return cached[1]
+
+
+def _get_file_version(filename):
+    """
+    Returns what the index cache uses to tell whether a file has changed. Modification times alone can miss a rewrite
+    within the same tick on filesystems with coarse timestamps, so the size is checked too.
+
+    :param filename: str
+
+    :return: (int, int), modification time in ns and size
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def add_to_archive(folder, files):
+    """
+    Appends these files to the folder's archive, creating it if need be.
+
+    :param folder: str
+    :param files: dict, {filename relative to folder: bytes}
+
+    :return: nothing
+    """
+    if len(files) == 0:
+        return
+    with _ARCHIVE_LOCK:
+        index = dict(get_archive_index(folder))
+        with open(get_archive_filename(folder), 'ab') as writer:
+            offset = writer.seek(0, os.SEEK_END)
+            for name, data in files.items():
+                writer.write(data)
+                index[name] = [offset, len(data)]
+                offset += len(data)
+            writer.flush()
+            os.fsync(writer.fileno())
+        # Index goes last: if we die before this, the appended bytes are just unreferenced
+        indexfile = get_archive_index_filename(folder)
+        helpers.write_json_file(index, indexfile)
+        _INDEX_CACHE[indexfile] = (_get_file_version(indexfile), index)
+
+
+def read_from_archive(filename):
+    """
+    Reads this file's bytes from the archive in its folder.
+
+    :param filename: str, the full path the file would have if it were not packed
+
+    :return: bytes, or None if it is not in the archive
+    """
+    folder, name = os.path.split(filename)
+    entry = get_archive_index(folder).get(name)
+    if entry is None:
+        return None
+    offset, length = entry
+    with open(get_archive_filename(folder), 'rb') as reader:
+        reader.seek(offset)
+        return reader.read(length)
+
+
+def in_archive(filename):
+    """
+    Checks if this file is in the archive in its folder.
+
+    :param filename: str, the full path the file would have if it were not packed
+
+    :return: bool
+    """
+    folder, name = os.path.split(filename)
+    return name in get_archive_index(folder)
+
+
+def exists(filename):
+    """
+    Checks if this file is on disk, either as is or packed. For compressed raw files, any codec's extension counts.
+
+    :param filename: str
+
+    :return: bool
+    """
+    if raw_codecs.get_codec_from_filename(filename) is None:
+        return os.path.exists(filename) or in_archive(filename)
+    return raw_codecs.find_raw_file(filename) is not None or \
+        any(in_archive(name) for name in _get_raw_filenames(filename))
+
+
+def _get_raw_filenames(filename):
+    """
+    Returns this compressed raw file's name under each codec's extension
+
+    :param filename: str, the filename with any (or no) codec extension
+
+    :return: list of str
+    """
+    base = os.path.splitext(filename)[0] if raw_codecs.get_codec_from_filename(filename) is not None else filename
+    return [base + raw_codecs.get_extension(codec) for codec in raw_codecs.get_codecs()]
+
+
+def read_raw_page(filename):
+    """
+    Reads a compressed raw json page (see raw_codecs), from disk if it is there, or else from the archive.
+
+    :param filename: str, the filename with any (or no) codec extension
+
+    :return: str
+    """
+    if raw_codecs.find_raw_file(filename) is not None:
+        return raw_codecs.read_raw_file(filename)
+
+    for name in _get_raw_filenames(filename):
+        data = read_from_archive(name)
+        if data is not None:
+            return raw_codecs.decompress(data, raw_codecs.get_codec_from_filename(name)).decode('latin-1')
+    raise FileNotFoundError('No raw file for {0:s}'.format(filename))
+
+
+def read_text_file(filename):
+    """
+    Reads a text (html) file, from disk if it is there, or else from the archive.
+
+    :param filename: str
+
+    :return: str
+    """
+    if os.path.exists(filename):
+        with open(filename, 'r') as reader:
+            return reader.read()
+
+    data = read_from_archive(filename)
+    if data is None:
+        raise FileNotFoundError('No file {0:s}'.format(filename))
+    # Same decoding as open(filename, 'r') above
+    return io.TextIOWrapper(io.BytesIO(data)).read()
+
+
+def pack_folder(folder, remove_files=False):
+    """
+    Appends loose raw files in this folder (compressed json and html) to its archive. Files already in the archive with
+    the same bytes are skipped, so this can be run again as more games are scraped.
+
+    :param folder: str
+    :param remove_files: bool. If True, deletes the loose files once they are in the archive.
+
+    :return: int, the number of files packed
+    """
+    if not os.path.exists(folder):
+        return 0
+    names = sorted(name for name in os.listdir(folder)
+                   if raw_codecs.get_codec_from_filename(name) is not None or name.endswith('.html'))
+    index = get_archive_index(folder)
+    files = {}
+    for name in names:
+        with open(os.path.join(folder, name), 'rb') as reader:
+            data = reader.read()
+        # Compare lengths first, so unchanged files are mostly skipped without reading the archive
+        if name in index and index[name][1] == len(data) and read_from_archive(os.path.join(folder, name)) == data:
+            continue
+        files[name] = data
+    add_to_archive(folder, files)
+
+    if remove_files:
+        for name in names:
+            os.remove(os.path.join(folder, name))
+    return len(files)
+
+
+def pack_season(season, remove_files=False):
+    """
+    Packs this season's raw pbp and toi folders. See pack_folder.
+
+    :param season: int, the season
+    :param remove_files: bool. If True, deletes the loose files once they are in the archive.
+
+    :return: nothing
+    """
+    for folder in (organization.get_season_raw_pbp_folder(season), organization.get_season_raw_toi_folder(season)):
+        numfiles = pack_folder(folder, remove_files)
+        helpers.print_and_log('Packed {0:d} files into {1:s}'.format(numfiles, get_archive_filename(folder)))
@@ -0,0 +1,184 @@
+"""
+This module contains methods for compressing raw (json) pages on disk. The codec is chosen by file extension, so
+files written with any codec can be read back regardless of which codec is currently selected for writing.
+"""
+
+import lzma
+import os
+import os.path
+import zlib
+
+# Codec name: file extension. zstd and lz4 come from pyarrow, which we already need for feather.
+_EXTENSIONS = {'zlib': '.zlib',
+               'lzma': '.xz',
+               'zstd': '.zst',
+               'lz4': '.lz4'}
+
+# zlib at level 9 is what raw files have always been written with
+DEFAULT_CODEC = 'zlib'
+DEFAULT_LEVEL = 9
+_RAW_CODEC = {'codec': DEFAULT_CODEC, 'level': DEFAULT_LEVEL}
+
+
+def get_codecs():
+    """
+    Returns codecs available in this environment (zstd and lz4 need pyarrow built with them).
+
+    :return: list of str
+    """
+    codecs = ['zlib', 'lzma']
+    try:
+        import pyarrow as pa
+        codecs += [codec for codec in ('zstd', 'lz4') if pa.Codec.is_available(codec)]
+    except ImportError:
+        pass
+    return codecs
+
+
+def set_raw_codec(codec=DEFAULT_CODEC, level=None):
+    """
+    Sets the codec (and level) used when saving raw pages from now on. Does not touch existing files.
+
+    :param codec: str, one of get_codecs()
+    :param level: int or None for the codec's own default. zlib 1-9, lzma 0-9, zstd 1-22, lz4 1-12.
+
+    :return: nothing
+    """
+    if codec not in _EXTENSIONS:
+        raise ValueError('Unknown raw codec {0:s}; use one of {1:s}'.format(str(codec), ', '.join(_EXTENSIONS)))
+    _RAW_CODEC['codec'] = codec
+    _RAW_CODEC['level'] = level
+
+
+def get_raw_codec():
+    """
+    Returns the codec and level used when saving raw pages.
+
+    :return: (str, int or None)
+    """
+    return _RAW_CODEC['codec'], _RAW_CODEC['level']
+
+
+def get_extension(codec=None):
+    """
+    Returns the file extension for this codec.
+
+    :param codec: str, or None for the current codec
+
+    :return: str, e.g. '.zlib'
+    """
+    if codec is None:
+        codec = _RAW_CODEC['codec']
+    return _EXTENSIONS[codec]
+
+
+def get_codec_from_filename(filename):
+    """
+    Infers the codec from the file extension.
+
+    :param filename: str
+
+    :return: str, the codec, or None if the extension is not recognized
+    """
+    ext = os.path.splitext(filename)[1]
+    for codec, codec_ext in _EXTENSIONS.items():
+        if ext == codec_ext:
+            return codec
+    return None
+
+
+def compress(data, codec=None, level=None):
+    """
+    Compresses bytes.
+
+    :param data: bytes
+    :param codec: str, or None for the current codec (in which case level is also the current level)
+    :param level: int or None for the codec's own default
+
+    :return: bytes
+    """
+    if codec is None:
+        codec, level = get_raw_codec()
+
+    if codec == 'zlib':
+        return zlib.compress(data) if level is None else zlib.compress(data, level)
+    if codec == 'lzma':
+        return lzma.compress(data) if level is None else lzma.compress(data, preset=level)
+    if codec in {'zstd', 'lz4'}:
+        import pyarrow as pa
+        # Single-shot output is a regular zstd / lz4 frame, so it can also be read with command-line tools
+        return pa.Codec(codec, compression_level=level).compress(data, asbytes=True)
+    raise ValueError('Unknown raw codec {0:s}'.format(str(codec)))
+
+
+def decompress(data, codec):
+    """
+    Decompresses bytes.
+
+    :param data: bytes
+    :param codec: str
+
+    :return: bytes
+    """
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'lzma':
+        return lzma.decompress(data)
+    if codec in {'zstd', 'lz4'}:
+        import pyarrow as pa
+        # pyarrow's Codec.decompress needs the decompressed size up front; the stream reader does not
+        return pa.CompressedInputStream(pa.BufferReader(data), codec).read()
+    raise ValueError('Unknown raw codec {0:s}'.format(str(codec)))
+
+
+def find_raw_file(filename):
+    """
+    Looks for this raw file under any codec's extension.
+
+    :param filename: str, the filename with any (or no) extension
+
+    :return: str, the filename that exists (preferring the current codec), or None if there is none
+    """
+    base = os.path.splitext(filename)[0] if get_codec_from_filename(filename) is not None else filename
+    codec = _RAW_CODEC['codec']
+    for ext in [_EXTENSIONS[codec]] + [e for c, e in _EXTENSIONS.items() if c != codec]:
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+
+def write_raw_file(page, filename):
+    """
+    Compresses page with the current codec and saves it. Copies of the same file under other codecs' extensions are
+    removed, so there is only ever one version on disk.
+
+    :param page: str
+    :param filename: str, the filename with any (or no) extension; the current codec's extension is used
+
+    :return: str, the filename written
+    """
+    base = os.path.splitext(filename)[0] if get_codec_from_filename(filename) is not None else filename
+    newfilename = base + get_extension()
+    with open(newfilename, 'wb') as writer:
+        writer.write(compress(page.encode('latin-1')))
+
+    for ext in _EXTENSIONS.values():
+        if base + ext != newfilename and os.path.exists(base + ext):
+            os.remove(base + ext)
+    return newfilename
+
+
+def read_raw_file(filename):
+    """
+    Reads and decompresses a raw file written with any codec.
+
+    :param filename: str, the filename with any (or no) extension
+
+    :return: str
+    """
+    existing = find_raw_file(filename)
+    if existing is None:
+        raise FileNotFoundError('No raw file for {0:s}'.format(filename))
+    with open(existing, 'rb') as reader:
+        data = reader.read()
+    return decompress(data, get_codec_from_filename(existing)).decode('latin-1')
@@ -0,0 +1,363 @@
+"""
+This module contains a local stand-in for the NHL API and html reports, so the scrapers can be benchmarked and tested
+offline and repeatably. It serves:
+
+- Game pbp json, shift json, and html pbp and shift logs from the raw data folders (packed or not)
+- Season schedules, built from the schedule files
+- Anything else (e.g. player pages) from pages recorded earlier. If given an upstream, missing pages are fetched from
+  the real site and recorded.
+
+It can also inject latency, errors, and rate limiting (429s), and answers conditional requests (ETag) like the real
+sites. Use like::
+
+    from scrapenhl2.scrape import replay_server
+    with replay_server.ReplayServer(latency=0.2, error_rate=0.05).use_for_scraping():
+        autoupdate.read_final_games(games, 2017)
+
+or run scripts/replay_server.py and set SCRAPENHL2_STATSAPI_URL and SCRAPENHL2_NHL_URL to its url.
+"""
+
+import collections
+import contextlib
+import hashlib
+import json
+import os.path
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+
+import scrapenhl2.scrape.general_helpers as helpers
+import scrapenhl2.scrape.organization as organization
+import scrapenhl2.scrape.raw_archive as raw_archive
+import scrapenhl2.scrape.schedules as schedules
+import scrapenhl2.scrape.scrape_pbp as scrape_pbp
+import scrapenhl2.scrape.scrape_toi as scrape_toi
+
+_GAME_URL = re.compile(r'^/api/v1/game/(\d{4})0(\d{5})/feed/live$')
+_SHIFT_URL = re.compile(r'^/stats/rest/shiftcharts$')
+_SHIFT_GAME = re.compile(r'gameId=(\d{4})0(\d{5})')
+_HTML_URL = re.compile(r'^/scores/htmlreports/(\d{4})\d{4}/(PL|TH|TV)0(\d{5})\.HTM$')
+_SCHEDULE_URL = re.compile(r'^/api/v1/schedule$')
+
+# Raw json is saved as latin-1 (see raw_codecs); html logs and recorded pages are saved as text
+_RAW_JSON = 'application/json; charset=ISO-8859-1'
+_JSON = 'application/json; charset=utf-8'
+_HTML = 'text/html; charset=utf-8'
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ReplayServer(object):
+    """
+    A local HTTP server replaying NHL pages. See the module docstring.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, latency_jitter=0, error_rate=0, error_status=503,
+                 rate_limit=None, upstream=False, record_folder=None, seed=None):
+        """
+        :param host: str, the interface to listen on
+        :param port: int, the port, or 0 for any free port
+        :param latency: float, seconds to wait before answering each request
+        :param latency_jitter: float, up to this many seconds are added to latency at random
+        :param error_rate: float, the fraction of requests answered with error_status instead of the page
+        :param error_status: int, the status code for injected errors
+        :param rate_limit: float, requests per second allowed before answering 429, or None for no limit
+        :param upstream: bool. If True, pages that are not on disk are fetched from the real sites and recorded.
+        :param record_folder: str, where other pages are recorded, or None for organization.get_replay_folder()
+        :param seed: int, seed for injected latency and errors, for repeatable runs. Each request draws from its own
+            generator, seeded from this, the path, and how many times the path was requested before, so runs repeat
+            however requests are interleaved across threads.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.upstream = upstream
+        self.record_folder = organization.get_replay_folder() if record_folder is None else record_folder
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._path_counts = collections.Counter()
+        self._recent = collections.deque()
+        self._stats = collections.Counter()
+        self._server = _ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        :return: str, e.g. http://127.0.0.1:8000
+        """
+        host, port = self._server.server_address[:2]
+        return 'http://{0:s}:{1:d}'.format(host, port)
+
+    def start(self):
+        """
+        Starts serving on a background thread.
+
+        :return: self
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='scrapenhl2-replay', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving.
+
+        :return: nothing
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def serve_forever(self):
+        """
+        Serves on this thread until interrupted.
+
+        :return: nothing
+        """
+        self._server.serve_forever()
+
+    @contextlib.contextmanager
+    def use_for_scraping(self):
+        """
+        Starts the server and points the scrapers at it (see general_helpers.set_base_url). On exit, restores the
+        previous urls and stops the server.
+
+        :return: context manager yielding this server
+        """
+        old = {site: helpers.get_base_url(site) for site in helpers.DEFAULT_BASE_URLS}
+        self.start()
+        try:
+            for site in old:
+                helpers.set_base_url(site, self.url)
+            yield self
+        finally:
+            for site, url in old.items():
+                helpers.set_base_url(site, url)
+            self.stop()
+
+    def get_stats(self):
+        """
+        Returns counts of responses by status code, and of injected errors ('injected') and rate limits ('limited').
+
+        :return: dict
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    def _is_rate_limited(self):
+        """
+        Checks if the last second has seen rate_limit requests already; if not, counts this one.
+
+        :return: bool
+        """
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while len(self._recent) > 0 and now - self._recent[0] >= 1:
+                self._recent.popleft()
+            if len(self._recent) >= self.rate_limit:
+                return True
+            self._recent.append(now)
+            return False
+
+    def _get_random(self, path):
+        """
+        Returns the random number generator for this request (see seed in __init__).
+
+        :param path: str, the request path with query string
+
+        :return: random.Random
+        """
+        with self._lock:
+            count = self._path_counts[path]
+            self._path_counts[path] += 1
+        if self.seed is None:
+            return random.Random()
+        return random.Random('{0:d} {1:d} {2:s}'.format(self.seed, count, path))
+
+    def _get_record_filename(self, path):
+        """
+        :param path: str, the request path with query string
+
+        :return: str, where the page for this path is recorded. Its content type is recorded alongside, in the same
+            filename with .json instead of .page.
+        """
+        return os.path.join(self.record_folder, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.page')
+
+    def _read_recorded_page(self, path):
+        """
+        Reads the page recorded for this request path.
+
+        :param path: str, the request path with query string
+
+        :return: (bytes, str), the page as it was received and its content type, or (None, None) if not recorded.
+            Pages recorded without a content type are taken to be json.
+        """
+        filename = self._get_record_filename(path)
+        if not os.path.exists(filename):
+            return None, None
+        with open(filename, 'rb') as reader:
+            page = reader.read()
+        headers = helpers.read_json_file(os.path.splitext(filename)[0] + '.json', {})
+        return page, headers.get('Content-Type', _JSON)
+
+    def _record_page(self, path, response):
+        """
+        Records this upstream response's body and content type for this request path.
+
+        :param path: str, the request path with query string
+        :param response: requests.Response
+
+        :return: (bytes, str), the page and its content type
+        """
+        filename = self._get_record_filename(path)
+        content_type = response.headers.get('Content-Type', _JSON)
+        helpers.write_json_file({'Content-Type': content_type}, os.path.splitext(filename)[0] + '.json')
+        with open(filename, 'wb') as writer:
+            writer.write(response.content)
+        return response.content, content_type
+
+    def get_page(self, path):
+        """
+        Finds the page for this request path.
+
+        :param path: str, the request path with query string, e.g. /api/v1/game/2017020001/feed/live
+
+        :return: (str or bytes, str), the page and its content type, or (None, None) if there is no such page. Pages
+            read from the raw data folders are str, with a charset in the content type; recorded pages are bytes, as
+            they were received.
+        """
+        parsed = urllib.parse.urlparse(path)
+        query = urllib.parse.parse_qs(parsed.query)
+        try:
+            match = _GAME_URL.match(parsed.path)
+            if match:
+                season, game = int(match.group(1)), int(match.group(2))
+                return raw_archive.read_raw_page(scrape_pbp.get_game_raw_pbp_filename(season, game)), _RAW_JSON
+
+            match = _SHIFT_GAME.search(query.get('cayenneExp', [''])[0])
+            if _SHIFT_URL.match(parsed.path) and match:
+                season, game = int(match.group(1)), int(match.group(2))
+                return raw_archive.read_raw_page(scrape_toi.get_game_raw_toi_filename(season, game)), _RAW_JSON
+
+            match = _HTML_URL.match(parsed.path)
+            if match:
+                season, report, game = int(match.group(1)), match.group(2), int(match.group(3))
+                filename = {'PL': scrape_pbp.get_game_pbplog_filename,
+                            'TH': scrape_toi.get_home_shiftlog_filename,
+                            'TV': scrape_toi.get_road_shiftlog_filename}[report](season, game)
+                return raw_archive.read_text_file(filename), _HTML
+
+            if _SCHEDULE_URL.match(parsed.path) and 'startDate' in query and 'endDate' in query:
+                return json.dumps(get_schedule_json(query['startDate'][0], query['endDate'][0])), _JSON
+        except (FileNotFoundError, KeyError):
+            pass
+
+        page, content_type = self._read_recorded_page(path)
+        if page is None and self.upstream:
+            site = 'statsapi' if parsed.path.startswith('/api/') else 'nhl'
+            response = requests.get(helpers.DEFAULT_BASE_URLS[site] + path, timeout=10)
+            if response.status_code == 200:
+                return self._record_page(path, response)
+        return page, content_type
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                rng = server._get_random(self.path)
+                delay = server.latency + rng.uniform(0, server.latency_jitter)
+                if delay > 0:
+                    time.sleep(delay)
+
+                if server._is_rate_limited():
+                    server._count(429, 'limited')
+                    self.send_response(429)
+                    self.send_header('Retry-After', '1')
+                    self.end_headers()
+                    return
+                if server.error_rate > 0 and rng.random() < server.error_rate:
+                    server._count(server.error_status, 'injected')
+                    self.send_error(server.error_status)
+                    return
+
+                page, content_type = server.get_page(self.path)
+                if page is None:
+                    server._count(404)
+                    self.send_error(404)
+                    return
+
+                if isinstance(page, bytes):
+                    body = page
+                else:
+                    body = page.encode(content_type.split('charset=')[1], errors='replace')
+                etag = '"{0:s}"'.format(hashlib.sha1(body).hexdigest())
+                if self.headers.get('If-None-Match') == etag:
+                    server._count(304)
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                server._count(200)
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Quiet by default; benchmarks make thousands of requests
+                pass
+
+        return Handler
+
+
+def get_schedule_json(startdate, enddate):
+    """
+    Builds a schedule page like the NHL API's from the season schedule files.
+
+    :param startdate: str, YYYY-MM-DD
+    :param enddate: str, YYYY-MM-DD
+
+    :return: dict
+    """
+    dates = []
+    for season in range(helpers.infer_season_from_date(startdate), helpers.infer_season_from_date(enddate) + 1):
+        try:
+            sch = schedules.get_season_schedule(season)
+        except KeyError:
+            continue
+        sch = sch[(sch.Date >= startdate) & (sch.Date <= enddate)]
+        for date, games in sch.groupby('Date'):
+            dates.append({'date': date, 'games': [
+                {'gamePk': int('{0:d}0{1:d}'.format(season, int(row.Game))),
+                 'gameType': row.Type,
+                 'status': {'detailedState': row.Status},
+                 'teams': {'away': {'team': {'id': int(row.Road)}, 'score': int(row.RoadScore)},
+                           'home': {'team': {'id': int(row.Home)}, 'score': int(row.HomeScore)}},
+                 'venue': {'name': row.Venue}}
+                for row in games.itertuples()]})
+    return {'dates': sorted(dates, key=lambda x: x['date'])}
@@ -272,16 +272,22 @@ def get_game_result(season, game):
     return get_game_data_from_schedule(season, game)['Result']
 
 
-def get_season_schedule_url(season):
+def get_season_schedule_url(season, startdate=None, enddate=None):
     """
     Gets the url for a page containing all of this season's games (Sep 1 to Jun 26) from NHL API.
 
     :param season: int, the season
+    :param startdate: str, YYYY-MM-DD, or None for Sep 1. Use with enddate to get only part of the season.
+    :param enddate: str, YYYY-MM-DD, or None for Jun 25
 
     :return: str, https://statsapi.web.nhl.com/api/v1/schedule?startDate=[season]-09-01&endDate=[season+1]-06-25
     """
-    return 'https://statsapi.web.nhl.com/api/v1/schedule?startDate=' \
-           '{0:d}-09-01&endDate={1:d}-06-25'.format(season, season + 1)
+    if startdate is None:
+        startdate = '{0:d}-09-01'.format(season)
+    if enddate is None:
+        enddate = '{0:d}-06-25'.format(season + 1)
+    return helpers.get_base_url('statsapi') + \
+        '/api/v1/schedule?startDate={0:s}&endDate={1:s}'.format(startdate, enddate)
 
 
 def get_teams_in_season(season):
@@ -374,6 +380,60 @@ def generate_season_schedule_file(season, force_overwrite=True):
     clear_caches()
 
 
+def refresh_season_schedule(season, startdate=None, enddate=None):
+    """
+    Reads only games between startdate and enddate from NHL API and merges them into the season schedule by game id.
+    Games outside the window are left alone, and the file is rewritten only if something changed. Falls back to
+    generate_season_schedule_file if there is no schedule file yet.
+
+    Coaches, result, and pbp/toi status are kept for games that were already final, and reset for the rest, as in
+    generate_season_schedule_file.
+
+    :param season: int, the season
+    :param startdate: str, YYYY-MM-DD. If None, yesterday, or the date of the earliest game before today not yet
+        final (nor postponed) in the current schedule, whichever is earlier.
+    :param enddate: str, YYYY-MM-DD. If None, tomorrow.
+
+    :return: set of int, games that were added or changed
+    """
+    if not os.path.exists(get_season_schedule_filename(season)):
+        generate_season_schedule_file(season)
+        return set(get_season_schedule(season).Game)
+
+    olddf = get_season_schedule(season)
+    if startdate is None:
+        startdate = arrow.now().shift(days=-1).format('YYYY-MM-DD')
+        # E.g. if this has not run for a few days, earlier games may still be stored as scheduled or in progress
+        unfinished = olddf[(olddf.Date < arrow.now().format('YYYY-MM-DD')) &
+                           ~olddf.Status.isin(['Final', 'Postponed'])]
+        if len(unfinished) > 0:
+            startdate = min(startdate, unfinished.Date.min())
+    if enddate is None:
+        enddate = arrow.now().shift(days=1).format('YYYY-MM-DD')
+
+    page = helpers.try_url_n_times(get_season_schedule_url(season, startdate, enddate))
+    df = _create_schedule_dataframe_from_json(json.loads(page))
+    if len(df) == 0:
+        return set()
+    df.loc[:, 'Season'] = season
+    df = _fill_in_schedule_from_pbp(df, season)[olddf.columns]
+
+    # Compare as strings to sidestep int/float differences in otherwise identical rows
+    oldrows = olddf[olddf.Game.isin(df.Game)].set_index('Game').astype(str)
+    newrows = df.set_index('Game').astype(str)
+    changed = {game for game in newrows.index
+               if game not in oldrows.index or not oldrows.loc[game].equals(newrows.loc[game])}
+    if len(changed) == 0:
+        return changed
+
+    newdf = pd.concat([olddf[~olddf.Game.isin(changed)], df[df.Game.isin(changed)]], ignore_index=True) \
+        .sort_values('Game') \
+        .reset_index(drop=True)
+    write_season_schedule(newdf, season, True)
+    clear_caches()
+    return changed
+
+
 def _create_schedule_dataframe_from_json(jsondict):
     """
     Reads game, game type, status, visitor ID, home ID, visitor score, and home score for each game in this dict
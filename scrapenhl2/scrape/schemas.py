@@ -0,0 +1,122 @@
+"""
+This module contains the column types of parsed pbp, shifts and toi and of team logs, and methods to apply them.
+
+In memory, events, roles, periods and strength labels are categorical; player IDs are nullable int32 (an int32 array
+plus a mask for missing values); times are int16; and scores and strength codes are int8.
+
+Parsed games are Parquet files (see parsed_store), which hold nullable ints as they are. Categories would have to
+match from one file to the next, so categorical columns are stored as their values. Team logs are feather files, which
+hold the in-memory types as they are. Parsed games used to be HDF5 tables, which cannot hold nullable ints either; in
+those, player IDs are int32 with MISSING_ID where there is no player (see to_hdf_storage).
+
+Columns not in a schema are left alone, so these can be applied to frames with extra or missing columns, and to files
+written before the schemas were added.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Stands in for a missing player ID in HDF5 files (and in parse_pbp while parsing)
+MISSING_ID = np.iinfo(np.int32).min
+
+PLAYER_ID = pd.Int32Dtype()
+
+PBP_SCHEMA = {'Index': np.int16, 'Period': 'category', 'Event': 'category', 'Team': np.int32,
+              'Actor': PLAYER_ID, 'ActorRole': 'category', 'Recipient': PLAYER_ID, 'RecipientRole': 'category',
+              'X': np.float32, 'Y': np.float32, 'HomeScore': np.int8, 'RoadScore': np.int8, 'Time': np.int16}
+
+TOI_SCHEMA = {'Time': np.int16, 'HomeStrength': 'category', 'RoadStrength': 'category',
+              'HomeStrengthCode': np.int8, 'RoadStrengthCode': np.int8}
+
+# Parsed TOI is saved as shifts, and made into TOI_SCHEMA frames when read. Team IDs can be missing in the json.
+SHIFT_SCHEMA = {'PlayerID': PLAYER_ID, 'Start': np.int16, 'End': np.int16, 'Team': pd.Int32Dtype(),
+                'Duration': np.int16, 'Pos': 'category'}
+
+# Team logs are from the focus team's perspective. Scores in the toi log are missing before the first event.
+_TEAM_LOG_SCHEMA = {'TeamScore': np.int8, 'OppScore': np.int8, 'TeamStrength': 'category', 'OppStrength': 'category',
+                    'TeamStrengthCode': np.int8, 'OppStrengthCode': np.int8,
+                    'Game': np.int32, 'Home': np.int32, 'Road': np.int32, 'FocusTeam': np.int32}
+TEAM_PBP_SCHEMA = dict(PBP_SCHEMA, **_TEAM_LOG_SCHEMA)
+TEAM_TOI_SCHEMA = dict(TOI_SCHEMA, **dict(_TEAM_LOG_SCHEMA, TeamScore=pd.Int8Dtype(), OppScore=pd.Int8Dtype()))
+
+# Players on ice: H1, H2, ..., HG and R1, ..., RG in parsed games; Team1, ..., TeamG and Opp1, ..., OppG in team logs
+_PLAYER_COLUMN = re.compile(r'^(H|R|Team|Opp)(\d+|G)$')
+
+
+def get_dtype(col, schema):
+    """
+    Returns the type of this column under this schema.
+
+    :param col: str, the column
+    :param schema: dict, e.g. PBP_SCHEMA
+
+    :return: a dtype, or None if the schema does not cover this column
+    """
+    if col in schema:
+        return schema[col]
+    if _PLAYER_COLUMN.match(col):
+        return PLAYER_ID
+    return None
+
+
+def as_player_ids(values):
+    """
+    Converts player IDs to nullable int32. NaN, None and MISSING_ID are missing.
+
+    :param values: array or series of numbers
+
+    :return: array of nullable int32
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'fiu':
+        values = values.astype(float)
+    else:
+        values = pd.to_numeric(pd.Series(values), errors='coerce').values.astype(float)
+    missing = np.isnan(values) | (values == MISSING_ID)
+    return pd.arrays.IntegerArray(np.where(missing, 0, values).astype(np.int32), missing)
+
+
+def apply_schema(df, schema):
+    """
+    Casts columns in df to their types under this schema.
+
+    :param df: dataframe
+    :param schema: dict, e.g. PBP_SCHEMA
+
+    :return: dataframe
+    """
+    casts = {}
+    for col in df.columns:
+        dtype = get_dtype(col, schema)
+        if dtype is None or df[col].dtype == dtype:
+            continue
+        if dtype == PLAYER_ID:
+            casts[col] = as_player_ids(df[col].values)
+        else:
+            casts[col] = df[col].astype(dtype).values
+    if len(casts) == 0:
+        return df
+    return df.assign(**casts)
+
+
+def to_hdf_storage(df, schema):
+    """
+    Applies this schema, then converts columns HDF5 tables cannot hold: player IDs become int32 with MISSING_ID for
+    missing, and categorical columns become their values.
+
+    :param df: dataframe
+    :param schema: dict, e.g. PBP_SCHEMA
+
+    :return: dataframe
+    """
+    df = apply_schema(df, schema)
+    casts = {}
+    for col in df.columns:
+        if df[col].dtype == PLAYER_ID:
+            casts[col] = df[col].fillna(MISSING_ID).values.astype(np.int32)
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            casts[col] = np.asarray(df[col].values)
+    if len(casts) == 0:
+        return df
+    return df.assign(**casts)
@@ -5,10 +5,9 @@ This module contains methods for scraping pbp.
 import json
 import os.path
 import urllib.request
-import zlib
-from time import sleep
 
-from scrapenhl2.scrape import organization, schedules, general_helpers as helpers, manipulate_schedules, parse_pbp
+from scrapenhl2.scrape import organization, schedules, general_helpers as helpers, manipulate_schedules, parse_pbp, \
+    http_cache, raw_archive, raw_codecs
 
 
 def scrape_game_pbp_from_html(season, game, force_overwrite=True):
@@ -28,7 +27,6 @@ def scrape_game_pbp_from_html(season, game, force_overwrite=True):
     page = get_game_from_url(season, game)
     save_raw_html_pbp(page, season, game)
     # ed.print_and_log('Scraped html pbp for {0:d} {1:d}'.format(season, game))
-    sleep(1)  # Don't want to overload NHL servers
 
     # It's most efficient to parse with page in memory, but for sake of simplicity will do it later
     # pbp = read_pbp_events_from_page(page)
@@ -36,20 +34,29 @@ def scrape_game_pbp_from_html(season, game, force_overwrite=True):
     return True
 
 
-def scrape_game_pbp(season, game, force_overwrite=False):
+def scrape_game_pbp(season, game, force_overwrite=False, conditional=False):
     """
     This method scrapes the pbp for the given game.
 
     :param season: int, the season
     :param game: int, the game
     :param force_overwrite: bool. If file exists already, won't scrape again
+    :param conditional: bool. If True, sends a conditional request (when file exists already) and does not rewrite
+        the file if the page has not changed since the last scrape. Use when polling in-progress games.
 
-    :return: bool, False if not scraped, else True
+    :return: bool, False if not scraped (or not modified), else True
     """
     filename = get_game_raw_pbp_filename(season, game)
-    if not force_overwrite and os.path.exists(filename):
+    if not force_overwrite and raw_archive.exists(filename):
         return False
 
+    if conditional:
+        page, modified = http_cache.get_url_if_modified(get_game_url(season, game), os.path.exists(filename))
+        if not modified:
+            return False
+        save_raw_pbp(page, season, game)
+        return True
+
     # Use the season schedule file to get the home and road team names
     # schedule_item = get_files.get_season_schedule(season) \
     #    .query('Game == {0:d}'.format(game)) \
@@ -60,7 +67,6 @@ def scrape_game_pbp(season, game, force_overwrite=False):
     page = get_game_from_url(season, game)
     save_raw_pbp(page, season, game)
     # ed.print_and_log('Scraped pbp for {0:d} {1:d}'.format(season, game))
-    sleep(1)  # Don't want to overload NHL servers
 
     # It's most efficient to parse with page in memory, but for sake of simplicity will do it later
     # pbp = read_pbp_events_from_page(page)
@@ -68,6 +74,23 @@ def scrape_game_pbp(season, game, force_overwrite=False):
     return True
 
 
+def scrape_game_pbp_to_memory(season, game):
+    """
+    Scrapes the pbp for the given game and returns it decoded, so it can be parsed straight from memory (see
+    parse_pbp.parse_game_pbp_from_page). The raw file is saved on the background writer; call
+    general_helpers.flush_background_writes() before reading it back from disk.
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: json, the json pbp
+    """
+    page = get_game_from_url(season, game)
+    rawpbp = json.loads(page)
+    helpers.write_in_background(save_raw_pbp, page, season, game)
+    return rawpbp
+
+
 def save_raw_html_pbp(page, season, game):
     """
     Takes the bytes page containing html pbp information and saves as such
@@ -86,7 +109,8 @@ def save_raw_html_pbp(page, season, game):
 
 def save_raw_pbp(page, season, game):
     """
-    Takes the bytes page containing pbp information and saves to disk as a compressed zlib.
+    Takes the bytes page containing pbp information and saves to disk, compressed with the codec set in
+    raw_codecs (zlib by default).
 
     :param page: bytes. str(page) would yield a string version of the json pbp
     :param season: int, the season
@@ -94,43 +118,33 @@ def save_raw_pbp(page, season, game):
 
     :return: nothing
     """
-    try:
-        page2 = zlib.compress(page.encode('latin-1'), level=9)
-    except TypeError:
-        # No level kwarg before Python 3.6
-        page2 = zlib.compress(page.encode('latin-1'))
-    filename = get_game_raw_pbp_filename(season, game)
-    w = open(filename, 'wb')
-    w.write(page2)
-    w.close()
+    raw_codecs.write_raw_file(page, get_game_raw_pbp_filename(season, game))
 
 
 def get_raw_pbp(season, game):
     """
-    Loads the compressed json file containing this game's play by play from disk.
+    Loads the compressed json file containing this game's play by play from disk (or from the season archive, if it
+    has been packed; see raw_archive).
 
     :param season: int, the season
     :param game: int, the game
 
     :return: json, the json pbp
     """
-    with open(get_game_raw_pbp_filename(season, game), 'rb') as reader:
-        page = reader.read()
-    return json.loads(str(zlib.decompress(page).decode('latin-1')))
+    return json.loads(raw_archive.read_raw_page(get_game_raw_pbp_filename(season, game)))
 
 
 def get_raw_html_pbp(season, game):
     """
-    Loads the html file containing this game's play by play from disk.
+    Loads the html file containing this game's play by play from disk (or from the season archive, if it has been
+    packed; see raw_archive).
 
     :param season: int, the season
     :param game: int, the game
 
     :return: str, the html pbp
     """
-    with open(get_game_pbplog_filename(season, game), 'r') as reader:
-        page = reader.read()
-    return page
+    return raw_archive.read_text_file(get_game_pbplog_filename(season, game))
 
 
 def get_game_from_url(season, game):
@@ -155,7 +169,8 @@ def get_game_pbplog_url(season, game):
 
     :return : str, e.g. http://www.nhl.com/scores/htmlreports/20072008/PL020001.HTM
     """
-    return 'http://www.nhl.com/scores/htmlreports/{0:d}{1:d}/PL0{2:d}.HTM'.format(season, season + 1, game)
+    return helpers.get_base_url('nhl') + \
+        '/scores/htmlreports/{0:d}{1:d}/PL0{2:d}.HTM'.format(season, season + 1, game)
 
 
 def get_game_url(season, game):
@@ -167,7 +182,7 @@ def get_game_url(season, game):
 
     :return: str, https://statsapi.web.nhl.com/api/v1/game/[season]0[game]/feed/live
     """
-    return 'https://statsapi.web.nhl.com/api/v1/game/{0:d}0{1:d}/feed/live'.format(season, game)
+    return helpers.get_base_url('statsapi') + '/api/v1/game/{0:d}0{1:d}/feed/live'.format(season, game)
 
 
 def get_game_raw_pbp_filename(season, game):
@@ -177,9 +192,11 @@ def get_game_raw_pbp_filename(season, game):
     :param season: int, current season
     :param game: int, game
 
-    :return: str, /scrape/data/raw/pbp/[season]/[game].zlib
+    :return: str, /scrape/data/raw/pbp/[season]/[game].zlib. If the file exists under another codec's extension (see
+        raw_codecs), returns that; if it does not exist, uses the extension of the current codec.
     """
-    return os.path.join(organization.get_season_raw_pbp_folder(season), str(game) + '.zlib')
+    filename = os.path.join(organization.get_season_raw_pbp_folder(season), str(game))
+    return raw_codecs.find_raw_file(filename) or filename + raw_codecs.get_extension()
 
 
 def get_game_pbplog_filename(season, game):
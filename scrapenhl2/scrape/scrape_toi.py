@@ -5,10 +5,9 @@ This module contains methods for scraping TOI.
 import json
 import os.path
 import urllib.request
-import zlib
-from time import sleep
 
-from scrapenhl2.scrape import organization, schedules, manipulate_schedules, general_helpers as helpers, parse_toi
+from scrapenhl2.scrape import organization, schedules, manipulate_schedules, general_helpers as helpers, parse_toi, \
+    http_cache, raw_archive, raw_codecs
 
 
 def scrape_game_toi(season, game, force_overwrite=False):
@@ -22,19 +21,35 @@ def scrape_game_toi(season, game, force_overwrite=False):
     :return: nothing
     """
     filename = get_game_raw_toi_filename(season, game)
-    if not force_overwrite and os.path.exists(filename):
+    if not force_overwrite and raw_archive.exists(filename):
         return False
 
     page = helpers.try_url_n_times(get_shift_url(season, game))
     save_raw_toi(page, season, game)
     # ed.print_and_log('Scraped toi for {0:d} {1:d}'.format(season, game))
-    sleep(1)  # Don't want to overload NHL servers
 
     # It's most efficient to parse with page in memory, but for sake of simplicity will do it later
     # toi = read_toi_from_page(page)
     return True
 
 
+def scrape_game_toi_to_memory(season, game):
+    """
+    Scrapes the toi for the given game and returns it decoded, so it can be parsed straight from memory (see
+    parse_toi.parse_game_toi_from_page). The raw file is saved on the background writer; call
+    general_helpers.flush_background_writes() before reading it back from disk.
+
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dict, the json shifts
+    """
+    page = helpers.try_url_n_times(get_shift_url(season, game))
+    rawtoi = json.loads(page)
+    helpers.write_in_background(save_raw_toi, page, season, game)
+    return rawtoi
+
+
 def get_home_shiftlog_filename(season, game):
     """
     Returns the filename of the parsed toi html home shifts
@@ -58,33 +73,43 @@ def get_road_shiftlog_filename(season, game):
     return os.path.join(organization.get_season_raw_toi_folder(season), str(game) + 'R.html')
 
 
-def scrape_game_toi_from_html(season, game, force_overwrite=True):
+def scrape_game_toi_from_html(season, game, force_overwrite=True, conditional=False):
     """
     This method scrapes the toi html logs for the given game.
 
     :param season: int, the season
     :param game: int, the game
     :param force_overwrite: bool. If file exists already, won't scrape again
+    :param conditional: bool. If True, sends conditional requests for logs already on disk and leaves them alone if
+        unchanged since the last scrape. Use when polling in-progress games.
 
-    :return: nothing
+    :return: bool, True if either log was (re)written, else False
     """
     filenames = (get_home_shiftlog_filename(season, game), get_road_shiftlog_filename(season, game))
     urls = (get_home_shiftlog_url(season, game), get_road_shiftlog_url(season, game))
     filetypes = ('H', 'R')
+    scraped = False
     for i in range(2):
         filename = filenames[i]
         if not force_overwrite and os.path.exists(filename):
             pass
 
-        page = helpers.try_url_n_times(urls[i])
+        if conditional:
+            page, modified = http_cache.get_url_if_modified(urls[i], os.path.exists(filename))
+            if not modified:
+                continue
+        else:
+            page = helpers.try_url_n_times(urls[i])
         save_raw_toi_from_html(page, season, game, filetypes[i])
-        sleep(1)  # Don't want to overload NHL servers
+        scraped = True
         print('Scraped html toi for {0:d} {1:d}'.format(season, game))
+    return scraped
 
 
 def save_raw_toi(page, season, game):
     """
-    Takes the bytes page containing shift information and saves to disk as a compressed zlib.
+    Takes the bytes page containing shift information and saves to disk, compressed with the codec set in
+    raw_codecs (zlib by default).
 
     :param page: bytes. str(page) would yield a string version of the json shifts
     :param season: int, the season
@@ -92,15 +117,7 @@ def save_raw_toi(page, season, game):
 
     :return: nothing
     """
-    try:
-        page2 = zlib.compress(page.encode('latin-1'), level=9)
-    except TypeError:
-        # No level kwarg before Python 3.6
-        page2 = zlib.compress(page.encode('latin-1'))
-    filename = get_game_raw_toi_filename(season, game)
-    w = open(filename, 'wb')
-    w.write(page2)
-    w.close()
+    raw_codecs.write_raw_file(page, get_game_raw_toi_filename(season, game))
 
 
 def save_raw_toi_from_html(page, season, game, homeroad):
@@ -127,7 +144,8 @@ def save_raw_toi_from_html(page, season, game, homeroad):
 
 def get_raw_html_toi(season, game, homeroad):
     """
-    Loads the html file containing this game's toi from disk.
+    Loads the html file containing this game's toi from disk (or from the season archive, if it has been packed; see
+    raw_archive).
 
     :param season: int, the season
     :param game: int, the game
@@ -139,23 +157,20 @@ def get_raw_html_toi(season, game, homeroad):
         filename = get_home_shiftlog_filename(season, game)
     elif homeroad == 'R':
         filename = get_road_shiftlog_filename(season, game)
-    with open(filename, 'r') as reader:
-        page = reader.read()
-    return page
+    return raw_archive.read_text_file(filename)
 
 
 def get_raw_toi(season, game):
     """
-    Loads the compressed json file containing this game's shifts from disk.
+    Loads the compressed json file containing this game's shifts from disk (or from the season archive, if it has
+    been packed; see raw_archive).
 
     :param season: int, the season
     :param game: int, the game
 
     :return: dict, the json shifts
     """
-    with open(get_game_raw_toi_filename(season, game), 'rb') as reader:
-        page = reader.read()
-    return json.loads(str(zlib.decompress(page).decode('latin-1')))
+    return json.loads(raw_archive.read_raw_page(get_game_raw_toi_filename(season, game)))
 
 
 def get_home_shiftlog_url(season, game):
@@ -167,7 +182,8 @@ def get_home_shiftlog_url(season, game):
 
     :return : str, e.g. http://www.nhl.com/scores/htmlreports/20072008/TH020001.HTM
     """
-    return 'http://www.nhl.com/scores/htmlreports/{0:d}{1:d}/TH0{2:d}.HTM'.format(season, season + 1, game)
+    return helpers.get_base_url('nhl') + \
+        '/scores/htmlreports/{0:d}{1:d}/TH0{2:d}.HTM'.format(season, season + 1, game)
 
 
 def get_road_shiftlog_url(season, game):
@@ -179,7 +195,8 @@ def get_road_shiftlog_url(season, game):
 
     :return : str, e.g. http://www.nhl.com/scores/htmlreports/20072008/TV020001.HTM
     """
-    return 'http://www.nhl.com/scores/htmlreports/{0:d}{1:d}/TV0{2:d}.HTM'.format(season, season + 1, game)
+    return helpers.get_base_url('nhl') + \
+        '/scores/htmlreports/{0:d}{1:d}/TV0{2:d}.HTM'.format(season, season + 1, game)
 
 
 def get_shift_url(season, game):
@@ -191,7 +208,7 @@ def get_shift_url(season, game):
 
     :return : str, http://www.nhl.com/stats/rest/shiftcharts?cayenneExp=gameId=[season]0[game]
     """
-    return 'http://www.nhl.com/stats/rest/shiftcharts?cayenneExp=gameId={0:d}0{1:d}'.format(season, game)
+    return helpers.get_base_url('nhl') + '/stats/rest/shiftcharts?cayenneExp=gameId={0:d}0{1:d}'.format(season, game)
 
 
 def get_game_raw_toi_filename(season, game):
@@ -201,9 +218,11 @@ def get_game_raw_toi_filename(season, game):
     :param season: int, current season
     :param game: int, game
 
-    :return: str, /scrape/data/raw/toi/[season]/[game].zlib
+    :return: str, /scrape/data/raw/toi/[season]/[game].zlib. If the file exists under another codec's extension (see
+        raw_codecs), returns that; if it does not exist, uses the extension of the current codec.
     """
-    return os.path.join(organization.get_season_raw_toi_folder(season), str(game) + '.zlib')
+    filename = os.path.join(organization.get_season_raw_toi_folder(season), str(game))
+    return raw_codecs.find_raw_file(filename) or filename + raw_codecs.get_extension()
 
 
 def scrape_season_toi(season, force_overwrite=False):
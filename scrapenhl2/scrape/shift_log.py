@@ -0,0 +1,140 @@
+"""
+This module contains a streaming parser for the NHL's html shift logs (the TH and TV time on ice reports). It reads
+shifts straight into columns as it goes through the page, without building a tree or tables first.
+
+The reports list each player under a heading like 8 OVECHKIN, ALEX spanning all 8 columns, then a header row, then one
+row per shift: shift number, period, start and end (each as elapsed / remaining), duration and events. The player's
+summary comes after, in a table nested in the next row, which ends his shifts.
+"""
+
+import re
+from html.parser import HTMLParser
+
+import scrapenhl2.scrape.general_helpers as helpers
+
+# Columns across a player heading, and cells in a shift row
+_HEADING_COLUMNS = 8
+_SHIFT_CELLS = 6
+_SHIFT_NUMBER = re.compile(r'\d{1,2}')
+
+# Where the parser is in a player's section
+_SEEKING, _HEADER, _SHIFTS = range(3)
+
+
+class ShiftLogParser(HTMLParser):
+    """
+    Reads shifts from an html shift log into columns. Use read_shift_log unless feeding a page in pieces.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.names = []
+        self.shiftnums = []
+        self.periods = []
+        self.starts = []
+        self.ends = []
+
+        self._state = _SEEKING
+        self._name = None
+        self._tables = 0
+        # Open rows, innermost last, as [table depth, cells, number of columns, whether it holds a table]
+        self._rows = []
+        self._text = None
+
+    def get_columns(self):
+        """
+        Returns shifts read so far.
+
+        :return: dict of column: list. Name is the player as in his heading (e.g. 8 OVECHKIN, ALEX); ShiftNum and
+            Period are int (OT is 4); Start and End are m:ss elapsed in period.
+        """
+        return {'Name': self.names, 'ShiftNum': self.shiftnums, 'Period': self.periods, 'Start': self.starts,
+                'End': self.ends}
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'td' or tag == 'th':
+            if len(self._rows) > 0 and self._rows[-1][0] == self._tables:
+                self._close_cell()
+                colspan = dict(attrs).get('colspan')
+                self._rows[-1][2] += int(colspan) if colspan else 1
+                self._text = []
+        elif tag == 'tr':
+            if len(self._rows) > 0 and self._rows[-1][0] == self._tables:
+                self._close_row()  # Previous row was not closed
+            self._rows.append([self._tables, [], 0, False])
+        elif tag == 'table':
+            # A row holding a table is neither a heading nor a shift, and comes before the rows in it
+            for row in self._rows:
+                if not row[3]:
+                    row[3] = True
+                    self._read_row(None, 0)
+            self._close_cell()
+            self._tables += 1
+
+    def handle_endtag(self, tag):
+        if tag == 'td' or tag == 'th':
+            self._close_cell()
+        elif tag == 'tr':
+            if len(self._rows) > 0 and self._rows[-1][0] == self._tables:
+                self._close_row()
+        elif tag == 'table':
+            while len(self._rows) > 0 and self._rows[-1][0] >= self._tables:
+                self._close_row()
+            self._tables = max(self._tables - 1, 0)
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def _close_cell(self):
+        if self._text is not None:
+            self._rows[-1][1].append(''.join(self._text))
+            self._text = None
+
+    def _close_row(self):
+        self._close_cell()
+        _, cells, numcols, hastable = self._rows.pop()
+        if not hastable:
+            self._read_row(cells, numcols)
+
+    def _read_row(self, cells, numcols):
+        """
+        Moves through a player's section: heading, header row, then shifts until a row that is not one.
+
+        :param cells: list of str, or None for a row holding a table
+        :param numcols: int, the number of columns the row spans
+
+        :return: nothing
+        """
+        first = cells[0] if cells else ''
+        if self._state == _SEEKING:
+            if numcols == _HEADING_COLUMNS and helpers.check_number_last_first_format(first):
+                self._name = first
+                self._state = _HEADER
+        elif self._state == _HEADER:
+            self._state = _SHIFTS
+        elif _SHIFT_NUMBER.match(first):
+            if len(cells) != _SHIFT_CELLS:
+                raise ValueError('Expected {0:d} cells in shift row, got {1:s}'.format(_SHIFT_CELLS, str(cells)))
+            shiftnum, per, start, end, _, _ = cells
+            self.names.append(self._name)
+            self.shiftnums.append(int(shiftnum))
+            self.periods.append(4 if per == 'OT' else int(per))
+            self.starts.append(start[:start.index('/')].strip())
+            self.ends.append(end[:end.index('/')].strip())
+        else:
+            self._state = _SEEKING
+
+
+def read_shift_log(page):
+    """
+    Reads shifts from an html shift log.
+
+    :param page: str, the TH or TV report
+
+    :return: dict of column: list; see ShiftLogParser.get_columns
+    """
+    parser = ShiftLogParser()
+    parser.feed(page)
+    parser.close()
+    return parser.get_columns()
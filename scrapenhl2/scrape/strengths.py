@@ -0,0 +1,129 @@
+"""
+This module contains methods for the compact strength encoding used in parsed TOI and team logs. All of them work on
+whole columns at once.
+
+Strengths are labeled per second as strings: "5" means five skaters plus a goalie, and when the goalie is pulled for
+an extra attacker, "4+1" means five skaters and no goalie. Alongside the labels, they are stored as int8 codes: the
+number of skaters, plus NO_GOALIE if there is no goalie. So "5" is 5 and "4+1" is NO_GOALIE + 5, and a 5v5 filter is
+just a comparison of two small ints.
+
+Files parsed before the codes were added have labels only; use get_strength_codes or add_strength_codes to read them.
+"""
+
+import numpy as np
+import pandas as pd
+
+NO_GOALIE = 64
+UNKNOWN = -1
+
+# Label columns and their code columns
+STRENGTH_COLUMNS = {'HomeStrength': 'HomeStrengthCode', 'RoadStrength': 'RoadStrengthCode',
+                    'TeamStrength': 'TeamStrengthCode', 'OppStrength': 'OppStrengthCode'}
+
+
+def counts_as_codes(counts):
+    """
+    Converts skater counts where a goalie counts as 100 (as toi_kernels.fill_seconds returns them) to codes.
+
+    :param counts: array of int
+
+    :return: array of int8
+    """
+    counts = np.asarray(counts)
+    return np.where(counts >= 100, counts - 100, counts + NO_GOALIE).astype(np.int8)
+
+
+def strength_as_code(strengths):
+    """
+    Converts strength labels to codes. Also takes labels read back as numbers (e.g. 5 or 5.0 for "5"). Anything else,
+    including missing values, is UNKNOWN.
+
+    :param strengths: list, array or series of str or numbers, e.g. ['5', '4', '4+1']
+
+    :return: array of int8
+    """
+    strengths = pd.Series(strengths, dtype=object)
+    if len(strengths) == 0:
+        return np.zeros(0, dtype=np.int8)
+    parts = strengths.astype(str).str.partition('+')
+    skaters = pd.to_numeric(parts[0], errors='coerce').values
+    extra = pd.to_numeric(parts[2].where(parts[1] == '+'), errors='coerce').values
+
+    pulled = ~np.isnan(extra)
+    codes = np.where(pulled, skaters + extra + NO_GOALIE, skaters)
+    codes[np.isnan(codes) | (codes != np.round(codes))] = UNKNOWN
+    return codes.astype(np.int8)
+
+
+def code_as_strength(codes):
+    """
+    Converts codes back to strength labels.
+
+    :param codes: list, array or series of int
+
+    :return: array of str
+    """
+    # There are only a handful of distinct codes, so label those and spread the labels out
+    codes, inverse = np.unique(np.asarray(codes, dtype=np.int64), return_inverse=True)
+    pulled = codes >= NO_GOALIE
+    labels = np.where(pulled, codes - NO_GOALIE - 1, codes).astype(str).astype(object)
+    labels = np.where(pulled, labels + '+1', labels)
+    labels[codes == UNKNOWN] = 'nan'
+    return labels[inverse.reshape(-1)]
+
+
+def get_strength_codes(df, col):
+    """
+    Returns codes for this strength column, using the stored codes if df has them, and converting the labels if not.
+
+    :param df: dataframe
+    :param col: str, e.g. HomeStrength
+
+    :return: array of int8
+    """
+    codecol = STRENGTH_COLUMNS[col]
+    if codecol in df.columns:
+        return df[codecol].fillna(UNKNOWN).values.astype(np.int8)
+    return strength_as_code(df[col].values)
+
+
+def add_strength_codes(df):
+    """
+    Adds code columns for any strength label columns in df that do not have them yet, e.g. for files saved before the
+    codes were added.
+
+    :param df: dataframe
+
+    :return: dataframe
+    """
+    missing = {codecol: strength_as_code(df[col].values) for col, codecol in STRENGTH_COLUMNS.items()
+               if col in df.columns and codecol not in df.columns}
+    if len(missing) == 0:
+        return df
+    return df.assign(**missing)
+
+
+def is_strength(df, col, strength):
+    """
+    Checks which rows have this strength.
+
+    :param df: dataframe
+    :param col: str, e.g. TeamStrength
+    :param strength: str or int, a label (e.g. "4+1") or a number of skaters with a goalie (e.g. 5)
+
+    :return: array of bool
+    """
+    return get_strength_codes(df, col) == strength_as_code([strength])[0]
+
+
+def is_five_on_five(df):
+    """
+    Checks which rows are 5v5, using HomeStrength and RoadStrength if present, and TeamStrength and OppStrength if not.
+
+    :param df: dataframe
+
+    :return: array of bool
+    """
+    if 'HomeStrength' in df.columns or 'HomeStrengthCode' in df.columns:
+        return is_strength(df, 'HomeStrength', 5) & is_strength(df, 'RoadStrength', 5)
+    return is_strength(df, 'TeamStrength', 5) & is_strength(df, 'OppStrength', 5)
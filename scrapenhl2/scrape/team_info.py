@@ -64,7 +64,7 @@ def get_team_info_url(teamid):
 
     :return: str, http://statsapi.web.nhl.com/api/v1/teams/[teamid]
     """
-    return 'http://statsapi.web.nhl.com/api/v1/teams/{0:d}'.format(teamid)
+    return helpers.get_base_url('statsapi') + '/api/v1/teams/{0:d}'.format(teamid)
 
 
 def get_team_info_from_url(teamid):
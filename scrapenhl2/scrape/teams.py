@@ -1,45 +1,191 @@
 """
 This module contains method related to team logs.
+
+Each team log (pbp or toi, per team and season) is a base file, [team].feather, plus segments appended since the base
+was last written: immutable feather files in [team]_segments/, listed in order in [team]_segments/manifest.json along
+with the games each covers. A game's rows come from the last segment covering it, or from the base if none does, so a
+game is redone by appending a segment. update_team_logs appends one segment per batch of new games, and compaction
+(see compact_team_log) folds segments back into the base off the hot path.
 """
 
+import os
 import os.path
+import threading
 
-import feather
+import numpy as np
 import pandas as pd
 import pyarrow
+import pyarrow.compute
+import pyarrow.feather
+import pyarrow.ipc
 from tqdm import tqdm
 
 from scrapenhl2.scrape import organization, parse_pbp, parse_toi, schedules, team_info, general_helpers as helpers, \
-    scrape_toi, manipulate_schedules
+    scrape_toi, manipulate_schedules, schemas, strengths
+
+
+# Row filters for 5v5 in team logs (see get_team_toi)
+FIVE_ON_FIVE = {'TeamStrengthCode': [5], 'OppStrengthCode': [5]}
+
+_TEAM_LOG_SCHEMAS = {'pbp': schemas.TEAM_PBP_SCHEMA, 'toi': schemas.TEAM_TOI_SCHEMA}
 
+# update_team_logs queues compaction for logs with at least this many segments
+COMPACT_AFTER_SEGMENTS = 10
 
-def get_team_pbp(season, team):
+# Held while reading or changing a log, so compaction on the background thread doesn't delete segments from under a
+# reader or drop a segment appended meanwhile
+_TEAM_LOG_LOCK = threading.RLock()
+
+
+def get_team_pbp(season, team, columns=None, filters=None):
     """
     Returns the pbp of given team in given season across all games.
 
     :param season: int, the season
     :param team: int or str, the team abbreviation.
+    :param columns: list of str, or None for all. Only these columns are read.
+    :param filters: dict of column: values, or None. Only rows with one of these values in each column are read.
 
     :return: df, the pbp of given team in given season
     """
-    return feather.read_dataframe(get_team_pbp_filename(season, team_info.team_as_str(team, True)))
+    return _read_team_log('pbp', season, team, columns, filters)
 
 
-def get_team_toi(season, team):
+def get_team_toi(season, team, columns=None, filters=None):
     """
     Returns the toi of given team in given season across all games.
 
     :param season: int, the season
     :param team: int or str, the team abbreviation.
+    :param columns: list of str, or None for all. Only these columns are read.
+    :param filters: dict of column: values, or None. Only rows with one of these values in each column are read, e.g.
+        {'Game': [20001, 20002]}, or FIVE_ON_FIVE.
 
     :return: df, the toi of given team in given season
     """
-    return feather.read_dataframe(get_team_toi_filename(season, team_info.team_as_str(team, True)))
+    return _read_team_log('toi', season, team, columns, filters)
+
+
+def _read_team_log(table, season, team, columns=None, filters=None):
+    """
+    Reads a team log from its base file and segments, each row from the last file covering its game.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+    :param columns: list of str, or None for all
+    :param filters: dict of column: values, or None
+
+    :return: dataframe
+
+    :raises FileNotFoundError: if there is no log
+    """
+    with _TEAM_LOG_LOCK:
+        files = _get_team_log_files(table, season, team, _read_team_log_manifest(table, season, team))
+        return _read_team_log_files(files, _TEAM_LOG_SCHEMAS[table], columns, filters)
+
+
+def _get_team_log_files(table, season, team, manifest):
+    """
+    Returns the files a team log is read from, in order, each with the games to skip in it.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+    :param manifest: dict, the log's manifest
+
+    :return: list of (str, set of int)
+    """
+    folder = get_team_log_segment_folder(table, season, team)
+    files = []
+    later = set()
+    for segment in reversed(manifest['Segments']):
+        if segment['File'] is not None:
+            files.append((os.path.join(folder, segment['File']), set(later)))
+        later.update(segment['Games'])
+    basefile = _get_team_log_filename(table, season, team)
+    if os.path.exists(basefile) or len(files) == 0:
+        files.append((basefile, later))
+    return list(reversed(files))
+
+
+def _read_team_log_files(files, schema, columns=None, filters=None):
+    """
+    Reads these files of a team log (see _get_team_log_files) into one dataframe.
+
+    :param files: list of (str, set of int)
+    :param schema: dict, e.g. schemas.TEAM_TOI_SCHEMA
+    :param columns: list of str, or None for all
+    :param filters: dict of column: values, or None
+
+    :return: dataframe
+    """
+    dfs = [_read_team_log_file(filename, schema, columns, filters, exclude) for filename, exclude in files]
+    if len(dfs) == 1:
+        return dfs[0]
+    # Categories differ from file to file, so reapply the schema
+    return schemas.apply_schema(pd.concat(dfs, ignore_index=True), schema)
+
+
+def _read_team_log_file(filename, schema, columns=None, filters=None, exclude=None):
+    """
+    Reads one file of a team log. The file is memory-mapped, so only the pages holding the columns asked for are read
+    from disk, and files written uncompressed (see _write_team_log) are not copied until converted to a dataframe.
+    Rows are filtered before that conversion.
+
+    Logs written before strength codes and schemas were added have labels only, and wider types. Codes asked for are
+    computed from the labels for those.
+
+    :param filename: str, a base file or segment
+    :param schema: dict, e.g. schemas.TEAM_TOI_SCHEMA
+    :param columns: list of str, or None for all
+    :param filters: dict of column: values, or None
+    :param exclude: set of int, or None. Rows from these games are skipped (they are in a later segment).
+
+    :return: dataframe
+    """
+    filters = {} if filters is None else filters
+    stored = set(pyarrow.ipc.open_file(pyarrow.memory_map(filename)).schema.names)
+    labels = {code: label for label, code in strengths.STRENGTH_COLUMNS.items()}
+
+    toread = None
+    if columns is not None:
+        toread = []
+        for col in list(columns) + list(filters) + (['Game'] if exclude else []):
+            if col not in stored and col in labels:
+                col = labels[col]
+            if col not in toread:
+                toread.append(col)
+    table = pyarrow.feather.read_table(filename, columns=toread, memory_map=True)
+
+    mask = None
+    for col, values in filters.items():
+        if col in stored:
+            coltype = table.schema.field(col).type
+            if pyarrow.types.is_dictionary(coltype):  # categoricals
+                coltype = coltype.value_type
+            colmask = pyarrow.compute.is_in(table[col], value_set=pyarrow.array(values).cast(coltype))
+            mask = colmask if mask is None else pyarrow.compute.and_(mask, colmask)
+    if exclude:
+        colmask = pyarrow.compute.invert(pyarrow.compute.is_in(
+            table['Game'], value_set=pyarrow.array(sorted(exclude)).cast(table.schema.field('Game').type)))
+        mask = colmask if mask is None else pyarrow.compute.and_(mask, colmask)
+    if mask is not None:
+        table = table.filter(mask)
+
+    df = schemas.apply_schema(strengths.add_strength_codes(table.to_pandas(split_blocks=True)), schema)
+    # Codes computed from labels can only be filtered on now
+    for col, values in filters.items():
+        if col not in stored:
+            df = df[df[col].isin(values)].reset_index(drop=True)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
 
 
 def write_team_pbp(pbp, season, team):
     """
-    Writes the given pbp dataframe to file.
+    Writes the given pbp dataframe to file, replacing the whole log.
 
     :param pbp: df, the pbp of given team in given season
     :param season: int, the season
@@ -50,12 +196,12 @@ def write_team_pbp(pbp, season, team):
     if pbp is None:
         print('PBP df is None, will not write team log')
         return
-    feather.write_dataframe(pbp, get_team_pbp_filename(season, team_info.team_as_str(team, True)))
+    _replace_team_log(pbp, 'pbp', season, team)
 
 
 def write_team_toi(toi, season, team):
     """
-    Writes team TOI log to file
+    Writes team TOI log to file, replacing the whole log.
 
     :param toi: df, team toi for this season
     :param season: int, the season
@@ -66,21 +212,180 @@ def write_team_toi(toi, season, team):
     if toi is None:
         print('TOI df is None, will not write team log')
         return
+    _replace_team_log(toi, 'toi', season, team)
+
+
+def append_team_log_segment(df, table, season, team, games):
+    """
+    Appends a segment to a team log. Rows for these games already in the log are superseded by the segment's, so only
+    the segment and the manifest are written. If there is no log yet, df becomes its base.
+
+    :param df: dataframe with rows for these games, or None if there are none (e.g. to drop games that could not be
+        redone)
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+    :param games: list of int, the games this segment covers
+
+    :return: nothing
+    """
+    with _TEAM_LOG_LOCK:
+        manifest = _read_team_log_manifest(table, season, team)
+        if len(manifest['Segments']) == 0 and not os.path.exists(_get_team_log_filename(table, season, team)):
+            if df is not None:
+                _replace_team_log(df, table, season, team)
+            return
+
+        folder = get_team_log_segment_folder(table, season, team)
+        organization.check_create_folder(folder)
+        segment = {'File': None, 'Games': sorted(int(game) for game in games)}
+        if df is not None and len(df) > 0:
+            segment['File'] = 'segment-{0:06d}.feather'.format(manifest['Next'])
+            manifest['Next'] += 1
+            _write_team_log(schemas.apply_schema(df, _TEAM_LOG_SCHEMAS[table]), os.path.join(folder, segment['File']))
+        manifest['Segments'].append(segment)
+        helpers.write_json_file(manifest, get_team_log_manifest_filename(table, season, team))
+
+
+def count_team_log_segments(table, season, team):
+    """
+    Returns the number of segments appended to this team log since it was last compacted.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+
+    :return: int
+    """
+    with _TEAM_LOG_LOCK:
+        return len(_read_team_log_manifest(table, season, team)['Segments'])
+
+
+def compact_team_log(table, season, team):
+    """
+    Folds a team log's segments into its base file, and deletes them.
+
+    The log is read without holding the lock, so readers and appends can go on meanwhile; the lock is held only to
+    swap in the new base. Segments appended in the meantime are kept. If the log was rewritten in the meantime, this
+    does nothing, and the log is compacted the next time it is due.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+
+    :return: nothing
+    """
+    basefile = _get_team_log_filename(table, season, team)
+    with _TEAM_LOG_LOCK:
+        manifest = _read_team_log_manifest(table, season, team)
+        if len(manifest['Segments']) == 0:
+            return
+        version = _get_team_log_version(basefile)
+        files = _get_team_log_files(table, season, team, manifest)
+
+    try:
+        df = _read_team_log_files(files, _TEAM_LOG_SCHEMAS[table])
+    except OSError:
+        return  # segments deleted by a rewrite
+
+    with _TEAM_LOG_LOCK:
+        segments = _read_team_log_manifest(table, season, team)['Segments']
+        if _get_team_log_version(basefile) != version or segments[:len(manifest['Segments'])] != manifest['Segments']:
+            return
+        _replace_team_log(df, table, season, team, compacted=len(manifest['Segments']))
+
+
+def _get_team_log_version(filename):
+    """
+    Returns what compaction uses to tell whether a base file was rewritten: modification time in ns and size.
+
+    :param filename: str
+
+    :return: (int, int), or None if there is no file
+    """
     try:
-        feather.write_dataframe(toi, get_team_toi_filename(season, team_info.team_as_str(team, True)))
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def compact_team_logs(season, min_segments=1):
+    """
+    Compacts this season's team logs that have at least this many segments.
+
+    :param season: int, the season
+    :param min_segments: int
+
+    :return: nothing
+    """
+    for team in schedules.get_teams_in_season(season):
+        for table in _TEAM_LOG_SCHEMAS:
+            if count_team_log_segments(table, season, team) >= min_segments:
+                compact_team_log(table, season, team)
+
+
+def _replace_team_log(df, table, season, team, compacted=None):
+    """
+    Writes df as the base file of this team log, and deletes the segments it includes.
+
+    :param df: dataframe, the whole log
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+    :param compacted: int, or None. The number of leading segments df includes; later ones are kept. None for all.
+
+    :return: nothing
+    """
+    with _TEAM_LOG_LOCK:
+        manifest = _read_team_log_manifest(table, season, team)
+        _write_team_log(schemas.apply_schema(df, _TEAM_LOG_SCHEMAS[table]), _get_team_log_filename(table, season, team))
+
+        # If interrupted here, segments still supersede the same rows in the new base, so reads are unchanged
+        if compacted is None:
+            compacted = len(manifest['Segments'])
+        removed = manifest['Segments'][:compacted]
+        manifestfile = get_team_log_manifest_filename(table, season, team)
+        if compacted < len(manifest['Segments']):
+            helpers.write_json_file(dict(manifest, Segments=manifest['Segments'][compacted:]), manifestfile)
+        elif os.path.exists(manifestfile):
+            os.remove(manifestfile)
+
+        # Segments no longer in the manifest are never read, so if interrupted here, they are just left over
+        folder = get_team_log_segment_folder(table, season, team)
+        for segment in removed:
+            if segment['File'] is not None and os.path.exists(os.path.join(folder, segment['File'])):
+                os.remove(os.path.join(folder, segment['File']))
+
+
+def _write_team_log(df, filename):
+    """
+    Writes a base file or segment of a team log as an uncompressed feather (Arrow IPC) file, so it can be memory-mapped
+    and read without copying (see _read_team_log_file). Compression would save disk space, but every read would
+    decompress the whole of each column read.
+
+    :param df: dataframe
+    :param filename: str
+
+    :return: nothing
+    """
+    try:
+        pyarrow.feather.write_feather(df, filename + '.tmp', compression='uncompressed')
     except ValueError:
         # Need dtypes to be numbers or strings. Sometimes get objs instead
-        for col in toi:
+        df = df.copy()
+        for col in df.select_dtypes(include='object'):
             try:
-                toi.loc[:, col] = pd.to_numeric(toi[col])
+                df.loc[:, col] = pd.to_numeric(df[col])
             except ValueError:
-                toi.loc[:, col] = toi[col].astype(str)
-        feather.write_dataframe(toi, get_team_toi_filename(season, team_info.team_as_str(team, True)))
+                df.loc[:, col] = df[col].astype(str)
+        pyarrow.feather.write_feather(df, filename + '.tmp', compression='uncompressed')
+    os.replace(filename + '.tmp', filename)
 
 
 def get_team_pbp_filename(season, team):
     """
-    Returns filename of the PBP log for this team and season
+    Returns filename of the PBP log for this team and season (its base file; see get_team_log_segment_folder)
 
     :param season: int, the season
     :param team: int or str, the team abbreviation.
@@ -93,7 +398,7 @@ def get_team_pbp_filename(season, team):
 
 def get_team_toi_filename(season, team):
     """
-    Returns filename of the TOI log for this team and season
+    Returns filename of the TOI log for this team and season (its base file; see get_team_log_segment_folder)
 
     :param season: int, the season
     :param team: int or str, the team abbreviation.
@@ -104,11 +409,71 @@ def get_team_toi_filename(season, team):
                         "{0:s}.feather".format(team_info.team_as_str(team, abbreviation=True)))
 
 
+def _get_team_log_filename(table, season, team):
+    """
+    Returns the base file of this team log.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+
+    :return: str
+    """
+    if table == 'pbp':
+        return get_team_pbp_filename(season, team)
+    return get_team_toi_filename(season, team)
+
+
+def get_team_log_segment_folder(table, season, team):
+    """
+    Returns the folder holding segments appended to this team log.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+
+    :return: str, e.g. /scrape/data/teams/toi/[season]/[team]_segments/
+    """
+    return os.path.splitext(_get_team_log_filename(table, season, team))[0] + '_segments'
+
+
+def get_team_log_manifest_filename(table, season, team):
+    """
+    Returns the file listing segments appended to this team log.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+
+    :return: str, e.g. /scrape/data/teams/toi/[season]/[team]_segments/manifest.json
+    """
+    return os.path.join(get_team_log_segment_folder(table, season, team), 'manifest.json')
+
+
+def _read_team_log_manifest(table, season, team):
+    """
+    Reads the list of segments appended to this team log.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param team: int or str, the team
+
+    :return: dict with Segments (list of dicts with File, str or None, and Games, list of int, in the order appended)
+        and Next (int, number for the next segment file)
+    """
+    return helpers.read_json_file(get_team_log_manifest_filename(table, season, team), {'Segments': [], 'Next': 0})
+
+
 def update_team_logs(season, force_overwrite=False, force_games=None):
     """
     This method looks at the schedule for the given season and writes pbp for scraped games to file.
     It also adds the strength at each pbp event to the log. It only includes games that have both PBP *and* TOI.
 
+    Games not yet in a team's logs are appended to them as one segment (see append_team_log_segment), so only those
+    games are read and written. Logs with COMPACT_AFTER_SEGMENTS segments or more are then compacted on the background
+    writer thread (see general_helpers.write_in_background) while later teams are updated, and this waits for that to
+    finish before returning.
+
     :param season: int, the season
     :param force_overwrite: bool, whether to generate from scratch
     :param force_games: None or iterable of games to force_overwrite specifically
@@ -120,131 +485,136 @@ def update_team_logs(season, force_overwrite=False, force_games=None):
 
     sch = schedules.get_season_schedule(season).query('Status == "Final"')
     new_games_to_do = sch[(sch.Game >= 20001) & (sch.Game <= 30417)]
+    forced = set()
 
     if force_games is not None:
-        new_games_to_do = pd.concat([new_games_to_do,
-                                     sch.merge(pd.DataFrame({'Game': list(force_games)}),
-                                               how='inner', on='Game')]) \
+        forced = {int(game) for game in force_games}
+        new_games_to_do = pd.concat([new_games_to_do, sch[sch.Game.isin(forced)]]) \
+            .drop_duplicates('Game') \
             .sort_values('Game')
 
-    allteams = sorted(list(new_games_to_do.Home.append(new_games_to_do.Road).unique()))
+    allteams = sorted(pd.concat([new_games_to_do.Home, new_games_to_do.Road]).unique())
+    compacting = False
 
     for team in tqdm(allteams, desc = 'Updating team logs'):
         #print('Updating team log for {0:d} {1:s}'.format(season, team_info.team_as_str(team)))
 
         # Compare existing log to schedule to find missing games
         newgames = new_games_to_do[(new_games_to_do.Home == team) | (new_games_to_do.Road == team)]
-        if force_overwrite:
-            pbpdf = None
-            toidf = None
-        else:
-            # Read currently existing ones for each team and anti join to schedule to find missing games
+        if not force_overwrite:
             try:
-                pbpdf = get_team_pbp(season, team)
-                if force_games is not None:
-                    pbpdf = helpers.anti_join(pbpdf, pd.DataFrame({'Game': list(force_games)}), on='Game')
-                newgames = newgames.merge(pbpdf[['Game']].drop_duplicates(), how='outer', on='Game', indicator=True)
-                newgames = newgames[newgames._merge == "left_only"].drop('_merge', axis=1)
-            except OSError:
-                pbpdf = None
+                logged = set(get_team_pbp(season, team, columns=['Game']).Game.unique()) - forced
             except OSError:  # pyarrow (feather) FileNotFoundError equivalent
-                pbpdf = None
+                logged = set()
+            newgames = newgames[~newgames.Game.isin(logged)]
 
-            try:
-                toidf = get_team_toi(season, team)
-                if force_games is not None:
-                    toidf = helpers.anti_join(toidf, pd.DataFrame({'Game': list(force_games)}), on='Game')
-            except OSError:
-                toidf = None
-            except OSError:  # pyarrow (feather) FileNotFoundError equivalent
-                toidf = None
+        pbps = []
+        tois = []
+        for gamerow in newgames.itertuples():
+            gamepbp, gametoi = _get_team_game_logs(season, gamerow.Game, team, gamerow.Home, gamerow.Road)
+            if gamepbp is not None:
+                pbps.append(gamepbp.assign(FocusTeam=team))
+                tois.append(gametoi.assign(FocusTeam=team))
 
-        for i, gamerow in newgames.iterrows():
-            game = gamerow[1]
-            home = gamerow[2]
-            road = gamerow[4]
+        if force_overwrite:
+            write_team_pbp(pd.concat(pbps, ignore_index=True) if len(pbps) > 0 else None, season, team)
+            write_team_toi(pd.concat(tois, ignore_index=True) if len(tois) > 0 else None, season, team)
+            continue
+
+        # Forced games are covered even without new rows, so their old rows are dropped, as a full rewrite would
+        covered = {int(df.Game.iloc[0]) for df in pbps} | (forced & set(newgames.Game))
+        if len(covered) == 0:
+            continue
+        append_team_log_segment(pd.concat(pbps, ignore_index=True) if len(pbps) > 0 else None,
+                                'pbp', season, team, covered)
+        append_team_log_segment(pd.concat(tois, ignore_index=True) if len(tois) > 0 else None,
+                                'toi', season, team, covered)
+        for table in _TEAM_LOG_SCHEMAS:
+            if count_team_log_segments(table, season, team) >= COMPACT_AFTER_SEGMENTS:
+                helpers.write_in_background(compact_team_log, table, season, team)
+                compacting = True
+
+    if compacting:
+        helpers.flush_background_writes()
+
+
+def _get_team_game_logs(season, game, team, home, road):
+    """
+    Reads parsed pbp and toi for this game and puts them from this team's perspective, for update_team_logs.
+
+    :param season: int, the season
+    :param game: int, the game
+    :param team: int, the team
+    :param home: int, the home team
+    :param road: int, the road team
 
-            # load parsed pbp and toi
+    :return: (pbp, toi), or (None, None) if either is missing or empty
+    """
+    # load parsed pbp and toi
+    try:
+        try:
+            gamepbp = None
+            gamepbp = parse_pbp.get_parsed_pbp(season, game)
+        except OSError:
+            print("Check PBP for", season, game)
+        try:
+            gametoi = None
+            gametoi = parse_toi.get_parsed_toi(season, game)
+        except OSError:
+            # try html
+            scrape_toi.scrape_game_toi_from_html(season, game)
+            parse_toi.parse_game_toi_from_html(season, game)
+            manipulate_schedules.update_schedule_with_toi_scrape(season, game)
             try:
-                try:
-                    gamepbp = None
-                    gamepbp = parse_pbp.get_parsed_pbp(season, game)
-                except OSError:
-                    print("Check PBP for", season, game)
-                try:
-                    gametoi = None
-                    gametoi = parse_toi.get_parsed_toi(season, game)
-                except OSError:
-                    # try html
-                    scrape_toi.scrape_game_toi_from_html(season, game)
-                    parse_toi.parse_game_toi_from_html(season, game)
-                    manipulate_schedules.update_schedule_with_toi_scrape(season, game)
-                    try:
-                        gametoi = parse_toi.get_parsed_toi(season, game)
-                    except OSError:
-                        print('Check TOI for', season, game)
-
-                if gamepbp is not None and gametoi is not None and len(gamepbp) > 0 and len(gametoi) > 0:
-                    # Rename score and strength columns from home/road to team/opp
-                    if team == home:
-                        gametoi = gametoi.assign(TeamStrength=gametoi.HomeStrength, OppStrength=gametoi.RoadStrength) \
-                            .drop({'HomeStrength', 'RoadStrength'}, axis=1)
-                        gamepbp = gamepbp.assign(TeamScore=gamepbp.HomeScore, OppScore=gamepbp.RoadScore) \
-                            .drop({'HomeScore', 'RoadScore'}, axis=1)
-                    else:
-                        gametoi = gametoi.assign(TeamStrength=gametoi.RoadStrength, OppStrength=gametoi.HomeStrength) \
-                            .drop({'HomeStrength', 'RoadStrength'}, axis=1)
-                        gamepbp = gamepbp.assign(TeamScore=gamepbp.RoadScore, OppScore=gamepbp.HomeScore) \
-                            .drop({'HomeScore', 'RoadScore'}, axis=1)
-
-                    # add scores to toi and strengths to pbp
-                    gamepbp = gamepbp.merge(gametoi[['Time', 'TeamStrength', 'OppStrength']], how='left', on='Time')
-                    gametoi = gametoi.merge(gamepbp[['Time', 'TeamScore', 'OppScore']], how='left', on='Time')
-                    gametoi.loc[:, 'TeamScore'] = gametoi.TeamScore.fillna(method='ffill')
-                    gametoi.loc[:, 'OppScore'] = gametoi.OppScore.fillna(method='ffill')
-
-                    # Switch TOI column labeling from H1/R1 to Team1/Opp1 as appropriate
-                    cols_to_change = list(gametoi.columns)
-                    cols_to_change = [x for x in cols_to_change if len(x) == 2]  # e.g. H1
-                    if team == home:
-                        swapping_dict = {'H': 'Team', 'R': 'Opp'}
-                        colchanges = {c: swapping_dict[c[0]] + c[1] for c in cols_to_change}
-                    else:
-                        swapping_dict = {'H': 'Opp', 'R': 'Team'}
-                        colchanges = {c: swapping_dict[c[0]] + c[1] for c in cols_to_change}
-                    gametoi = gametoi.rename(columns=colchanges)
-
-                    # finally, add game, home, and road to both dfs
-                    gamepbp.loc[:, 'Game'] = game
-                    gamepbp.loc[:, 'Home'] = home
-                    gamepbp.loc[:, 'Road'] = road
-                    gametoi.loc[:, 'Game'] = game
-                    gametoi.loc[:, 'Home'] = home
-                    gametoi.loc[:, 'Road'] = road
-
-                    # concat toi and pbp
-                    if pbpdf is None:
-                        pbpdf = gamepbp
-                    else:
-                        pbpdf = pd.concat([pbpdf, gamepbp])
-                    if toidf is None:
-                        toidf = gametoi
-                    else:
-                        toidf = pd.concat([toidf, gametoi])
-
-            except FileNotFoundError:
-                pass
-
-        # write to file
-        if pbpdf is not None:
-            pbpdf.loc[:, 'FocusTeam'] = team
-        if toidf is not None:
-            toidf.loc[:, 'FocusTeam'] = team
-
-        write_team_pbp(pbpdf, season, team)
-        write_team_toi(toidf, season, team)
-        #print('Done with team logs for {0:d} {1:s} ({2:d}/{3:d})'.format(
-        #    season, team_info.team_as_str(team), teami + 1, len(allteams)))
+                gametoi = parse_toi.get_parsed_toi(season, game)
+            except OSError:
+                print('Check TOI for', season, game)
+    except FileNotFoundError:
+        return None, None
+
+    if gamepbp is None or gametoi is None or len(gamepbp) == 0 or len(gametoi) == 0:
+        return None, None
+
+    # Rename score and strength columns from home/road to team/opp
+    if team == home:
+        gametoi = gametoi.assign(TeamStrength=gametoi.HomeStrength, OppStrength=gametoi.RoadStrength,
+                                 TeamStrengthCode=gametoi.HomeStrengthCode,
+                                 OppStrengthCode=gametoi.RoadStrengthCode) \
+            .drop({'HomeStrength', 'RoadStrength', 'HomeStrengthCode', 'RoadStrengthCode'}, axis=1)
+        gamepbp = gamepbp.assign(TeamScore=gamepbp.HomeScore, OppScore=gamepbp.RoadScore) \
+            .drop({'HomeScore', 'RoadScore'}, axis=1)
+    else:
+        gametoi = gametoi.assign(TeamStrength=gametoi.RoadStrength, OppStrength=gametoi.HomeStrength,
+                                 TeamStrengthCode=gametoi.RoadStrengthCode,
+                                 OppStrengthCode=gametoi.HomeStrengthCode) \
+            .drop({'HomeStrength', 'RoadStrength', 'HomeStrengthCode', 'RoadStrengthCode'}, axis=1)
+        gamepbp = gamepbp.assign(TeamScore=gamepbp.RoadScore, OppScore=gamepbp.HomeScore) \
+            .drop({'HomeScore', 'RoadScore'}, axis=1)
+
+    # add scores to toi and strengths to pbp
+    gamepbp = gamepbp.merge(gametoi[['Time', 'TeamStrength', 'OppStrength', 'TeamStrengthCode',
+                                     'OppStrengthCode']], how='left', on='Time')
+    for col in ('TeamStrengthCode', 'OppStrengthCode'):
+        gamepbp.loc[:, col] = gamepbp[col].fillna(strengths.UNKNOWN).astype(np.int8)
+    gametoi = gametoi.merge(gamepbp[['Time', 'TeamScore', 'OppScore']], how='left', on='Time')
+    gametoi.loc[:, 'TeamScore'] = gametoi.TeamScore.ffill()
+    gametoi.loc[:, 'OppScore'] = gametoi.OppScore.ffill()
+
+    # Switch TOI column labeling from H1/R1 to Team1/Opp1 as appropriate
+    cols_to_change = list(gametoi.columns)
+    cols_to_change = [x for x in cols_to_change if len(x) == 2]  # e.g. H1
+    if team == home:
+        swapping_dict = {'H': 'Team', 'R': 'Opp'}
+        colchanges = {c: swapping_dict[c[0]] + c[1] for c in cols_to_change}
+    else:
+        swapping_dict = {'H': 'Opp', 'R': 'Team'}
+        colchanges = {c: swapping_dict[c[0]] + c[1] for c in cols_to_change}
+    gametoi = gametoi.rename(columns=colchanges)
+
+    # finally, add game, home, and road to both dfs
+    gamepbp = gamepbp.assign(Game=game, Home=home, Road=road)
+    gametoi = gametoi.assign(Game=game, Home=home, Road=road)
+    return gamepbp, gametoi
 
 
 def team_setup():
@@ -0,0 +1,165 @@
+"""
+This module contains the kernels that turn shifts expanded to one entry per second (see parse_toi._expand_shifts) into
+the TOI matrix: skater slots, goalies and strengths, all in one pass over each second. They are compiled with numba
+if it is installed; otherwise, equivalent NumPy code is used, which gives the same results but is slower.
+
+Players are given as integer codes (e.g. from pd.factorize), and -1 means nobody. Team 0 is home and team 1 is road.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Skater slots per team, i.e. H1-H6 and R1-R6
+MAX_SKATERS = 6
+_USE_NUMBA = {'use': njit is not None}
+
+
+def has_numba():
+    """
+    Checks if the compiled kernels are available.
+
+    :return: bool
+    """
+    return njit is not None
+
+
+def use_numba(use=True):
+    """
+    Sets whether to use the compiled kernels (if numba is installed) or the NumPy versions, e.g. to compare them.
+
+    :param use: bool
+
+    :return: nothing
+    """
+    _USE_NUMBA['use'] = use and has_numba()
+
+
+def get_team_offsets(teams, times, numtimes):
+    """
+    Returns where each team-second starts in entries sorted by team and time.
+
+    :param teams: array of int, 0 or 1, sorted
+    :param times: array of int, sorted within team
+    :param numtimes: int, the number of seconds
+
+    :return: array of int, length 2 * numtimes + 1. Entries for team i at second t are [offsets[i * numtimes + t],
+        offsets[i * numtimes + t + 1]).
+    """
+    return np.searchsorted(teams * numtimes + times, np.arange(2 * numtimes + 1)).astype(np.int64)
+
+
+def fill_seconds(numtimes, skateroffsets, skatercodes, slotcols, goalieoffsets, goaliecodes, topgoalies):
+    """
+    Fills in skater slots, goalies and skater counts for each second.
+
+    Skaters should be sorted by team, time and then priority (longest shift first), so slot 1 is the first skater
+    listed for that team and second. slotcols says which slots are kept and in which column they go.
+
+    If a team has more than one goalie listed at a second, then at that second only topgoalies[team] is kept--for both
+    teams, as it always has been.
+
+    :param numtimes: int, the number of seconds
+    :param skateroffsets: array of int, from get_team_offsets for skaters
+    :param skatercodes: array of int, player codes for skaters
+    :param slotcols: 2D array of int, (team, slot number starting from 1): column index, or -1 if the slot is dropped
+    :param goalieoffsets: array of int, from get_team_offsets for goalies
+    :param goaliecodes: array of int, player codes for goalies
+    :param topgoalies: array of int, the goalie to keep for each team when it has more than one at a second. Only
+        used for teams that do.
+
+    :return: (skaters, goalies, counts, duplicates). skaters is (team, column, second) player codes; goalies is
+        (team, second) player codes; counts is (team, second) skaters plus 100 for a goalie; duplicates is the number of
+        team-seconds that still have more than one goalie.
+    """
+    skaters = np.full((2, MAX_SKATERS, numtimes), -1, dtype=np.int64)
+    goalies = np.full((2, numtimes), -1, dtype=np.int64)
+    counts = np.zeros((2, numtimes), dtype=np.int64)
+    if _USE_NUMBA['use']:
+        duplicates = _fill_seconds_compiled(numtimes, skateroffsets, skatercodes, slotcols, goalieoffsets, goaliecodes,
+                                            topgoalies, skaters, goalies, counts)
+    else:
+        duplicates = _fill_seconds_numpy(numtimes, skateroffsets, skatercodes, slotcols, goalieoffsets, goaliecodes,
+                                         topgoalies, skaters, goalies, counts)
+    return skaters, goalies, counts, duplicates
+
+
+def _fill_seconds_loop(numtimes, skateroffsets, skatercodes, slotcols, goalieoffsets, goaliecodes, topgoalies,
+                       skaters, goalies, counts):
+    """
+    The compiled kernel behind fill_seconds. Fills skaters, goalies and counts in place.
+
+    :return: int, the number of team-seconds that still have more than one goalie
+    """
+    duplicates = 0
+    maxslot = slotcols.shape[1] - 1
+    for t in range(numtimes):
+        # Goalies. A team with two at this second drops everyone but its top goalie, on both teams
+        hstart, hend = goalieoffsets[t], goalieoffsets[t + 1]
+        rstart, rend = goalieoffsets[numtimes + t], goalieoffsets[numtimes + t + 1]
+        toomanyhome = hend - hstart > 1
+        toomanyroad = rend - rstart > 1
+        for team in range(2):
+            start = goalieoffsets[team * numtimes + t]
+            end = goalieoffsets[team * numtimes + t + 1]
+            kept = 0
+            for i in range(start, end):
+                code = goaliecodes[i]
+                if toomanyhome and code != topgoalies[0]:
+                    continue
+                if toomanyroad and code != topgoalies[1]:
+                    continue
+                goalies[team, t] = code
+                kept += 1
+            if kept > 1:
+                duplicates += 1
+            if kept > 0:
+                counts[team, t] = 100
+
+            # Skaters, in priority order
+            start = skateroffsets[team * numtimes + t]
+            end = skateroffsets[team * numtimes + t + 1]
+            for i in range(start, end):
+                slot = i - start + 1
+                if slot > maxslot:
+                    break
+                col = slotcols[team, slot]
+                if col >= 0:
+                    skaters[team, col, t] = skatercodes[i]
+                    counts[team, t] += 1
+    return duplicates
+
+
+def _fill_seconds_numpy(numtimes, skateroffsets, skatercodes, slotcols, goalieoffsets, goaliecodes, topgoalies,
+                        skaters, goalies, counts):
+    """
+    Same as _fill_seconds_loop, but with whole-array operations instead of a loop over seconds.
+
+    :return: int, the number of team-seconds that still have more than one goalie
+    """
+    # Skaters: slot is the position within the team-second, starting from 1
+    keys = np.repeat(np.arange(2 * numtimes), np.diff(skateroffsets))
+    slots = np.arange(len(keys)) - skateroffsets[keys] + 1
+    teams, times = keys // numtimes, keys % numtimes
+    inrange = slots < slotcols.shape[1]
+    cols = np.full(len(keys), -1, dtype=np.int64)
+    cols[inrange] = slotcols[teams[inrange], slots[inrange]]
+    kept = cols >= 0
+    skaters[teams[kept], cols[kept], times[kept]] = skatercodes[kept]
+    counts += np.bincount(keys[kept], minlength=2 * numtimes).reshape(2, numtimes)
+
+    # Goalies
+    keys = np.repeat(np.arange(2 * numtimes), np.diff(goalieoffsets))
+    teams, times = keys // numtimes, keys % numtimes
+    toomany = np.diff(goalieoffsets).reshape(2, numtimes) > 1
+    kept = ~(toomany[0][times] & (goaliecodes != topgoalies[0])) & ~(toomany[1][times] & (goaliecodes != topgoalies[1]))
+    goalies[teams[kept], times[kept]] = goaliecodes[kept]
+    numkept = np.bincount(keys[kept], minlength=2 * numtimes).reshape(2, numtimes)
+    counts += 100 * (numkept > 0)
+    return int((numkept > 1).sum())
+
+
+_fill_seconds_compiled = njit(cache=True, nogil=True)(_fill_seconds_loop) if njit is not None else None
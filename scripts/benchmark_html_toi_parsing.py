@@ -0,0 +1,150 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Times reading shifts from html shift logs (the TH and TV reports) with html_table_extractor, as parse_toi used to,
+and with the streaming parser in shift_log, on a season's raw html shift logs already scraped to disk. Checks that
+both read the same shifts.
+
+Only reading the pages into columns is timed; looking up player IDs and converting times are the same for both.
+"""
+
+import argparse
+import re
+import time
+
+from bs4 import BeautifulSoup
+from html_table_extractor.extractor import Extractor
+
+from scrapenhl2.scrape import general_helpers as helpers
+from scrapenhl2.scrape import raw_archive, schedules, scrape_toi, shift_log
+
+
+def read_shift_log_before(page):
+    """
+    Reads shifts the way parse_toi did before shift_log: the extractor builds every table as lists, then they are
+    scanned for player headings and shift rows.
+
+    Extractor looks for the first tag without an id when not given a table, which for a whole page is <head>, so it is
+    given the outermost table here.
+
+    :param page: str, the TH or TV report
+
+    :return: dict of column: list, as shift_log.read_shift_log
+    """
+    tables = Extractor(str(BeautifulSoup(page, 'html.parser').find('table'))).parse().return_list()
+
+    names = []
+    shiftnums = []
+    periods = []
+    starts = []
+    ends = []
+    i = 0
+    while i < len(tables):
+        # A convenient artefact of this package: search for [p, p, p, p, p, p, p, p]
+        if len(tables[i]) == 8 and helpers.check_number_last_first_format(tables[i][0]):
+            pname = tables[i][0]
+            i += 2  # skip the header row
+            while i < len(tables) and re.match(r'\d{1,2}', tables[i][0]):  # First entry is shift number
+                shiftnum, per, start, end, dur, ev = tables[i]
+                names.append(pname)
+                shiftnums.append(int(shiftnum))
+                if per == 'OT':
+                    per = 4
+                periods.append(int(per))
+                starts.append(start[:start.index('/')].strip())
+                ends.append(end[:end.index('/')].strip())
+                i += 1
+            i += 1
+        else:
+            i += 1
+    return {'Name': names, 'ShiftNum': shiftnums, 'Period': periods, 'Start': starts, 'End': ends}
+
+
+IMPLEMENTATIONS = {'extractor': read_shift_log_before,
+                   'streaming': shift_log.read_shift_log}
+
+
+def load_pages(season, n=None):
+    """
+    Reads home and road html shift logs for up to n games from this season.
+
+    :param season: int, the season
+    :param n: int, or None for all games with both logs
+
+    :return: dict of (game, 'H' or 'R'): str
+    """
+    pages = {}
+    for game in schedules.get_season_schedule(season).Game:
+        if n is not None and len(pages) >= 2 * n:
+            break
+        if not (raw_archive.exists(scrape_toi.get_home_shiftlog_filename(season, game)) and
+                raw_archive.exists(scrape_toi.get_road_shiftlog_filename(season, game))):
+            continue
+        for homeroad in ('H', 'R'):
+            pages[(game, homeroad)] = scrape_toi.get_raw_html_toi(season, game, homeroad)
+    return pages
+
+
+def benchmark(pages, implementation):
+    """
+    Reads shifts from each page with this implementation.
+
+    :param pages: dict of (game, 'H' or 'R'): str, from load_pages
+    :param implementation: function, one of IMPLEMENTATIONS
+
+    :return: (seconds taken, dict of (game, 'H' or 'R'): columns, or the ValueError raised)
+    """
+    results = {}
+    start = time.perf_counter()
+    for key, page in pages.items():
+        try:
+            results[key] = implementation(page)
+        except ValueError as ve:
+            results[key] = ve
+    return time.perf_counter() - start, results
+
+
+def count_mismatches(before, after):
+    """
+    Compares shifts read page by page.
+
+    :param before: dict of page: columns or error
+    :param after: dict of page: columns or error
+
+    :return: list of pages that differ
+    """
+    mismatches = []
+    for key in before:
+        old, new = before[key], after[key]
+        if isinstance(old, ValueError) or isinstance(new, ValueError):
+            if not (isinstance(old, ValueError) and isinstance(new, ValueError)):
+                mismatches.append(key)
+        elif old != new:
+            mismatches.append(key)
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--season", type=int, required=True)
+    parser.add_argument("-n", "--games", type=int, default=None,
+                        help="Games to use; all with raw html shift logs by default")
+    parser.add_argument("--skip-check", action="store_true", help="Do not compare output across implementations")
+    arguments = parser.parse_args()
+
+    pages = load_pages(arguments.season, arguments.games)
+    if len(pages) == 0:
+        print("No raw html shift logs found for", arguments.season)
+    else:
+        print('Benchmarking on {0:d} pages, {1:.1f} MB'.format(
+            len(pages), sum(len(page) for page in pages.values()) / 1e6))
+        results = {}
+        for name, implementation in IMPLEMENTATIONS.items():
+            secs, results[name] = benchmark(pages, implementation)
+            print('{0:<10s} {1:>9.2f} s total {2:>9.2f} ms per page'.format(name, secs, 1000 * secs / len(pages)))
+
+        if not arguments.skip_check:
+            mismatches = count_mismatches(results['extractor'], results['streaming'])
+            helpers.print_and_log('streaming: {0:d} pages differ from extractor {1:s}'.format(
+                len(mismatches), str(mismatches[:10])))
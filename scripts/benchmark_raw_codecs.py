@@ -0,0 +1,84 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compares raw file codecs on raw pbp and toi already scraped to disk: compression ratio, and compress and decompress
+time per file. Use the results to pick --raw-codec and --raw-level for scripts/update_all.py.
+"""
+
+import argparse
+import glob
+import os.path
+import random
+import time
+
+from scrapenhl2.scrape import organization, raw_codecs
+
+# Codec: levels to try. None is the codec's own default.
+LEVELS = {'zlib': [1, 6, 9],
+          'lzma': [0, 6],
+          'zstd': [1, 3, 9, 19],
+          'lz4': [None, 9]}
+
+
+def load_pages(season, n):
+    """
+    Reads up to n raw pbp and n raw toi files from this season, decompressed.
+
+    :param season: int, the season
+    :param n: int, number of files of each type
+
+    :return: list of bytes
+    """
+    pages = []
+    for folder in (organization.get_season_raw_pbp_folder(season), organization.get_season_raw_toi_folder(season)):
+        filenames = [f for f in glob.glob(os.path.join(folder, '*'))
+                     if raw_codecs.get_codec_from_filename(f) is not None]
+        random.shuffle(filenames)
+        for filename in filenames[:n]:
+            pages.append(raw_codecs.read_raw_file(filename).encode('latin-1'))
+    return pages
+
+
+def benchmark(pages, codec, level):
+    """
+    Compresses and decompresses each page with this codec and level.
+
+    :param pages: list of bytes
+    :param codec: str
+    :param level: int or None
+
+    :return: (ratio, ms to compress per file, ms to decompress per file)
+    """
+    start = time.perf_counter()
+    compressed = [raw_codecs.compress(page, codec, level) for page in pages]
+    compress_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in compressed:
+        raw_codecs.decompress(data, codec)
+    decompress_time = time.perf_counter() - start
+
+    ratio = sum(len(page) for page in pages) / sum(len(data) for data in compressed)
+    return ratio, 1000 * compress_time / len(pages), 1000 * decompress_time / len(pages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--season", type=int, required=True)
+    parser.add_argument("-n", "--files", type=int, default=100, help="Files of each type (pbp, toi) to sample")
+    arguments = parser.parse_args()
+
+    pages = load_pages(arguments.season, arguments.files)
+    if len(pages) == 0:
+        print("No raw files found for", arguments.season)
+    else:
+        print('Benchmarking on {0:d} files, {1:.1f} MB uncompressed'.format(
+            len(pages), sum(len(page) for page in pages) / 1024 / 1024))
+        print('{0:<6s} {1:>5s} {2:>7s} {3:>14s} {4:>16s}'.format(
+            'Codec', 'Level', 'Ratio', 'Compress ms', 'Decompress ms'))
+        for codec in raw_codecs.get_codecs():
+            for level in LEVELS[codec]:
+                ratio, ctime, dtime = benchmark(pages, codec, level)
+                print('{0:<6s} {1:>5s} {2:>7.2f} {3:>14.2f} {4:>16.2f}'.format(
+                    codec, 'def' if level is None else str(level), ratio, ctime, dtime))
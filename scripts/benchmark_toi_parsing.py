@@ -0,0 +1,352 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Times building the per-second TOI matrix from shifts (parse_toi._finish_toidf_manipulations) before and after it was
+vectorized, on a season's raw json shifts already scraped to disk, and checks that all give the same matrix. The
+vectorized version is timed with the NumPy kernels and, if numba is installed, the compiled ones (see toi_kernels).
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from scrapenhl2.scrape import general_helpers as helpers
+from scrapenhl2.scrape import parse_toi, players, raw_archive, schedules, scrape_toi, toi_kernels
+
+
+def finish_toidf_manipulations_before(df, season, game):
+    """
+    The matrix builder as it was before the vectorized version in parse_toi: fills in seconds shift by shift, then
+    melts and merges. Only change is assigning ranks without .loc, which newer pandas needs to keep them ints.
+
+    :param df: dataframe
+    :param season: int, the season
+    :param game: int, the game
+
+    :return: dataframe
+    """
+    gameinfo = schedules.get_game_data_from_schedule(season, game)
+
+    # TODO don't read end times. Use duration, which has good coverage, to infer end. Then end + 1200 not needed below.
+    # Sometimes shifts have the same start and time.
+    # By the time we're here, they'll have start = end + 1
+    # So let's remove shifts with duration -1
+    df = df[df.Start != df.End + 1]
+
+    # Sometimes you see goalies with a shift starting in one period and ending in another
+    # This is to help in those cases.
+    if sum(df.End < df.Start) > 0:
+        # TODO I think I'm making a mistake with overtime shifts--end at 3900!
+        # TODO also, maybe only go to the end of the period, not to 1200
+        df.loc[df.End < df.Start, 'End'] = df.loc[df.End < df.Start, 'End'] + 1200
+    # One issue coming up is when the above line comes into play--missing times are filled in as 0:00
+    tempdf = df[['PlayerID', 'Start', 'End', 'Team', 'Duration']].query("Duration > 0")
+    tempdf = tempdf.assign(Time=tempdf.Start)
+
+    # Let's filter out goalies for now. We can add them back in later.
+    # This will make it easier to get the strength later
+    pids = players.get_player_ids_file()
+    tempdf = tempdf.merge(pids[['ID', 'Pos']], how='left', left_on='PlayerID', right_on='ID')
+
+    toi = pd.DataFrame({'Time': [i for i in range(0, int(round(max(df.End))))]})
+
+    # Originally used a hacky way to fill in times between shift start and end: increment tempdf by one, filter, join
+    # Faster to work with base structures
+    # Or what if I join each player to full df, fill backward on start and end, and filter out rows where end > time
+    # Maybe I can create a matrix with rows = time and columns = players
+    # Loop over start and end, and use iloc[] to set booleans en masse.
+    # Then melt and filter
+
+    # Create one row per second
+    alltimes = toi.Time
+    newdf = pd.DataFrame(index=alltimes)
+
+    # Add rows and set times to True simultaneously
+    for i, (pid, start, end, team, duration, second, pid, pos) in tempdf.iterrows():
+        newdf.loc[start:end, pid] = True
+
+    # Fill NAs to False
+    for col in newdf:
+        newdf.loc[:, col] = newdf[col].fillna(False)
+
+    # Go wide to long and then drop unneeded rows
+    newdf = helpers.melt_helper(newdf.reset_index(), id_vars='Time', # value_vars=newdf.columns,  # cols with num colnames causing errors
+                                var_name='PlayerID', value_name='OnIce')
+    newdf = newdf[newdf.OnIce].drop('OnIce', axis=1)
+    newdf = newdf.merge(tempdf.drop('Time', axis=1), how='left', on='PlayerID') \
+        .query("Time <= End & Time >= Start") \
+        .drop('ID', axis=1)
+
+    # In case there were rows that were all missing, join onto TOI
+    tempdf = toi.merge(newdf, how='left', on='Time')
+
+    goalies = tempdf[tempdf.Pos == 'G'].drop({'Pos'}, axis=1)
+    tempdf = tempdf[tempdf.Pos != 'G'].drop({'Pos'}, axis=1)
+
+    # Append team name to start of columns by team
+    home = str(gameinfo['Home'])
+    road = str(gameinfo['Road'])
+
+    # Goalies
+    # Let's assume we get only one goalie per second per team.
+    # TODO: flag if there are multiple listed and pick only one
+    goalies.loc[:, 'GTeam'] = goalies.Team.apply(lambda x: 'HG' if str(int(x)) == home else 'RG')
+    try:
+        goalies2 = goalies[['Time', 'PlayerID', 'GTeam']] \
+            .pivot(index='Time', columns='GTeam', values='PlayerID') \
+            .reset_index()
+    except ValueError:
+        # Duplicate entries in index error.
+
+        # Find times with multiple goalies
+        too_many_goalies_h = goalies[goalies.GTeam == 'HG'][['Time']] \
+            .assign(GoalieCount=1) \
+            .groupby('Time').count() \
+            .reset_index() \
+            .query('GoalieCount > 1')
+
+        too_many_goalies_r = goalies[goalies.GTeam == 'RG'][['Time']] \
+            .assign(GoalieCount=1) \
+            .groupby('Time').count() \
+            .reset_index() \
+            .query('GoalieCount > 1')
+
+        # Find most common goalie for each team
+        if len(too_many_goalies_h) == 0:
+            problem_times_revised_h = goalies
+        else:  # i.e. if len(too_many_goalies_h) > 0:
+            top_goalie_h = goalies[goalies.GTeam == 'HG'][['PlayerID']] \
+                .assign(GoalieCount=1) \
+                .groupby('PlayerID').count() \
+                .reset_index() \
+                .sort_values('GoalieCount', ascending=False) \
+                .PlayerID.iloc[0]
+            # and now finally drop problem times
+            problem_times_revised_h = goalies \
+                .merge(too_many_goalies_h[['Time']], how='outer', on='Time', indicator=True)
+            problem_times_revised_h.loc[:, 'ToDrop'] = (problem_times_revised_h._merge == 'both') & \
+                                                       (problem_times_revised_h.PlayerID != top_goalie_h)
+            problem_times_revised_h = problem_times_revised_h[problem_times_revised_h.ToDrop == False] \
+                .drop({'_merge', 'ToDrop'}, axis=1)
+
+        if len(too_many_goalies_r) == 0:
+            problem_times_revised_r = problem_times_revised_h
+        else:  # i.e. if len(too_many_goalies_r) > 0:
+            top_goalie_r = goalies[goalies.GTeam == 'RG'][['PlayerID']] \
+                .assign(GoalieCount=1) \
+                .groupby('PlayerID').count() \
+                .reset_index() \
+                .sort_values('GoalieCount', ascending=False) \
+                .PlayerID.iloc[0]
+            problem_times_revised_r = problem_times_revised_h \
+                .merge(too_many_goalies_r[['Time']], how='outer', on='Time', indicator=True)
+            problem_times_revised_r.loc[:, 'ToDrop'] = (problem_times_revised_r._merge == 'both') & \
+                                                       (problem_times_revised_r.PlayerID != top_goalie_r)
+            problem_times_revised_r = problem_times_revised_r[problem_times_revised_r.ToDrop == False] \
+                .drop({'_merge', 'ToDrop'}, axis=1)
+
+        # Pivot again
+        goalies2 = problem_times_revised_r[['Time', 'PlayerID', 'GTeam']] \
+            .pivot(index='Time', columns='GTeam', values='PlayerID') \
+            .reset_index()
+
+    # Home
+    hdf = tempdf.query('Team == "' + home + '"').sort_values(['Time', 'Duration'], ascending=[True, False])
+    if len(hdf) == 0:
+        # Earlier versions of pandas can have diff behavior
+        hdf = tempdf.query('Team == ' + home).sort_values(['Time', 'Duration'], ascending=[True, False])
+    hdf2 = hdf[['Time', 'Duration']].groupby('Time').rank(method='first', ascending=False)
+    hdf2 = hdf2.rename(columns={'Duration': 'rank'})
+    hdf2['rank'] = hdf2['rank'].apply(lambda x: int(x))
+    hdf.loc[:, 'rank'] = 'H' + hdf2['rank'].astype('str')
+
+    rdf = tempdf.query('Team == "' + road + '"').sort_values(['Time', 'Duration'], ascending=[True, False])
+    if len(rdf) == 0:
+        rdf = tempdf.query('Team == ' + road).sort_values(['Time', 'Duration'], ascending=[True, False])
+    rdf2 = rdf[['Time', 'Duration']].groupby('Time').rank(method='first', ascending=False)
+    rdf2 = rdf2.rename(columns={'Duration': 'rank'})
+    rdf2['rank'] = rdf2['rank'].apply(lambda x: int(x))
+    rdf.loc[:, 'rank'] = 'R' + rdf2['rank'].astype('str')
+
+    # Remove values above 6--looking like there won't be many
+    # But in those cases take shifts with longest durations
+    # That's why we create hdf and rdf by also sorting by Time and Duration above, and select duration for rank()
+    hdf = hdf.pivot(index='Time', columns='rank', values='PlayerID').iloc[:, 0:6]
+    hdf.reset_index(inplace=True)  # get time back as a column
+    rdf = rdf.pivot(index='Time', columns='rank', values='PlayerID').iloc[:, 0:6]
+    rdf.reset_index(inplace=True)
+
+    toi = toi.merge(hdf, how='left', on='Time') \
+        .merge(rdf, how='left', on='Time') \
+        .merge(goalies2, how='left', on='Time')
+
+    column_order = list(toi.columns.values)
+    column_order = ['Time'] + [x for x in sorted(column_order[1:])]  # First entry is Time; sort rest
+    toi = toi[column_order]
+    # Now should be Time, H1, H2, ... HG, R1, R2, ..., RG
+
+    # For games in the first, HG and RG may not exist yet. Have dummy replacements in there.
+    # Will be wrong for when goalie is pulled in first, but oh well...
+    if 'HG' not in toi.columns:
+        newcol = [0 for _ in range(len(toi))]
+        toi.insert(loc=toi.columns.get_loc('R1'), column='HG', value=newcol)
+    if 'RG' not in toi.columns:
+        toi.loc[:, 'RG'] = 0
+
+    toi.loc[:, 'HomeSkaters'] = 0
+    for col in toi.loc[:, 'H1':'HG'].columns[:-1]:
+        toi.loc[:, 'HomeSkaters'] = toi[col].notnull() + toi.HomeSkaters
+    toi.loc[:, 'HomeSkaters'] = 100 * toi['HG'].notnull() + toi.HomeSkaters  # a hack to make it easy to recognize
+    toi.loc[:, 'RoadSkaters'] = 0
+    for col in toi.loc[:, 'R1':'RG'].columns[:-1]:
+        toi.loc[:, 'RoadSkaters'] = toi[col].notnull() + toi.RoadSkaters
+    toi.loc[:, 'RoadSkaters'] = 100 * toi['RG'].notnull() + toi.RoadSkaters  # a hack to make it easy to recognize
+
+    # This is how we label strengths: 5 means 5 skaters plus goalie; five skaters w/o goalie is 4+1.
+    toi.loc[:, 'HomeStrength'] = toi.HomeSkaters.apply(
+        lambda x: '{0:d}'.format(x - 100) if x >= 100 else '{0:d}+1'.format(x - 1))
+    toi.loc[:, 'RoadStrength'] = toi.RoadSkaters.apply(
+        lambda x: '{0:d}'.format(x - 100) if x >= 100 else '{0:d}+1'.format(x - 1))
+
+    toi.drop({'HomeSkaters', 'RoadSkaters'}, axis=1, inplace=True)
+
+    # Also drop -1+1 and 0+1 cases, which are clearly errors, and the like.
+    # Need at least 3 skaters apiece, 1 goalie apiece, time, and strengths to be non-NA = 11 non NA values
+    toi2 = toi.dropna(axis=0, thresh=11)  # drop rows without at least 11 non-NA values
+
+    # TODO data quality check that I don't miss times in the middle of the game
+
+    return toi2
+
+
+def _with_kernels(compiled):
+    """
+    Returns parse_toi._finish_toidf_manipulations set to use the compiled or NumPy kernels.
+
+    :param compiled: bool
+
+    :return: function
+    """
+    def finish_toidf_manipulations(df, season, game):
+        toi_kernels.use_numba(compiled)
+        return parse_toi._finish_toidf_manipulations(df, season, game)
+    return finish_toidf_manipulations
+
+
+IMPLEMENTATIONS = {'before': finish_toidf_manipulations_before,
+                   'numpy': _with_kernels(False)}
+if toi_kernels.has_numba():
+    IMPLEMENTATIONS['numba'] = _with_kernels(True)
+
+
+def load_shifts(season, n=None):
+    """
+    Reads shift tables for up to n games from this season's raw json shifts.
+
+    :param season: int, the season
+    :param n: int, or None for all games with raw shifts
+
+    :return: dict of game: dataframe, one row per shift
+    """
+    shifts = {}
+    for game in schedules.get_season_schedule(season).Game:
+        if n is not None and len(shifts) >= n:
+            break
+        if not raw_archive.exists(scrape_toi.get_game_raw_toi_filename(season, game)):
+            continue
+        df = parse_toi._read_shift_table_from_page(scrape_toi.get_raw_toi(season, game))
+        if df is not None:
+            shifts[game] = df
+    return shifts
+
+
+def _as_saved(toi):
+    """
+    Casts player columns to float, so matrices can be compared whether missing players are NaN or nullable ints.
+    Strength codes are dropped, since the loop implementation only has labels, and the index is reset.
+
+    :param toi: dataframe
+
+    :return: dataframe
+    """
+    toi = toi.drop(['HomeStrengthCode', 'RoadStrengthCode'], axis=1, errors='ignore').reset_index(drop=True)
+    return toi.astype({col: float for col in toi.columns if col not in {'Time', 'HomeStrength', 'RoadStrength'}})
+
+
+def benchmark(shifts, season, implementation):
+    """
+    Builds the TOI matrix for each game with this implementation.
+
+    :param shifts: dict of game: dataframe, from load_shifts
+    :param season: int, the season
+    :param implementation: function, one of IMPLEMENTATIONS
+
+    :return: (seconds taken, dict of game: matrix, or the ValueError raised)
+    """
+    # Once untimed, so numba compiling (or loading from its cache) is not counted
+    game, df = next(iter(shifts.items()))
+    try:
+        implementation(df.copy(), season, game)
+    except ValueError:
+        pass
+
+    results = {}
+    start = time.perf_counter()
+    for game, df in shifts.items():
+        try:
+            results[game] = implementation(df.copy(), season, game)
+        except ValueError as ve:
+            results[game] = ve
+    return time.perf_counter() - start, results
+
+
+def count_mismatches(before, after):
+    """
+    Compares matrices game by game.
+
+    :param before: dict of game: matrix or error
+    :param after: dict of game: matrix or error
+
+    :return: list of games that differ
+    """
+    mismatches = []
+    for game in before:
+        old, new = before[game], after[game]
+        if isinstance(old, ValueError) or isinstance(new, ValueError):
+            if not (isinstance(old, ValueError) and isinstance(new, ValueError)):
+                mismatches.append(game)
+            continue
+        try:
+            pd.testing.assert_frame_equal(_as_saved(old), _as_saved(new))
+        except AssertionError:
+            mismatches.append(game)
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--season", type=int, required=True)
+    parser.add_argument("-n", "--games", type=int, default=None, help="Games to use; all with raw shifts by default")
+    parser.add_argument("--skip-check", action="store_true", help="Do not compare output across implementations")
+    arguments = parser.parse_args()
+
+    players.get_player_ids_file()  # Read once up front so it is not timed
+    shifts = load_shifts(arguments.season, arguments.games)
+    if len(shifts) == 0:
+        print("No raw shifts found for", arguments.season)
+    else:
+        print('Benchmarking on {0:d} games, {1:d} shifts'.format(
+            len(shifts), sum(len(df) for df in shifts.values())))
+        results = {}
+        for name, implementation in IMPLEMENTATIONS.items():
+            secs, results[name] = benchmark(shifts, arguments.season, implementation)
+            print('{0:<8s} {1:>9.2f} s total {2:>9.2f} ms per game'.format(name, secs, 1000 * secs / len(shifts)))
+
+        if not arguments.skip_check:
+            for name in results:
+                if name != 'before':
+                    mismatches = count_mismatches(results['before'], results[name])
+                    helpers.print_and_log('{0:s}: {1:d} games differ from before {2:s}'.format(
+                        name, len(mismatches), str(mismatches[:10])))
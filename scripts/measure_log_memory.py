@@ -0,0 +1,92 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measures memory taken by a season's team logs with the types in schemas, against the types they had before (object
+strings for events, roles, periods and strength labels; float64 player IDs; int64 times and scores).
+
+Logs are read with teams.get_team_pbp and get_team_toi (so including segments not yet compacted), then cast back to
+the old types for the comparison.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from scrapenhl2.scrape import schedules, schemas, teams
+
+
+def as_legacy_dtypes(df):
+    """
+    Casts columns back to the types logs had before schemas: categoricals to object, nullable ints and float32 to
+    float64, and other ints to int64.
+
+    :param df: dataframe
+
+    :return: dataframe
+    """
+    casts = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            casts[col] = df[col].astype(object)
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype):
+            casts[col] = df[col].astype(float)
+        elif dtype == np.float32:
+            casts[col] = df[col].astype(np.float64)
+        elif pd.api.types.is_integer_dtype(dtype):
+            casts[col] = df[col].astype(np.int64)
+    return df.assign(**casts)
+
+
+def measure(df, schema):
+    """
+    Returns bytes taken by df with the old types and with this schema.
+
+    :param df: dataframe, a team log
+    :param schema: dict, e.g. schemas.TEAM_TOI_SCHEMA
+
+    :return: (int, int), bytes before and after
+    """
+    before = as_legacy_dtypes(df).memory_usage(deep=True).sum()
+    after = schemas.apply_schema(df, schema).memory_usage(deep=True).sum()
+    return before, after
+
+
+def print_measurements(name, rows, before, after):
+    """
+    Prints memory taken before and after, and the saving.
+
+    :param name: str, e.g. toi
+    :param rows: int
+    :param before: int, bytes
+    :param after: int, bytes
+
+    :return: nothing
+    """
+    print('{0:s}: {1:d} rows, {2:.1f} MB before, {3:.1f} MB after ({4:.0f}% less)'.format(
+        name, rows, before / 1e6, after / 1e6, 100 * (1 - after / before) if before > 0 else 0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--season", type=int, required=True)
+    arguments = parser.parse_args()
+
+    totals = {'pbp': [0, 0, 0], 'toi': [0, 0, 0]}
+    for team in schedules.get_teams_in_season(arguments.season):
+        for name, get_log, schema in (
+                ('pbp', teams.get_team_pbp, schemas.TEAM_PBP_SCHEMA),
+                ('toi', teams.get_team_toi, schemas.TEAM_TOI_SCHEMA)):
+            try:
+                df = get_log(arguments.season, team)
+            except OSError:
+                continue
+            before, after = measure(df, schema)
+            totals[name][0] += len(df)
+            totals[name][1] += before
+            totals[name][2] += after
+
+    for name, (rows, before, after) in totals.items():
+        print_measurements(name, rows, before, after)
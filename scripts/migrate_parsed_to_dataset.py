@@ -0,0 +1,72 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Converts parsed pbp and toi saved as one HDF5 file per game (how they were saved before parsed_store) into the
+parsed dataset, then compacts each season. Games already in the dataset are left alone. The HDF5 files are kept
+unless --delete is given.
+"""
+
+import argparse
+import glob
+import os
+import os.path
+
+import pandas as pd
+
+from scrapenhl2.scrape import organization, parse_pbp, parse_toi, parsed_store, schedules, schemas, strengths
+
+
+def migrate_season(table, season, delete=False):
+    """
+    Moves this season's HDF5 files for this table into the parsed dataset.
+
+    :param table: str, pbp or toi
+    :param season: int, the season
+    :param delete: bool. If True, deletes each HDF5 file once its game is in the dataset.
+
+    :return: int, number of games moved
+    """
+    if table == 'pbp':
+        folder = organization.get_season_parsed_pbp_folder(season)
+        get_filename = parse_pbp.get_game_parsed_pbp_filename
+    else:
+        folder = organization.get_season_parsed_toi_folder(season)
+        get_filename = parse_toi.get_game_parsed_toi_filename
+
+    sch = schedules.get_season_schedule(season).set_index('Game')
+    moved = 0
+    for filename in sorted(glob.glob(os.path.join(folder, '*.h5'))):
+        game = int(os.path.splitext(os.path.basename(filename))[0])
+        if filename != get_filename(season, game):
+            continue
+        if game not in sch.index:
+            print('Skipping {0:s} for {1:d} {2:d}: not in schedule'.format(table, season, game))
+            continue
+
+        if not parsed_store.has_game(table, season, game):
+            df = pd.read_hdf(filename)
+            if table == 'pbp':
+                df = df.assign(Period=df.Period.astype(str).values)
+            else:
+                df = strengths.add_strength_codes(df)
+            parsed_store.save_game(table, schemas.apply_schema(df, parsed_store.TABLES[table]), season, game,
+                                   sch.loc[game, 'Home'], sch.loc[game, 'Road'])
+            moved += 1
+        if delete:
+            os.remove(filename)
+
+    parsed_store.compact_season(table, season)
+    return moved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--season", type=int, nargs='+', required=True)
+    parser.add_argument("--delete", action="store_true", help="Delete HDF5 files once moved")
+    arguments = parser.parse_args()
+
+    for season in arguments.season:
+        for table in ('pbp', 'toi'):
+            print('Moved {0:s} for {1:d} games in {2:d}'.format(
+                table, migrate_season(table, season, arguments.delete), season))
@@ -0,0 +1,19 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Packs a season's raw pbp and toi files into one archive per folder (see scrapenhl2.scrape.raw_archive). Run again
+after scraping more games to append them.
+"""
+
+import argparse
+from scrapenhl2.scrape import raw_archive
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--season", type=int, required=True)
+    parser.add_argument("--remove", action="store_true", help="Delete loose files once they are packed")
+    arguments = parser.parse_args()
+
+    raw_archive.pack_season(arguments.season, remove_files=arguments.remove)
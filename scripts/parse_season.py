@@ -0,0 +1,27 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Parses pbp and toi for every final game in a season from raw files already scraped to disk, e.g. after changing how
+games are parsed. Per-game timings and games that could not be parsed go to the log.
+"""
+
+import argparse
+
+from scrapenhl2.scrape import parse_pbp, parse_toi
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--season", type=int, required=True)
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Processes parsing games at once")
+    parser.add_argument("--force", action="store_true", help="Reparse games already parsed")
+    parser.add_argument("--html-pbp", action="store_true", help="Parse the html pbp instead of the json")
+    parser.add_argument("--skip-pbp", action="store_true")
+    parser.add_argument("--skip-toi", action="store_true")
+    arguments = parser.parse_args()
+
+    if not arguments.skip_pbp:
+        parse_pbp.parse_season_pbp(arguments.season, arguments.force, arguments.html_pbp, arguments.workers)
+    if not arguments.skip_toi:
+        parse_toi.parse_season_toi(arguments.season, arguments.force, arguments.workers)
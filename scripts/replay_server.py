@@ -0,0 +1,39 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Runs a local stand-in for the NHL API and html reports (see scrapenhl2.scrape.replay_server), serving pages from the
+raw data already scraped. Point scrapers at it with, e.g.:
+
+    SCRAPENHL2_STATSAPI_URL=http://127.0.0.1:8000 SCRAPENHL2_NHL_URL=http://127.0.0.1:8000 \
+        python scripts/update_all.py -s 2017
+
+Note scraping writes to the same raw data folders this serves from, so use a copy of the data for benchmarks.
+"""
+
+import argparse
+from scrapenhl2.scrape import replay_server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0, help="Seconds added to each response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many more seconds, at random")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests/s allowed before answering 429")
+    parser.add_argument("--upstream", action="store_true", help="Fetch and record pages not on disk")
+    parser.add_argument("--seed", type=int, default=None)
+    arguments = parser.parse_args()
+
+    server = replay_server.ReplayServer(host=arguments.host, port=arguments.port, latency=arguments.latency,
+                                        latency_jitter=arguments.jitter, error_rate=arguments.error_rate,
+                                        error_status=arguments.error_status, rate_limit=arguments.rate_limit,
+                                        upstream=arguments.upstream, seed=arguments.seed)
+    print('Serving on', server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.get_stats())
@@ -2,16 +2,27 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-from scrapenhl2.scrape import autoupdate
+from scrapenhl2.scrape import autoupdate, raw_codecs
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("-s", "--season", type=int, default=None)
+    parser.add_argument("-w", "--workers", type=int, default=autoupdate.DEFAULT_FETCH_WORKERS)
+    parser.add_argument("--raw-codec", choices=raw_codecs.get_codecs(), default=raw_codecs.DEFAULT_CODEC,
+                        help="Codec for newly saved raw files; see scripts/benchmark_raw_codecs.py")
+    parser.add_argument("--raw-level", type=int, default=None)
+    parser.add_argument("--full-schedule", action="store_true",
+                        help="Re-read the whole season schedule instead of just recent days")
     arguments = parser.parse_args()
 
+    if arguments.raw_codec == raw_codecs.DEFAULT_CODEC and arguments.raw_level is None:
+        arguments.raw_level = raw_codecs.DEFAULT_LEVEL
+    raw_codecs.set_raw_codec(arguments.raw_codec, arguments.raw_level)
+
     if arguments.season is not None and 2017 < arguments.season < 2005:
         print("Invalid season")
 
-    autoupdate.autoupdate(season=arguments.season)
+    autoupdate.autoupdate(season=arguments.season, workers=arguments.workers,
+                          full_schedule_refresh=arguments.full_schedule)
 
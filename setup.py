@@ -20,12 +20,13 @@ setuptools.setup(
     keywords="nhl",
     url="https://github.com/muneebalam/scrapenhl2",
     packages=setuptools.find_packages(),
+    python_requires='>=3.9',  # concurrent.futures cancel_futures
     install_requires=['numpy',  # used by pandas
                       'scipy',  # not currently used, but may be used for distribution fitting
                       'matplotlib',  # graphing
                       'seaborn',  # graphing; a little nicer than MPL
                       'pandas',  # for handling and manipulating data
-                      'pyarrow',  # used by feather
+                      'pyarrow>=14',  # used by feather, and for the parsed dataset
                       'feather-format',  # fast read-write format that plays nicely with R
                       'halo',  # for spinners
                       'scikit-learn',  # not currently used, but will be for machine learning
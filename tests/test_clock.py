@@ -0,0 +1,36 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest
+
+from scrapenhl2.scrape import clock
+
+
+def test_mmss_to_secs():
+
+    assert clock.mmss_to_secs(['0:00', '1:05', '19:59']).tolist() == [0, 65, 1199]
+
+
+def test_fix_typos():
+
+    assert clock.fix_typos(['!;@#', '$%:^&', '*(:)0']).tolist() == ['1:23', '45:67', '89:00']
+
+
+def test_to_game_secs():
+
+    periods = [1, '2', 3.0, 'OT', 'SO']
+    assert clock.to_game_secs(periods, ['2:00'] * 5).tolist() == [120, 1320, 2520, 3720, 4020]
+    assert clock.to_game_secs(periods, ['18:00', '18:00', '18:00', '3:00', '0:00'], 'remaining').tolist() == \
+        [120, 1320, 2520, 3720, 3900]
+    assert clock.to_game_secs([2], ['!;@#'], correct_typos=True).tolist() == [1283]
+    with pytest.raises(ValueError):
+        clock.to_game_secs(periods, ['2:00'] * 5, 'countdown')
+
+
+def test_empty():
+
+    # E.g. a shift report with no shifts yet
+    assert clock.mmss_to_secs([]).dtype.kind == 'i'
+    assert len(clock.to_game_secs([], [])) == 0
+    assert len(clock.to_game_secs(pd.Series([], dtype=object), [], 'remaining', correct_typos=True)) == 0
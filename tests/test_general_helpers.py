@@ -0,0 +1,153 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+import requests
+
+from scrapenhl2.scrape.general_helpers import (
+    CircuitBreaker,
+    CircuitOpenError,
+    TokenBucket,
+    flush_background_writes,
+    write_in_background,
+    once_per_second,
+    get_host_rate_limiter,
+    get_url_stats,
+    map_in_processes,
+    reset_circuit_breakers,
+    reset_url_stats,
+    set_host_rate_limit,
+    try_url_response_n_times,
+)
+
+
+def test_token_bucket_burst_then_wait(mocker):
+    monotonic_mock = mocker.patch("scrapenhl2.scrape.general_helpers.time.monotonic")
+    sleep_mock = mocker.patch("scrapenhl2.scrape.general_helpers.time.sleep")
+    monotonic_mock.return_value = 100.0
+
+    bucket = TokenBucket(rate=2, capacity=2)
+    # Burst of two goes through immediately
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    sleep_mock.assert_not_called()
+
+    # Third and fourth have to wait for refills, one after the other
+    assert bucket.acquire() == 0.5
+    assert bucket.acquire() == 1.0
+    sleep_mock.assert_has_calls([mocker.call(0.5), mocker.call(1.0)])
+
+    # After a long pause, refill is capped at capacity
+    monotonic_mock.return_value = 200.0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0.5
+
+    assert bucket.get_stats() == {'acquired': 7, 'waits': 3, 'wait_secs': 2.0}
+
+
+def test_token_bucket_async(mocker):
+    monotonic_mock = mocker.patch("scrapenhl2.scrape.general_helpers.time.monotonic")
+    monotonic_mock.return_value = 0.0
+    sleep_mock = mocker.patch("scrapenhl2.scrape.general_helpers.asyncio.sleep", new=mocker.AsyncMock())
+
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert asyncio.run(bucket.acquire_async()) == 0
+    assert asyncio.run(bucket.acquire_async()) == 1.0
+    sleep_mock.assert_awaited_once_with(1.0)
+
+
+def test_host_rate_limiter_shared_by_host():
+    set_host_rate_limit('example.com', rate=5, burst=10)
+    bucket = get_host_rate_limiter('http://example.com/api/v1/game')
+    assert bucket is get_host_rate_limiter('http://example.com/other')
+    assert bucket is get_host_rate_limiter('example.com')
+    assert bucket.rate == 5 and bucket.capacity == 10
+    assert bucket is not get_host_rate_limiter('http://example.org/')
+
+
+def test_once_per_second_returns(mocker):
+    mocker.patch("scrapenhl2.scrape.general_helpers.time.sleep")
+    fn = once_per_second(lambda x: x + 1)
+    assert fn(1) == 2
+
+
+def test_background_writes_run_in_order_and_survive_errors():
+    written = []
+
+    def fail():
+        raise IOError("disk full")
+
+    write_in_background(written.append, 1)
+    write_in_background(fail)
+    write_in_background(written.append, 2)
+    flush_background_writes()
+    assert written == [1, 2]
+
+
+def test_map_in_processes():
+    arglists = [(7, 2), (9, 3), (1, 5)]
+    assert list(map_in_processes(divmod, arglists)) == [(3, 1), (3, 0), (0, 1)]
+    assert sorted(map_in_processes(divmod, arglists, workers=2)) == [(0, 1), (3, 0), (3, 1)]
+
+
+def _response(status):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = b"page"
+    return resp
+
+
+@pytest.fixture
+def fake_session(mocker):
+    mocker.patch("scrapenhl2.scrape.general_helpers.time.sleep")
+    session = mocker.patch("scrapenhl2.scrape.general_helpers._get_session").return_value
+    reset_circuit_breakers()
+    reset_url_stats()
+    yield session
+    reset_circuit_breakers()
+
+
+def test_retries_server_errors_with_backoff(fake_session):
+    fake_session.get.side_effect = [_response(503), _response(200)]
+    resp = try_url_response_n_times("http://retry.test/page", timeout=2, n=3)
+    assert resp.status_code == 200
+    assert fake_session.get.call_args[1]["timeout"] == 2
+    assert get_url_stats()["retries"] == 1
+
+
+def test_does_not_retry_404(fake_session):
+    fake_session.get.return_value = _response(404)
+    with pytest.raises(requests.HTTPError):
+        try_url_response_n_times("http://missing.test/page", n=5)
+    assert fake_session.get.call_count == 1
+
+
+def test_circuit_breaker_fails_fast(fake_session):
+    fake_session.get.side_effect = requests.exceptions.ConnectTimeout()
+    assert try_url_response_n_times("http://down.test/a", n=5) is None
+    assert fake_session.get.call_count == 5
+
+    # Five failures in a row opened the circuit; the next call sends nothing
+    with pytest.raises(CircuitOpenError):
+        try_url_response_n_times("http://down.test/b", n=5)
+    assert fake_session.get.call_count == 5
+    assert get_url_stats()["requests_saved"] == 5
+
+
+def test_circuit_breaker_half_open(mocker):
+    monotonic_mock = mocker.patch("scrapenhl2.scrape.general_helpers.time.monotonic")
+    monotonic_mock.return_value = 0
+    breaker = CircuitBreaker(failure_threshold=2, reset_secs=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    # After reset_secs, one trial request only
+    monotonic_mock.return_value = 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os.path
+
+import pytest
+import requests
+
+from scrapenhl2.scrape import http_cache
+
+URL = 'http://www.nhl.com/scores/htmlreports/20162017/TH020001.HTM'
+
+
+class _Response(object):
+
+    def __init__(self, status_code, text=None, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+def _patch(mocker, tmpdir, response):
+    mocker.patch('scrapenhl2.scrape.organization.get_http_cache_folder', return_value=str(tmpdir))
+    return mocker.patch('scrapenhl2.scrape.general_helpers.try_url_response_n_times', return_value=response)
+
+
+def test_stores_and_sends_validators(tmpdir, mocker):
+
+    get = _patch(mocker, tmpdir, _Response(200, 'page', {'ETag': '"abc"', 'Last-Modified': 'Sat, 01 Oct 2016'}))
+    assert http_cache.get_url_if_modified(URL) == ('page', True)
+    assert http_cache.get_validators(URL) == {'ETag': '"abc"', 'Last-Modified': 'Sat, 01 Oct 2016'}
+
+    get.return_value = _Response(304)
+    assert http_cache.get_url_if_modified(URL) == (None, False)
+    assert get.call_args[1]['headers'] == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Sat, 01 Oct 2016'}
+
+    # Without validators (e.g. the page from last time is gone) the request is plain
+    http_cache.get_url_if_modified(URL, use_validators=False)
+    assert get.call_args[1]['headers'] == {}
+
+
+def test_remove_validators(tmpdir, mocker):
+
+    _patch(mocker, tmpdir, _Response(200, 'page', {'ETag': '"abc"'}))
+    http_cache.get_url_if_modified(URL)
+    assert os.path.exists(http_cache.get_validators_filename(URL))
+    http_cache.remove_validators(URL)
+    assert http_cache.get_validators(URL) == {}
+    http_cache.remove_validators(URL)  # nothing stored is fine too
+
+
+def test_failure_raises(tmpdir, mocker):
+
+    _patch(mocker, tmpdir, None)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        http_cache.get_url_if_modified(URL)
+    assert http_cache.get_validators(URL) == {}
@@ -0,0 +1,135 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from scrapenhl2.scrape import manipulate_schedules
+from scrapenhl2.scrape.parse_pbp import _add_scores_to_pbp, _create_pbp_df_html, _create_pbp_df_json, \
+    _get_html_player_ids, apply_pbp_updates
+
+
+def _player(pid, name, role):
+    return {'player': {'id': pid, 'fullName': name}, 'playerType': role}
+
+
+def test_create_pbp_df_json():
+
+    plays = [{'about': {'period': 1, 'periodTime': '0:10'},
+              'result': {'event': 'Blocked Shot', 'description': 'Blocker blocked shot from Shooter'},
+              'team': {'id': 1}, 'coordinates': {'x': -70.0, 'y': 3.0},
+              'players': [_player(11, 'Blocker', 'Blocker'), _player(22, 'Shooter', 'Shooter')]},
+             {'about': {'period': 1, 'periodTime': '0:30'},
+              'result': {'event': 'Goal', 'description': 'Shooter (1) assists: Helper (1)'},
+              'team': {'id': 2}, 'coordinates': {'x': 80.0, 'y': -2.0},
+              'players': [_player(22, 'Shooter', 'Scorer'), _player(23, 'Helper', 'Assist')]},
+             {'about': {'period': 1, 'periodTime': '0:45'},
+              'result': {'event': 'Stoppage', 'description': 'Icing'}}]
+
+    pbp = _create_pbp_df_json(plays, {'Home': 1, 'Road': 2})
+
+    # Blocked shot goes to the shooter's team, with the shooter as actor
+    assert pbp.Team.tolist() == [2, 2, -1]
+    assert pbp.Actor.tolist()[:2] == [22, 22]
+    assert pbp.ActorRole.tolist()[0] == 'Shooter'
+    assert pbp.Recipient.tolist()[0] == 11
+    # Empty-net goal: no recipient, and names in the note become IDs
+    assert np.isnan(pbp.Recipient.iloc[1])
+    assert pbp.Note.iloc[1] == '22 (1) assists: 23 (1)'
+    assert pbp.Event.tolist() == ['Blocked Shot', 'Goal', 'Stoppage']
+    assert str(pbp.Event.dtype) == 'category'
+    assert np.isnan(pbp.X.iloc[2])
+
+
+def test_add_scores_to_pbp():
+
+    # Two goals with the same period, time and team used to be merged into duplicate rows
+    pbp = pd.DataFrame({'Index': [0, 1, 2, 3],
+                        'Event': ['Shot', 'Goal', 'Goal', 'Goal'],
+                        'Period': [1, 1, 1, 2],
+                        'MinSec': ['1:00', '2:00', '2:00', '0:30'],
+                        'Team': [1, 1, 1, 2]})
+
+    pbp = _add_scores_to_pbp(pbp, {'Home': 1, 'Road': 2}, initial_score=(1, 0))
+    assert len(pbp) == 4
+    assert pbp.HomeScore.tolist() == [1, 2, 3, 3]
+    assert pbp.RoadScore.tolist() == [0, 0, 0, 1]
+
+
+def test_create_pbp_df_html(mocker):
+
+    mocker.patch('scrapenhl2.scrape.parse_pbp.players.get_player_ids_file',
+                 return_value=pd.DataFrame({'ID': [8, 19, 70, 65, 41],
+                                            'Name': ['Alex Ovechkin', 'Nicklas Backstrom', 'Braden Holtby',
+                                                     'Erik Karlsson', 'Craig Anderson']}))
+    road = [('8', 'Left Wing', 'ALEX OVECHKIN'), ('19', 'Center', 'NICKLAS BACKSTROM'), ('70', 'Goalie', 'BRADEN HOLTBY')]
+    home = [('65', 'Defense', 'ERIK KARLSSON'), ('41', 'Goalie', 'CRAIG ANDERSON')]
+    events = {'EventNum': [1, 2, 3, 4], 'Period': ['1', '1', '1', '1'], 'Strength': ['EV'] * 4,
+              'MinSec': ['0:10', '0:30', '0:45', '1:00'], 'Event': ['BLOCK', 'GOAL', 'FAC', 'STOP'],
+              'Description': ['WSH #8 OVECHKIN BLOCKED BY OTT #65 KARLSSON, Wrist, Def. Zone',
+                              'WSH #8 OVECHKIN(1), Wrist, Off. Zone, 15 ft. Assists: #19 BACKSTROM(1)',
+                              'OTT won Neu. Zone - WSH #19 BACKSTROM vs OTT #65 KARLSSON', 'ICING'],
+              'RoadOnIce': [road, road, road[:2], road], 'HomeOnIce': [home, home, home, home]}
+
+    pbp = _create_pbp_df_html(['WSH', 'OTT'], events, {'Home': 9, 'Road': 15, 'Season': 2016})
+
+    assert pbp.Event.tolist() == ['Blocked Shot', 'Goal', 'Faceoff', 'Stoppage']
+    assert pbp.Team.tolist() == [15, 15, 9, -1]
+    assert pbp.Actor.tolist() == [8, 8, 65, -1]
+    assert pbp.ActorRole.tolist() == ['Shooter', 'Scorer', 'Winner', '']
+    assert pbp.Recipient.tolist() == [65, 41, 19, -1]
+    assert pbp.RecipientRole.tolist() == ['Blocker', 'Goalie', 'Loser', '']
+    assert pbp.Note.iloc[1] == 'WSH 8(1), Wrist, Off. Zone, 15 ft. Assists: 19(1)'
+    assert pbp.R1.tolist() == [8, 8, 8, 8]
+    assert pbp.RG.iloc[0] == 70 and np.isnan(pbp.RG.iloc[2])
+    assert pbp.H1.tolist() == [65] * 4 and np.isnan(pbp.H2.iloc[0])
+
+
+def test_get_html_player_ids(mocker):
+
+    # Names are matched exactly, so a player missing from the file gets -1, not a near match
+    mocker.patch('scrapenhl2.scrape.parse_pbp.players.get_player_ids_file',
+                 return_value=pd.DataFrame({'ID': [8, 5, 6], 'Name': ['Alex Ovechkin', 'Mike Green', 'Mike Green']}))
+    mocker.patch('scrapenhl2.scrape.parse_pbp.players.get_player_log_file',
+                 return_value=pd.DataFrame({'ID': [6, 5], 'Team': [15, 15], 'Season': [2008, 2005]}))
+    onice = [[('8', 'Left Wing', 'ALEX OVECHKIN'), ('9', 'Center', 'ALEX OVECHKINE')],
+             [('52', 'Defense', 'MIKE GREEN')]]
+    assert _get_html_player_ids(onice, 15, 2008) == {'8': 8, '9': -1, '52': 6}
+    assert _get_html_player_ids(onice, 15, 2007)['52'] == -1
+
+
+def _raw_pbp(homecoach, finalperiod):
+    coaches = [] if homecoach is None else [{'person': {'fullName': homecoach}}]
+    return {'liveData': {'linescore': {'currentPeriodOrdinal': finalperiod},
+                         'boxscore': {'teams': {'home': {'coaches': coaches},
+                                                'away': {'coaches': [{'person': {'fullName': 'Road Coach'}}]}}}}}
+
+
+def test_apply_pbp_updates_matches_per_game_updates(mocker):
+
+    schedule = pd.DataFrame({'Game': [20001, 20002, 20003, 20004], 'Status': ['Final', 'Final', 'Final', 'Live'],
+                             'HomeScore': [4, 2, 3, 1], 'RoadScore': [1, 3, 3, 0],
+                             'Result': ['N/A'] * 4, 'HomeCoach': ['N/A'] * 4, 'RoadCoach': ['N/A'] * 4})
+    pages = {20001: _raw_pbp('Home Coach', '3rd'), 20002: _raw_pbp(None, 'OT'), 20003: _raw_pbp('Home Coach', None),
+             20004: _raw_pbp('Home Coach', '2nd')}
+    saved = {}
+    mocker.patch('scrapenhl2.scrape.schedules.get_season_schedule', side_effect=lambda season: saved['df'].copy())
+    mocker.patch('scrapenhl2.scrape.schedules.write_season_schedule',
+                 side_effect=lambda df, season, force: saved.update(df=df))
+    mocker.patch('scrapenhl2.scrape.players.update_player_ids_file')
+    mocker.patch('scrapenhl2.scrape.players.add_to_player_log_file')
+
+    # One write per game, as games were parsed before the updates were batched
+    saved['df'] = schedule
+    for game, page in pages.items():
+        manipulate_schedules.update_schedule_with_coaches(page, 2016, game)
+        manipulate_schedules.update_schedule_with_result_using_pbp(page, 2016, game)
+    pergame = saved['df']
+
+    saved['df'] = schedule
+    apply_pbp_updates(2016, {game: {'PlayerIDs': [], 'PlayerLog': pd.DataFrame(),
+                                    'Schedule': manipulate_schedules.get_schedule_updates_from_pbp(page, 2016, game)}
+                             for game, page in pages.items()})
+    pd.testing.assert_frame_equal(saved['df'], pergame)
+    assert pergame.Result.tolist() == ['W', 'OTL', 'N/A', 'N/A']
+    assert pergame.HomeCoach.tolist() == ['Home Coach', 'N/A', 'Home Coach', 'Home Coach']
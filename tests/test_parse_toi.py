@@ -0,0 +1,81 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scrapenhl2.scrape.parse_toi import _build_toi_matrix, _check_goalie_shifts, _expand_shifts, \
+    summarize_toi_from_shifts, toi_from_shifts
+
+
+def test_expand_shifts():
+
+    times, rows = _expand_shifts(np.array([3, 0, 8]), np.array([5, 1, 12]), 10)
+    assert list(times) == [3, 4, 5, 0, 1, 8, 9]
+    assert list(rows) == [0, 0, 0, 1, 1, 2, 2]
+
+
+def test_build_toi_matrix():
+
+    # Three home skaters (longest shift gets H1, tie goes to the player listed first), one road skater, two goalies
+    shifts = pd.DataFrame({'PlayerID': [11, 12, 13, 21, 1, 2],
+                           'Start': [1, 1, 3, 1, 0, 0],
+                           'End': [3, 4, 4, 4, 4, 4],
+                           'Team': [1, 1, 1, 2, 1, 2],
+                           'Duration': [2, 3, 1, 3, 4, 4],
+                           'Pos': ['C', 'D', 'D', 'C', 'G', 'G']})
+
+    toi = _build_toi_matrix(shifts, 5, '1', '2')
+    assert list(toi.columns) == ['Time', 'H1', 'H2', 'H3', 'HG', 'R1', 'RG', 'HomeStrength', 'RoadStrength',
+                                 'HomeStrengthCode', 'RoadStrengthCode']
+    assert list(toi.H1.fillna(0)) == [0, 12, 12, 12, 12]
+    assert list(toi.H2.fillna(0)) == [0, 11, 11, 11, 13]
+    assert list(toi.H3.fillna(0)) == [0, 0, 0, 13, 0]
+    assert list(toi.HomeStrength) == ['0', '2', '2', '3', '2']
+    assert list(toi.RoadStrength) == ['0', '1', '1', '1', '1']
+    assert list(toi.HomeStrengthCode) == [0, 2, 2, 3, 2]
+
+
+def test_toi_from_shifts():
+
+    # Five skaters and a goalie apiece from 1 to 9, with home skater 15 replaced by 16 after 5. Nobody but the goalies
+    # at 0, so that second is dropped.
+    shifts = pd.DataFrame({'PlayerID': [11, 12, 13, 14, 15, 16, 21, 22, 23, 24, 25, 1, 2],
+                           'Start': [1] * 5 + [6] + [1] * 5 + [0, 0],
+                           'End': [10] * 4 + [5] + [10] * 8,
+                           'Team': [1] * 6 + [2] * 5 + [1, 2],
+                           'Duration': [9] * 4 + [4, 4] + [9] * 5 + [10, 10],
+                           'Pos': ['C'] * 11 + ['G', 'G']})
+
+    toi = toi_from_shifts(shifts, 1, 2)
+    assert list(toi.Time) == list(range(1, 10))
+    assert list(toi.H5) == [15] * 5 + [16] * 4
+    assert (toi.HomeStrengthCode == 5).all()
+
+    summary = summarize_toi_from_shifts(shifts, 1, 2).set_index('PlayerID')
+    assert summary.Secs.to_dict() == {1: 9, 2: 9, 11: 9, 12: 9, 13: 9, 14: 9, 15: 5, 16: 4,
+                                      21: 9, 22: 9, 23: 9, 24: 9, 25: 9}
+    assert list(summary.loc[[1, 16], 'Goalie']) == [True, False]
+    assert list(summary.loc[[1, 21], 'Team']) == ['H', 'R']
+
+
+def test_check_goalie_shifts():
+
+    # A home goalie pulled for another from 6 to 7, while the first goalie's shift overlaps. Only the top goalie (1) is
+    # kept at those seconds, so this is fine.
+    shifts = pd.DataFrame({'PlayerID': [11, 12, 13, 21, 22, 23, 1, 3, 2],
+                           'Start': [0] * 6 + [0, 6, 0],
+                           'End': [10] * 6 + [10, 7, 10],
+                           'Team': [1] * 3 + [2] * 3 + [1, 1, 2],
+                           'Duration': [10] * 6 + [10, 1, 10],
+                           'Pos': ['C'] * 6 + ['G'] * 3})
+    _check_goalie_shifts(shifts, 1, 2)
+    toi_from_shifts(shifts, 1, 2)
+
+    # But the top goalie on twice at once can't be resolved
+    shifts = pd.concat([shifts, shifts.iloc[[6]].assign(Start=4, End=5, Duration=1)], ignore_index=True)
+    with pytest.raises(ValueError, match='at 2 seconds'):
+        _check_goalie_shifts(shifts, 1, 2)
+    with pytest.raises(ValueError, match='at 2 seconds'):
+        toi_from_shifts(shifts, 1, 2)
@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from scrapenhl2.scrape import organization, parsed_store
+
+
+def _toi(game, seconds, players):
+    return pd.DataFrame({'Time': np.arange(seconds), 'H1': [players[0]] * seconds, 'R1': [players[1]] * seconds,
+                         'HomeStrength': ['5'] * seconds, 'RoadStrength': ['4+1'] * seconds,
+                         'HomeStrengthCode': [5] * seconds, 'RoadStrengthCode': [69] * seconds})
+
+
+def test_save_read_compact(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(organization, 'get_parsed_data_folder', lambda: str(tmp_path))
+    parsed_store.save_game('toi', _toi(20002, 3, [1, np.nan]), 2016, 20002, 5, 6)
+    parsed_store.save_game('toi', _toi(20001, 2, [3, 4]), 2016, 20001, 1, 2)
+    parsed_store.save_game('toi', _toi(30001, 4, [5, 6]), 2016, 30001, 1, 5)
+    assert parsed_store.has_game('toi', 2016, 20001)
+    assert not parsed_store.has_game('toi', 2016, 20003)
+
+    game = parsed_store.read_game('toi', 2016, 20002)
+    assert game.Time.tolist() == [0, 1, 2]
+    assert game.R1.isnull().all()
+    assert str(game.HomeStrength.dtype) == 'category'
+    assert 'Game' not in game.columns
+
+    parsed_store.compact_season('toi', 2016)
+    regular = parsed_store.get_partition_folder('toi', 2016, 'R')
+    assert os.listdir(regular) == ['games.parquet']
+    assert parsed_store.has_game('toi', 2016, 20002)
+
+    # A game written after compaction replaces the compacted one
+    parsed_store.save_game('toi', _toi(20001, 5, [7, 8]), 2016, 20001, 1, 2)
+    season = parsed_store.read_games('toi', 2016)
+    assert season.Game.tolist() == [20001] * 5 + [20002] * 3 + [30001] * 4
+    assert season[season.Game == 20001].H1.tolist() == [7] * 5
+
+    team = parsed_store.read_games('toi', 2016, teams=[1], columns=['H1'])
+    assert list(team.columns) == ['Game', 'H1']
+    assert team.Game.unique().tolist() == [20001, 30001]
+    assert len(parsed_store.read_games('toi', 2017)) == 0
+
+
+def test_read_game_cache(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(organization, 'get_parsed_data_folder', lambda: str(tmp_path))
+    parsed_store.clear_cache()
+    parsed_store.reset_cache_stats()
+    parsed_store.save_game('toi', _toi(20001, 3, [1, 2]), 2016, 20001, 1, 2)
+    parsed_store.save_game('toi', _toi(20002, 3, [3, 4]), 2016, 20002, 1, 2)
+
+    first = parsed_store.read_game('toi', 2016, 20001)
+    first.loc[:, 'H1'] = 5  # callers get copies
+    assert parsed_store.read_game('toi', 2016, 20001).H1.tolist() == [1, 1, 1]
+    assert parsed_store.get_cache_stats()['hits'] == 1
+
+    # Saving a game drops it from the cache
+    parsed_store.save_game('toi', _toi(20001, 2, [6, 2]), 2016, 20001, 1, 2)
+    assert parsed_store.read_game('toi', 2016, 20001).H1.tolist() == [6, 6]
+    assert parsed_store.get_cache_stats()['misses'] == 2
+
+    # Room for one game only
+    parsed_store.set_cache_budget(parsed_store.get_cache_stats()['bytes'] * 1.5)
+    parsed_store.read_game('toi', 2016, 20002)
+    stats = parsed_store.get_cache_stats()
+    assert stats['games'] == 1
+    assert stats['evictions'] == 1
+    parsed_store.set_cache_budget(parsed_store.DEFAULT_CACHE_BUDGET)
+
+
+def test_compact_batches(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(organization, 'get_parsed_data_folder', lambda: str(tmp_path))
+    monkeypatch.setattr(parsed_store, 'MERGE_AFTER_BATCHES', 2)
+    regular = parsed_store.get_partition_folder('toi', 2016, 'R')
+    parsed_store.save_game('toi', _toi(20001, 2, [1, 2]), 2016, 20001, 1, 2)
+    parsed_store.compact_season('toi', 2016)
+
+    # Later compactions write only the new games, to batches read before games.parquet
+    parsed_store.save_game('toi', _toi(20002, 3, [3, 4]), 2016, 20002, 1, 2)
+    parsed_store.save_game('toi', _toi(20001, 4, [5, 6]), 2016, 20001, 1, 2)
+    parsed_store.compact_season('toi', 2016)
+    assert sorted(os.listdir(regular)) == ['games-1.parquet', 'games.parquet']
+    parsed_store.compact_season('toi', 2016)
+    assert sorted(os.listdir(regular)) == ['games-1.parquet', 'games.parquet']
+
+    parsed_store.save_game('toi', _toi(20002, 1, [7, 8]), 2016, 20002, 1, 2)
+    parsed_store.compact_season('toi', 2016)
+    assert sorted(os.listdir(regular)) == ['games-1.parquet', 'games-2.parquet', 'games.parquet']
+    assert parsed_store.has_game('toi', 2016, 20002)
+    assert parsed_store.read_game('toi', 2016, 20002).H1.tolist() == [7]
+    season = parsed_store.read_games('toi', 2016)
+    assert season.Game.tolist() == [20001] * 4 + [20002]
+    assert season[season.Game == 20001].H1.tolist() == [5] * 4
+
+    # Then everything is merged back into games.parquet
+    parsed_store.save_game('toi', _toi(20003, 2, [9, 10]), 2016, 20003, 1, 2)
+    parsed_store.compact_season('toi', 2016)
+    assert os.listdir(regular) == ['games.parquet']
+    season = parsed_store.read_games('toi', 2016)
+    assert season.Game.tolist() == [20001] * 4 + [20002] + [20003] * 2
+    assert season.H1.tolist() == [5] * 4 + [7] + [9] * 2
@@ -0,0 +1,37 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from scrapenhl2.scrape.pbp_log import read_pbp_log
+
+
+def _onice(players):
+    return '<td class=" + bborder"><table><tr>{0:s}</tr></table></td>'.format('<td>&nbsp;</td>'.join(
+        '<td><table><tr><td><font style="cursor:hand;" title="{1:s}">{0:s}</font></td></tr>'
+        '<tr><td>{2:s}</td></tr></table></td>'.format(number, title, title[0]) for number, title in players))
+
+
+def test_read_pbp_log():
+    page = '''<html><head><title>Play By Play</title></head><body><table>
+<tr><td class="heading + bborder">#</td><td class="heading + bborder">Per</td><td class="heading + bborder">Str</td>
+<td class="heading + bborder">Time:<br>Elapsed Game</td><td class="heading + bborder">Event</td>
+<td class="heading + bborder">Description</td><td class="heading + bborder">WSH On Ice</td>
+<td class="heading + bborder">OTT On Ice</td></tr>
+<tr id="PL-1" class="evenColor"><td>1</td><td>1</td><td>&nbsp;</td><td>0:00<br>20:00</td><td>PSTR</td>
+<td>Period Start- Local time: 7:11 EDT</td><td>&nbsp;</td><td>&nbsp;</td></tr>
+<tr id="PL-2" class="evenColor"><td>2</td><td>1</td><td>EV</td><td>0:45<br>19:15</td><td>GOAL</td>
+<td>WSH #8 OVECHKIN(1), Wrist, Off. Zone, 15 ft.<br>Assists: #19 BACKSTROM(1)</td>
+{0:s}{1:s}</tr>
+</table></body></html>'''.format(_onice([('8', 'Left Wing - ALEX OVECHKIN'), ('19', 'Center - NICKLAS BACKSTROM'),
+                                         ('70', 'Goalie - BRADEN HOLTBY')]),
+                                 _onice([('30', 'Goalie - CRAIG ANDERSON')]))
+
+    teams, events = read_pbp_log(page)
+    assert teams == ['WSH', 'OTT']
+    assert events['EventNum'] == [1, 2]
+    assert events['Period'] == ['1', '1']
+    assert events['MinSec'] == ['0:00', '0:45']
+    assert events['Event'] == ['PSTR', 'GOAL']
+    assert events['Description'][1] == 'WSH #8 OVECHKIN(1), Wrist, Off. Zone, 15 ft. Assists: #19 BACKSTROM(1)'
+    assert events['RoadOnIce'] == [[], [('8', 'Left Wing', 'ALEX OVECHKIN'), ('19', 'Center', 'NICKLAS BACKSTROM'),
+                                         ('70', 'Goalie', 'BRADEN HOLTBY')]]
+    assert events['HomeOnIce'] == [[], [('30', 'Goalie', 'CRAIG ANDERSON')]]
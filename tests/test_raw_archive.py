@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os.path
+
+from scrapenhl2.scrape import raw_archive, raw_codecs
+
+
+def test_pack_then_read_and_append(tmpdir):
+    folder = str(tmpdir)
+    raw_codecs.write_raw_file('{"game": 1}', os.path.join(folder, "20001"))
+    with open(os.path.join(folder, "20001H.html"), 'w') as writer:
+        writer.write("<html>home</html>")
+
+    assert raw_archive.pack_folder(folder, remove_files=True) == 2
+    assert not os.path.exists(os.path.join(folder, "20001.zlib"))
+    assert raw_archive.exists(os.path.join(folder, "20001.zlib"))
+    assert raw_archive.read_raw_page(os.path.join(folder, "20001.zlib")) == '{"game": 1}'
+    assert raw_archive.read_text_file(os.path.join(folder, "20001H.html")) == "<html>home</html>"
+
+    # New games are appended; earlier entries stay where they were
+    raw_codecs.write_raw_file('{"game": 2}', os.path.join(folder, "20002"))
+    raw_archive.pack_folder(folder, remove_files=True)
+    assert raw_archive.read_raw_page(os.path.join(folder, "20002.zlib")) == '{"game": 2}'
+    assert raw_archive.read_raw_page(os.path.join(folder, "20001.zlib")) == '{"game": 1}'
+    assert not raw_archive.exists(os.path.join(folder, "20003.zlib"))
+
+
+def test_pack_again_skips_unchanged_files(tmpdir):
+    folder = str(tmpdir)
+    raw_codecs.write_raw_file('{"game": 1}', os.path.join(folder, "20001"))
+    raw_codecs.write_raw_file('{"game": 2}', os.path.join(folder, "20002"))
+    assert raw_archive.pack_folder(folder) == 2
+    size = os.path.getsize(raw_archive.get_archive_filename(folder))
+
+    assert raw_archive.pack_folder(folder) == 0
+    assert os.path.getsize(raw_archive.get_archive_filename(folder)) == size
+
+    # Only a file whose bytes changed is appended again
+    raw_codecs.write_raw_file('{"game": 3}', os.path.join(folder, "20002"))
+    assert raw_archive.pack_folder(folder) == 1
+    assert os.path.getsize(raw_archive.get_archive_filename(folder)) > size
+    assert raw_archive.read_raw_page(os.path.join(folder, "20002.zlib")) == '{"game": 3}'
+
+
+def test_index_reread_when_rewritten_in_same_tick(tmpdir):
+    folder = str(tmpdir)
+    indexfile = raw_archive.get_archive_index_filename(folder)
+    with open(indexfile, 'w') as writer:
+        writer.write('{"20001.zlib": [0, 5]}')
+    stat = os.stat(indexfile)
+    assert raw_archive.get_archive_index(folder) == {"20001.zlib": [0, 5]}
+
+    # Another process rewrites the index, and the filesystem gives it the same modification time
+    with open(indexfile, 'w') as writer:
+        writer.write('{"20001.zlib": [0, 5], "20002.zlib": [5, 7]}')
+    os.utime(indexfile, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert raw_archive.get_archive_index(folder) == {"20001.zlib": [0, 5], "20002.zlib": [5, 7]}
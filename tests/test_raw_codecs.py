@@ -0,0 +1,37 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os.path
+import zlib
+
+import pytest
+
+from scrapenhl2.scrape import raw_codecs
+
+
+@pytest.fixture(autouse=True)
+def reset_codec():
+    yield
+    raw_codecs.set_raw_codec(raw_codecs.DEFAULT_CODEC, raw_codecs.DEFAULT_LEVEL)
+
+
+@pytest.mark.parametrize("codec", raw_codecs.get_codecs())
+def test_round_trip(codec):
+    data = b'{"gamePk": 2017020001, "plays": []}' * 100
+    assert raw_codecs.decompress(raw_codecs.compress(data, codec, None), codec) == data
+
+
+def test_reads_legacy_zlib_after_switching_codec(tmpdir):
+    legacy = str(tmpdir.join("20001.zlib"))
+    with open(legacy, 'wb') as writer:
+        writer.write(zlib.compress('{"a": 1}'.encode('latin-1'), 9))
+
+    raw_codecs.set_raw_codec('lzma', 1)
+    assert raw_codecs.find_raw_file(str(tmpdir.join("20001"))) == legacy
+    assert raw_codecs.read_raw_file(legacy) == '{"a": 1}'
+
+    # Rewriting under the new codec replaces the old file
+    written = raw_codecs.write_raw_file('{"a": 2}', legacy)
+    assert written == str(tmpdir.join("20001.xz"))
+    assert not os.path.exists(legacy)
+    assert raw_codecs.read_raw_file(legacy) == '{"a": 2}'
@@ -0,0 +1,72 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import time
+import urllib.error
+import urllib.request
+
+from scrapenhl2.scrape import replay_server
+
+PATH = '/scores/htmlreports/20162017/RO020001.HTM'
+
+
+class _Response(object):
+
+    status_code = 200
+    content = '<html>Rosters é</html>'.encode('windows-1252')
+    headers = {'Content-Type': 'text/html; charset=windows-1252'}
+
+
+@contextlib.contextmanager
+def _serving(**kwargs):
+    server = replay_server.ReplayServer(**kwargs).start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def _get(server, path=PATH):
+    try:
+        with urllib.request.urlopen(server.url + path) as response:
+            return response.status, response.headers['Content-Type'], response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, None, None
+
+
+def test_record_then_replay(tmpdir, mocker):
+
+    get = mocker.patch('scrapenhl2.scrape.replay_server.requests.get', return_value=_Response())
+    with _serving(upstream=True, record_folder=str(tmpdir)) as server:
+        assert _get(server) == (200, _Response.headers['Content-Type'], _Response.content)
+    assert get.call_count == 1
+
+    # Replayed from the recording, with the original content type, without going upstream
+    with _serving(record_folder=str(tmpdir)) as server:
+        assert _get(server) == (200, _Response.headers['Content-Type'], _Response.content)
+        assert _get(server, '/api/v1/people/8471214')[0] == 404
+    assert get.call_count == 1
+
+
+def test_injected_errors_repeat_with_seed(tmpdir, mocker):
+
+    mocker.patch('scrapenhl2.scrape.replay_server.requests.get', return_value=_Response())
+    with _serving(upstream=True, record_folder=str(tmpdir)) as server:
+        _get(server)
+
+    statuses = []
+    for _ in range(2):
+        with _serving(record_folder=str(tmpdir), error_rate=0.5, seed=3) as server:
+            statuses.append([_get(server)[0] for _ in range(20)])
+            assert server.get_stats()['injected'] == statuses[-1].count(503)
+    assert statuses[0] == statuses[1]
+    assert set(statuses[0]) == {200, 503}
+
+
+def test_latency(tmpdir):
+
+    with _serving(record_folder=str(tmpdir), latency=0.2) as server:
+        starttime = time.perf_counter()
+        assert _get(server)[0] == 404
+        assert time.perf_counter() - starttime >= 0.2
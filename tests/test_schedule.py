@@ -8,12 +8,16 @@ from scrapenhl2.scrape.schedules import (
     get_season_schedule,
     get_team_schedule,
     write_season_schedule,
+    refresh_season_schedule,
     get_game_data_from_schedule,
     _CURRENT_SEASON,
     _SCHEDULES,
 )
 from unittest.mock import call, MagicMock
 from pytest_mock import mocker
+import arrow
+import json
+import pandas as pd
 
 def test_get_current_season(mocker):
 
@@ -103,5 +107,59 @@ def test_get_game_data_from_schedule(mocker):
     get_season_schedule_mock().query().to_dict.assert_called_once_with(orient='series')
 
 
+def _schedule_row(game, status, homescore, result='N/A'):
+    return {'Season': 2017, 'Date': '2017-10-05', 'Game': game, 'Type': 'R', 'Status': status,
+            'Road': 1, 'RoadScore': 0, 'RoadCoach': 'N/A', 'Home': 2, 'HomeScore': homescore,
+            'HomeCoach': 'N/A', 'Venue': 'Arena', 'Result': result, 'PBPStatus': 'Not scraped',
+            'TOIStatus': 'Not scraped'}
 
 
+def _schedule_json_game(game, status, homescore):
+    return {'gamePk': 2017000000 + game, 'gameType': 'R', 'status': {'detailedState': status},
+            'teams': {'away': {'team': {'id': 1}, 'score': 0}, 'home': {'team': {'id': 2}, 'score': homescore}},
+            'venue': {'name': 'Arena'}}
+
+
+def test_refresh_season_schedule(mocker):
+
+    olddf = pd.DataFrame([_schedule_row(20001, 'Final', 3, 'W'), _schedule_row(20002, 'In Progress', 1)])
+    mocker.patch("scrapenhl2.scrape.schedules.os.path.exists", return_value=True)
+    mocker.patch("scrapenhl2.scrape.schedules.get_season_schedule", return_value=olddf)
+    url_mock = mocker.patch("scrapenhl2.scrape.schedules.helpers.try_url_n_times")
+    url_mock.return_value = json.dumps({'dates': [{'date': '2017-10-05', 'games': [
+        _schedule_json_game(20001, 'Final', 3), _schedule_json_game(20002, 'Final', 2)]}]})
+    write_mock = mocker.patch("scrapenhl2.scrape.schedules.write_season_schedule")
+
+    assert refresh_season_schedule(2017, '2017-10-05', '2017-10-06') == {20002}
+    assert 'startDate=2017-10-05&endDate=2017-10-06' in url_mock.call_args[0][0]
+    newdf = write_mock.call_args[0][0]
+    assert list(newdf.Game) == [20001, 20002]
+    assert list(newdf.Status) == ['Final', 'Final']
+    assert list(newdf.HomeScore) == [3, 2]
+    assert list(newdf.Result) == ['W', 'N/A']
+
+    # Nothing changed, nothing written
+    write_mock.reset_mock()
+    mocker.patch("scrapenhl2.scrape.schedules.get_season_schedule", return_value=newdf)
+    assert refresh_season_schedule(2017, '2017-10-05', '2017-10-06') == set()
+    write_mock.assert_not_called()
+
+
+def test_refresh_season_schedule_default_window(mocker):
+
+    # A game from days ago never marked final is refreshed, even though the window would otherwise start yesterday
+    olddf = pd.DataFrame([_schedule_row(20001, 'Final', 3, 'W'), _schedule_row(20002, 'Scheduled', 0),
+                          dict(_schedule_row(20003, 'Postponed', 0), Date='2017-10-01')])
+    mocker.patch("scrapenhl2.scrape.schedules.os.path.exists", return_value=True)
+    mocker.patch("scrapenhl2.scrape.schedules.get_season_schedule", return_value=olddf)
+    mocker.patch("scrapenhl2.scrape.schedules.arrow.now", return_value=arrow.get('2017-10-10'))
+    url_mock = mocker.patch("scrapenhl2.scrape.schedules.helpers.try_url_n_times")
+    url_mock.return_value = json.dumps({'dates': []})
+
+    assert refresh_season_schedule(2017) == set()
+    assert 'startDate=2017-10-05&endDate=2017-10-11' in url_mock.call_args[0][0]
+
+    # Once it is final, back to yesterday
+    olddf.loc[1, 'Status'] = 'Final'
+    refresh_season_schedule(2017)
+    assert 'startDate=2017-10-09&endDate=2017-10-11' in url_mock.call_args[0][0]
@@ -0,0 +1,34 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from scrapenhl2.scrape import schemas
+
+
+def test_apply_schema():
+
+    pbp = pd.DataFrame({'Event': ['Goal', 'Shot'], 'Actor': [8471214.0, np.nan], 'Time': [30, 95],
+                        'HomeScore': [1, 1], 'H1': [8471214, schemas.MISSING_ID], 'Note': ['a', 'b']})
+    typed = schemas.apply_schema(pbp, schemas.PBP_SCHEMA)
+    assert str(typed.Event.dtype) == 'category'
+    assert typed.Actor.dtype == schemas.PLAYER_ID
+    assert typed.Actor.isnull().tolist() == [False, True]
+    assert typed.H1.isnull().tolist() == [False, True]
+    assert typed.Time.dtype == np.int16
+    assert typed.HomeScore.dtype == np.int8
+    assert typed.Note.tolist() == ['a', 'b']
+
+
+def test_to_hdf_storage():
+
+    toi = pd.DataFrame({'Time': [0, 1], 'H1': [np.nan, 8471214.0], 'HomeStrength': ['4+1', '5']})
+    stored = schemas.to_hdf_storage(toi, schemas.TOI_SCHEMA)
+    assert stored.H1.dtype == np.int32
+    assert stored.H1.tolist() == [schemas.MISSING_ID, 8471214]
+    assert stored.HomeStrength.tolist() == ['4+1', '5']
+
+    back = schemas.apply_schema(stored, schemas.TOI_SCHEMA)
+    assert back.H1.isnull().tolist() == [True, False]
+    assert str(back.HomeStrength.dtype) == 'category'
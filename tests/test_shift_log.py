@@ -0,0 +1,40 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from scrapenhl2.scrape.shift_log import read_shift_log
+
+_PLAYER = '''<tr><td align="center" class="playerHeading + border" colspan="8">{0:s}</td></tr>
+<tr><td>Shift #</td><td>Per</td><td>Start of Shift<br>Elapsed / Game</td><td>End of Shift<br>Elapsed / Game</td>
+<td>Duration</td><td>Event</td></tr>
+{1:s}
+<tr><td colspan="8"><table>
+<tr><td>Per</td><td>SHF</td><td>AVG</td><td>TOI</td><td>EV TOT</td><td>PP TOT</td><td>SH TOT</td></tr>
+<tr><td>1</td><td>2</td><td>00:45</td><td>01:30</td><td>01:30</td><td>&nbsp;</td><td>&nbsp;</td></tr>
+</table></td></tr>
+<tr><td colspan="8">&nbsp;</td></tr>'''
+
+_SHIFT = '<tr class="oddColor"><td>{0:d}</td><td>{1:s}</td><td>{2:s}</td><td>{3:s}</td><td>00:45</td>' \
+         '<td>&nbsp;</td></tr>'
+
+
+def test_read_shift_log():
+    page = '''<html><head><title>Time On Ice Report</title></head><body>
+<table><tr><td><table id="GameInfo"><tr><td>Game 0001</td></tr></table></td></tr>
+<tr><td><table>
+<tr><td class="teamHeading + border" colspan="8">WASHINGTON CAPITALS</td></tr>
+{0:s}
+{1:s}
+</table></td></tr></table></body></html>'''.format(
+        _PLAYER.format('8 OVECHKIN, ALEX', _SHIFT.format(1, '1', '0:00 / 20:00', '0:45 / 19:15') +
+                       _SHIFT.format(2, '3', '19:15 / 0:45', '20:00 / 0:00')),
+        _PLAYER.format("9 O'BRIEN, LIAM", _SHIFT.format(1, 'OT', '1:00 / 4:00', '1:45 / 3:15')))
+
+    assert read_shift_log(page) == {'Name': ['8 OVECHKIN, ALEX', '8 OVECHKIN, ALEX', "9 O'BRIEN, LIAM"],
+                                    'ShiftNum': [1, 2, 1],
+                                    'Period': [1, 3, 4],
+                                    'Start': ['0:00', '19:15', '1:00'],
+                                    'End': ['0:45', '20:00', '1:45']}
+
+
+def test_read_shift_log_no_shifts():
+    assert read_shift_log('<html><body><p>Report not available</p></body></html>')['Name'] == []
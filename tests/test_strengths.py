@@ -0,0 +1,37 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from scrapenhl2.scrape import strengths
+
+
+def test_strength_codes_round_trip():
+
+    labels = ['5', '4', '3', '4+1', '3+1', '6']
+    codes = strengths.strength_as_code(labels)
+    assert codes.dtype == np.int8
+    assert codes.tolist() == [5, 4, 3, strengths.NO_GOALIE + 5, strengths.NO_GOALIE + 4, 6]
+    assert strengths.code_as_strength(codes).tolist() == labels
+
+    # Labels read back as numbers, and missing values
+    assert strengths.strength_as_code([5, 5.0, None, np.nan, 'x']).tolist() == [5, 5] + [strengths.UNKNOWN] * 3
+
+
+def test_counts_as_codes():
+
+    # Goalies count as 100
+    codes = strengths.counts_as_codes(np.array([105, 104, 5, 100]))
+    assert strengths.code_as_strength(codes).tolist() == ['5', '4', '4+1', '0']
+
+
+def test_is_five_on_five_with_old_labels():
+
+    old = pd.DataFrame({'TeamStrength': ['5', '5', '4+1', '4'], 'OppStrength': ['5', '4', '5', '5']})
+    new = strengths.add_strength_codes(old)
+    assert new.TeamStrengthCode.dtype == np.int8
+    assert strengths.is_five_on_five(old).tolist() == [True, False, False, False]
+    assert strengths.is_five_on_five(new.drop(['TeamStrength', 'OppStrength'], axis=1)).tolist() == \
+        [True, False, False, False]
+    assert strengths.is_strength(old, 'TeamStrength', '4+1').tolist() == [False, False, True, False]
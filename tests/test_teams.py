@@ -0,0 +1,75 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import feather
+import numpy as np
+import pandas as pd
+
+from scrapenhl2.scrape import teams
+
+
+def _toi(games, players):
+    return pd.DataFrame({'Game': np.repeat(games, 3), 'Time': [0, 1, 2] * len(games), 'Team1': players,
+                         'TeamStrength': ['5', '4', '5'] * len(games), 'OppStrength': ['5'] * (3 * len(games)),
+                         'TeamScore': ([np.nan] + [0] * 2) * len(games)})
+
+
+def test_get_team_toi_columns_and_filters(tmpdir, mocker):
+
+    mocker.patch('scrapenhl2.scrape.organization.get_season_team_toi_folder', return_value=str(tmpdir))
+    toi = _toi([20001, 20002], np.arange(6) * 1.0)
+    teams.write_team_toi(toi, 2016, 'WSH')
+    assert 'TeamStrengthCode' in teams.get_team_toi(2016, 'WSH').columns
+
+    fives = teams.get_team_toi(2016, 'WSH', columns=['Game', 'Team1'], filters=dict(teams.FIVE_ON_FIVE, Game=[20002]))
+    assert list(fives.columns) == ['Game', 'Team1']
+    assert fives.Team1.tolist() == [3, 5]
+
+    # Logs written before strength codes were added have labels only, and are compressed
+    feather.write_dataframe(toi, teams.get_team_toi_filename(2016, 'WSH'))
+    fives = teams.get_team_toi(2016, 'WSH', columns=['Game', 'Team1'], filters=dict(teams.FIVE_ON_FIVE, Game=[20002]))
+    assert fives.Team1.tolist() == [3, 5]
+
+
+def test_team_log_segments(tmpdir, mocker):
+
+    mocker.patch('scrapenhl2.scrape.organization.get_season_team_toi_folder', return_value=str(tmpdir))
+    teams.append_team_log_segment(_toi([20001, 20002], [1, 2, 3, 4, 5, 6]), 'toi', 2016, 'WSH', [20001, 20002])
+    assert os.path.exists(teams.get_team_toi_filename(2016, 'WSH'))  # the first segment is the base
+    teams.append_team_log_segment(_toi([20003], [7, 8, 9]), 'toi', 2016, 'WSH', [20003])
+    # Redo 20001, and drop 20002
+    teams.append_team_log_segment(_toi([20001], [10, 11, 12]), 'toi', 2016, 'WSH', [20001, 20002])
+    assert teams.count_team_log_segments('toi', 2016, 'WSH') == 2
+
+    expected = {'Game': [20003] * 3 + [20001] * 3, 'Team1': [7, 8, 9, 10, 11, 12]}
+    assert teams.get_team_toi(2016, 'WSH', columns=['Game', 'Team1']).to_dict('list') == expected
+    assert teams.get_team_toi(2016, 'WSH', columns=['Team1'], filters={'Game': [20001]}).Team1.tolist() == [10, 11, 12]
+
+    teams.compact_team_log('toi', 2016, 'WSH')
+    assert teams.count_team_log_segments('toi', 2016, 'WSH') == 0
+    assert os.listdir(teams.get_team_log_segment_folder('toi', 2016, 'WSH')) == []
+    assert teams.get_team_toi(2016, 'WSH', columns=['Game', 'Team1']).to_dict('list') == expected
+
+
+def test_compact_team_log_keeps_segments_appended_meanwhile(tmpdir, mocker):
+
+    mocker.patch('scrapenhl2.scrape.organization.get_season_team_toi_folder', return_value=str(tmpdir))
+    teams.append_team_log_segment(_toi([20001], [1, 2, 3]), 'toi', 2016, 'WSH', [20001])
+    teams.append_team_log_segment(_toi([20002], [4, 5, 6]), 'toi', 2016, 'WSH', [20002])
+
+    # Compaction reads without the lock, so a segment can be appended before it swaps in the new base
+    read = teams._read_team_log_files
+
+    def append_then_read(*args, **kwargs):
+        teams.append_team_log_segment(_toi([20001], [7, 8, 9]), 'toi', 2016, 'WSH', [20001])
+        return read(*args, **kwargs)
+
+    mocker.patch('scrapenhl2.scrape.teams._read_team_log_files', side_effect=append_then_read)
+    teams.compact_team_log('toi', 2016, 'WSH')
+    assert teams.count_team_log_segments('toi', 2016, 'WSH') == 1
+    assert sorted(os.listdir(teams.get_team_log_segment_folder('toi', 2016, 'WSH'))) == \
+        ['manifest.json', 'segment-000001.feather']
+    expected = {'Game': [20002] * 3 + [20001] * 3, 'Team1': [4, 5, 6, 7, 8, 9]}
+    assert teams.get_team_toi(2016, 'WSH', columns=['Game', 'Team1']).to_dict('list') == expected
@@ -0,0 +1,46 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from scrapenhl2.scrape import toi_kernels
+
+
+def _fill(compiled):
+    # Three seconds. Home skaters 11, 12, 13 (in priority order) at second 1, only 12 at second 2. Road skater 21.
+    # Home has two goalies (1 and 3) at second 2, and 1 is the top goalie; road goalie is 2.
+    numtimes = 3
+    skaterteams = np.array([0, 0, 0, 0, 1])
+    skatertimes = np.array([1, 1, 1, 2, 1])
+    skatercodes = np.array([11, 12, 13, 12, 21])
+    slotcols = np.array([[-1, 0, 1, -1], [-1, 0, -1, -1]])  # keep home slots 1-2, road slot 1
+    goalieteams = np.array([0, 0, 0, 1, 1])
+    goalietimes = np.array([1, 2, 2, 1, 2])
+    goaliecodes = np.array([1, 1, 3, 2, 2])
+
+    toi_kernels.use_numba(compiled)
+    try:
+        return toi_kernels.fill_seconds(numtimes,
+                                        toi_kernels.get_team_offsets(skaterteams, skatertimes, numtimes), skatercodes,
+                                        slotcols,
+                                        toi_kernels.get_team_offsets(goalieteams, goalietimes, numtimes), goaliecodes,
+                                        np.array([1, -1]))
+    finally:
+        toi_kernels.use_numba()
+
+
+@pytest.mark.parametrize('compiled', [False, True])
+def test_fill_seconds(compiled):
+
+    if compiled and not toi_kernels.has_numba():
+        pytest.skip('numba not installed')
+    skaters, goalies, counts, duplicates = _fill(compiled)
+
+    assert skaters[0, 0].tolist() == [-1, 11, 12]
+    assert skaters[0, 1].tolist() == [-1, 12, -1]
+    assert skaters[1, 0].tolist() == [-1, 21, -1]
+    assert (skaters[:, 2:] == -1).all()
+    assert goalies.tolist() == [[-1, 1, 1], [-1, 2, -1]]  # road goalie dropped when home has two, as it always was
+    assert counts.tolist() == [[0, 102, 101], [0, 101, 0]]
+    assert duplicates == 0